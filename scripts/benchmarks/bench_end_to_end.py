@@ -0,0 +1,479 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+bench_end_to_end.py
+
+End-to-end benchmark of inspecting an input path and generating its
+recipes, without using the network.
+
+A local HTTP server serves a synthetic Sparkle feed, GitHub, BitBucket
+and SourceForge API responses, a MacUpdate search page, and zip, tgz
+and pkg downloads of a small generated app. Recipe Robot's requests for
+the real hosts are sent to that server with
+http_client.set_url_rewrites(), and a run that requests any other host
+counts as failed. Each input type is run through process_input_path and
+generate_recipes several times, and the p50 and p95 latency of the
+successful runs, throughput and peak memory are reported.
+
+Results can be saved as a baseline, and later runs compared with it:
+
+    python benchmarks/bench_end_to_end.py --save-baseline baseline.json
+    python benchmarks/bench_end_to_end.py --baseline baseline.json
+
+The comparison fails (exit code 1) if the p50 latency of any input type
+grew by more than --threshold, or if it had more failed runs than the
+baseline.
+
+It runs offline anywhere, including Linux, where the pure-Python
+backend stands in for unzip, codesign, pkgutil and friends; every input
+type should finish with 0 failed runs. The pkg fixture is only built if
+pkgbuild is available (on OS X).
+
+usage: python benchmarks/bench_end_to_end.py [-n ITERATIONS] [--only NAME]
+           [--baseline FILE] [--save-baseline FILE] [--threshold FRACTION]
+"""
+
+
+import argparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import json
+import math
+import os
+import shutil
+from SocketServer import ThreadingMixIn
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from recipe_robot_lib import http_client
+from recipe_robot_lib.exceptions import RoboError
+from recipe_robot_lib.facts import Facts
+from recipe_robot_lib.har import get_har_log
+from recipe_robot_lib.inspect import process_input_path
+from recipe_robot_lib.profiling import peak_rss
+from recipe_robot_lib.recipe import Recipes
+from recipe_robot_lib.recipe_generator import generate_recipes
+from recipe_robot_lib.robolog import get_logger
+from recipe_robot_lib.roboplist import write_plist
+from recipe_robot_lib.tools import CACHE_DIR, create_dest_dirs
+# pylint: enable=wrong-import-position
+
+
+APP_NAME = "BenchApp"
+APP_VERSION = "1.2.3"
+OWNER = "benchdev"
+RECIPE_TYPES = ("download", "munki", "pkg", "install")
+PKGBUILD = "/usr/bin/pkgbuild"
+DEFAULT_ITERATIONS = 5
+DEFAULT_THRESHOLD = 0.25
+
+# URL prefixes that are served by the fixture server.
+FIXTURE_PREFIXES = (
+    "https://api.github.com/", "https://github.com/",
+    "https://api.bitbucket.org/", "https://bitbucket.org/",
+    "https://sourceforge.net/", "http://sourceforge.net/",
+    "http://www.macupdate.com/", "https://example.com/")
+
+DOWNLOAD_URL = "https://example.com/benchapp/%s-%s.%%s" % (APP_NAME,
+                                                           APP_VERSION)
+APPCAST_URL = "https://example.com/benchapp/appcast.xml"
+GITHUB_URL = "https://github.com/%s/%s" % (OWNER, APP_NAME)
+BITBUCKET_URL = "https://bitbucket.org/%s/%s" % (OWNER, APP_NAME.lower())
+SOURCEFORGE_URL = "https://sourceforge.net/projects/%s/" % APP_NAME.lower()
+MACUPDATE_URL = "http://www.macupdate.com/find/mac/%s" % APP_NAME
+
+MACUPDATE_HTML = """<html><body>
+<span class="app-shortdescrip">A benchmark app.</span>
+</body></html>
+"""
+
+APPCAST = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0"
+     xmlns:sparkle="http://www.andymatuschak.org/xml-namespaces/sparkle">
+  <channel>
+    <title>%(name)s</title>
+    <item>
+      <title>Version 1.0</title>
+      <enclosure url="https://example.com/benchapp/%(name)s-1.0.zip"
+                 sparkle:version="100" sparkle:shortVersionString="1.0"
+                 type="application/octet-stream"/>
+    </item>
+    <item>
+      <title>Version %(version)s</title>
+      <enclosure url="%(url)s" sparkle:version="123"
+                 sparkle:shortVersionString="%(version)s"
+                 type="application/octet-stream"/>
+    </item>
+  </channel>
+</rss>
+"""
+
+SOURCEFORGE_RSS = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:files="https://sourceforge.net/api/files.rdf#">
+  <channel>
+    <item>
+      <title>/%(name)s-%(version)s.zip</title>
+      <link>https://sourceforge.net/projects/%(project)s/files/%(name)s-%(version)s.zip/download</link>
+      <files:extra-info>data</files:extra-info>
+    </item>
+  </channel>
+</rss>
+"""
+
+
+def build_app(work_dir):
+    """Create a minimal app bundle, and return its path."""
+    app_path = os.path.join(work_dir, APP_NAME + ".app")
+    macos_dir = os.path.join(app_path, "Contents", "MacOS")
+    os.makedirs(macos_dir)
+    executable = os.path.join(macos_dir, APP_NAME)
+    with open(executable, "w") as executable_file:
+        executable_file.write("#!/bin/sh\n")
+    os.chmod(executable, 0755)
+    write_plist({"CFBundleExecutable": APP_NAME,
+                 "CFBundleIdentifier": "com.example.%s" % APP_NAME.lower(),
+                 "CFBundleName": APP_NAME,
+                 "CFBundleShortVersionString": APP_VERSION,
+                 "CFBundleVersion": "123",
+                 "SUFeedURL": APPCAST_URL},
+                os.path.join(app_path, "Contents", "Info.plist"))
+    return app_path
+
+
+def build_downloads(work_dir, app_path):
+    """Package the app as each download format, and return their paths.
+
+    Returns:
+        Dict of download format ("zip", "tgz" or "pkg") -> path.
+    """
+    downloads = {}
+    base_path = os.path.join(work_dir, "%s-%s." % (APP_NAME, APP_VERSION))
+
+    downloads["zip"] = base_path + "zip"
+    with zipfile.ZipFile(downloads["zip"], "w") as archive:
+        for dirpath, _, filenames in os.walk(app_path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                archive.write(path, os.path.relpath(path, work_dir))
+
+    downloads["tgz"] = base_path + "tgz"
+    with tarfile.open(downloads["tgz"], "w:gz") as archive:
+        archive.add(app_path, os.path.basename(app_path))
+
+    if os.path.exists(PKGBUILD):
+        downloads["pkg"] = base_path + "pkg"
+        with open(os.devnull, "w") as devnull:
+            subprocess.check_call(
+                [PKGBUILD, "--component", app_path, "--install-location",
+                 "/Applications", downloads["pkg"]],
+                stdout=devnull, stderr=devnull)
+    return downloads
+
+
+def build_fixtures(downloads):
+    """Return the responses to serve, keyed by the URL they answer.
+
+    Returns:
+        Dict of URL -> (content type, body).
+    """
+    with open(downloads["zip"], "rb") as zip_file:
+        app_zip = ("application/zip", zip_file.read())
+    zip_name = os.path.basename(downloads["zip"])
+    as_json = lambda data: ("application/json", json.dumps(data))
+    github_zip_url = "%s/releases/download/v%s/%s" % (
+        GITHUB_URL, APP_VERSION, zip_name)
+    bitbucket_zip_url = "%s/downloads/%s" % (BITBUCKET_URL, zip_name)
+    github_api = "https://api.github.com/repos/%s/%s" % (OWNER, APP_NAME)
+    bitbucket_api = "https://api.bitbucket.org/2.0/repositories/%s/%s" % (
+        OWNER, APP_NAME.lower())
+    project = APP_NAME.lower()
+
+    fixtures = {
+        APPCAST_URL: ("application/rss+xml", APPCAST % {
+            "name": APP_NAME, "version": APP_VERSION,
+            "url": DOWNLOAD_URL % "zip"}),
+        github_api: as_json({"name": APP_NAME,
+                             "description": "A benchmark app.",
+                             "private": False}),
+        github_api + "/releases/latest": as_json({"assets": [
+            {"browser_download_url": github_zip_url}]}),
+        "https://api.github.com/users/%s" % OWNER: as_json(
+            {"name": "Bench Developer"}),
+        github_zip_url: app_zip,
+        bitbucket_api: as_json({"name": APP_NAME,
+                                "description": "A benchmark app.",
+                                "owner": {"display_name": "Bench Developer"},
+                                "is_private": False}),
+        bitbucket_api + "/downloads": as_json({"values": [
+            {"links": {"self": {"href": bitbucket_zip_url}}}]}),
+        bitbucket_zip_url: app_zip,
+        "https://sourceforge.net/rest/p/%s" % project: as_json({
+            "shortname": project, "name": APP_NAME,
+            "summary": "A benchmark app.", "short_description": "",
+            "tools": [{"sourceforge_group_id": 123456}]}),
+        "http://sourceforge.net/projects/%s/rss" % project: (
+            "application/rss+xml", SOURCEFORGE_RSS % {
+                "name": APP_NAME, "version": APP_VERSION,
+                "project": project}),
+        "https://sourceforge.net/projects/%s/files/%s" % (
+            project, zip_name): app_zip,
+        MACUPDATE_URL: ("text/html", MACUPDATE_HTML)}
+    for download_format, path in downloads.items():
+        with open(path, "rb") as download_file:
+            fixtures[DOWNLOAD_URL % download_format] = (
+                "application/octet-stream", download_file.read())
+    return fixtures
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the fixture for /<scheme>/<host>/<path>, or a 404."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        scheme, _, rest = self.path.lstrip("/").partition("/")
+        fixture = self.server.fixtures.get("%s://%s" % (scheme, rest))
+        if fixture is None:
+            self.send_error(404)
+            return
+        content_type, body = fixture
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer(ThreadingMixIn, HTTPServer):
+    """Serves fixtures on localhost, on a free port."""
+
+    daemon_threads = True
+
+    def __init__(self, fixtures):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FixtureHandler)
+        self.fixtures = fixtures
+        self.host = "127.0.0.1:%d" % self.server_port
+        self.base_url = "http://" + self.host
+
+    def url_rewrites(self):
+        """Return the http_client URL rewrites that point here."""
+        rewrites = {}
+        for prefix in FIXTURE_PREFIXES:
+            scheme, _, rest = prefix.partition("://")
+            rewrites[prefix] = "%s/%s/%s" % (self.base_url, scheme, rest)
+        return rewrites
+
+
+def make_args(input_path):
+    """Return command line arguments for a non-interactive run."""
+    return argparse.Namespace(
+        input_path=input_path, app_mode=True, config=False, debug=False,
+        github_token=False, ignore_existing=True, keep_cache=False,
+        refresh_shared_processors=False, search_dump=None, verbose=False)
+
+
+def make_prefs(recipe_dir):
+    """Return preferences that generate RECIPE_TYPES into recipe_dir."""
+    return {"RecipeCreateCount": 0,
+            "RecipeCreateLocation": recipe_dir,
+            "RecipeIdentifierPrefix": "com.example.benchmark",
+            "RecipeTypes": list(RECIPE_TYPES)}
+
+
+def run_once(input_path, recipe_dir, fixture_host):
+    """Inspect input_path and generate its recipes.
+
+    Args:
+        input_path: The input path to run.
+        recipe_dir: Directory to write the recipes to.
+        fixture_host: The fixture server's host:port. Requesting any
+            other host raises RoboError, since it means the run wasn't
+            offline.
+
+    Returns:
+        The Facts of the run.
+    """
+    # Start from an empty cache, as a new run of recipe-robot would.
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    create_dest_dirs(CACHE_DIR)
+    shutil.rmtree(recipe_dir, ignore_errors=True)
+    get_har_log().clear()
+    facts = Facts()
+    facts["args"] = make_args(input_path)
+    facts["recipes"] = Recipes()
+    for recipe in facts["recipes"]:
+        recipe["preferred"] = recipe["type"] in RECIPE_TYPES
+    with get_logger().capture():
+        process_input_path(facts)
+        generate_recipes(facts, make_prefs(recipe_dir))
+    live_hosts = [host["host"] for host in get_har_log().host_summary()
+                  if host["host"] != fixture_host]
+    if live_hosts:
+        raise RoboError("Requested hosts that aren't fixtures: %s" %
+                        ", ".join(live_hosts))
+    return facts
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers."""
+    values = sorted(values)
+    index = max(0, int(math.ceil(fraction * len(values))) - 1)
+    return values[index]
+
+
+def run_scenario(input_path, iterations, recipe_dir, fixture_host):
+    """Run one input type repeatedly, and return its measurements.
+
+    Failed runs (no recipes written, or an exception) are counted, but
+    left out of the latencies, so failing fast can't look like a
+    speedup. p50, p95 and throughput are None if every run failed.
+    """
+    latencies = []
+    failures = 0
+    for _ in range(iterations):
+        start = time.time()
+        try:
+            facts = run_once(input_path, recipe_dir, fixture_host)
+        except Exception:  # pylint: disable=broad-except
+            failures += 1
+            continue
+        if not [path for path in facts["recipes"]
+                if isinstance(path, basestring)]:
+            failures += 1
+            continue
+        latencies.append(time.time() - start)
+    result = {"iterations": iterations,
+              "failures": failures,
+              "p50": None, "p95": None, "throughput": None,
+              "peak_rss": peak_rss()}
+    if latencies:
+        result.update({"p50": percentile(latencies, 0.5),
+                       "p95": percentile(latencies, 0.95),
+                       "throughput": len(latencies) / sum(latencies)})
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Print how results compare with baseline.
+
+    Returns:
+        True if no input type failed more often than in baseline, and
+        none's p50 grew by more than threshold.
+    """
+    ok = True
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        result, base = results[name], baseline[name]
+        if result["failures"] > base["failures"]:
+            ok = False
+            print "%-12s %d failed runs vs. %d in baseline  REGRESSION" % (
+                name, result["failures"], base["failures"])
+            continue
+        if result["p50"] is None or base["p50"] is None:
+            continue
+        change = result["p50"] / base["p50"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print "%-12s p50 %+6.1f%% vs. baseline%s" % (
+            name, change * 100, "  REGRESSION" if regressed else "")
+    return ok
+
+
+def main():
+    """Run every scenario and report (and compare) the results."""
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark of Recipe Robot.")
+    parser.add_argument("-n", "--iterations", type=int,
+                        default=DEFAULT_ITERATIONS)
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="Only run this input type (repeatable).")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        metavar="FRACTION",
+                        help="Allowed p50 growth over the baseline.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    server = None
+    try:
+        app_path = build_app(work_dir)
+        downloads = build_downloads(work_dir, app_path)
+        server = FixtureServer(build_fixtures(downloads))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        http_client.set_url_rewrites(server.url_rewrites())
+
+        scenarios = [("app", app_path), ("sparkle", APPCAST_URL),
+                     ("github", GITHUB_URL), ("bitbucket", BITBUCKET_URL),
+                     ("sourceforge", SOURCEFORGE_URL)]
+        scenarios += [("download_%s" % download_format,
+                       DOWNLOAD_URL % download_format)
+                      for download_format in sorted(downloads)]
+        if args.only:
+            scenarios = [scenario for scenario in scenarios
+                         if scenario[0] in args.only]
+
+        recipe_dir = os.path.join(work_dir, "recipes")
+        results = {}
+        print "%-16s %6s %9s %9s %10s %10s" % (
+            "input type", "failed", "p50", "p95", "runs/s", "peak RSS")
+        for name, input_path in scenarios:
+            result = run_scenario(input_path, args.iterations, recipe_dir,
+                                  server.host)
+            results[name] = result
+            if result["p50"] is None:
+                print "%-16s %6d %9s %9s %10s %8.1fMB" % (
+                    name, result["failures"], "-", "-", "-",
+                    result["peak_rss"] / 1048576.0)
+                continue
+            print "%-16s %6d %8.3fs %8.3fs %10.2f %8.1fMB" % (
+                name, result["failures"], result["p50"], result["p95"],
+                result["throughput"], result["peak_rss"] / 1048576.0)
+    finally:
+        http_client.set_url_rewrites({})
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(work_dir)
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+bench_plist.py
+
+Benchmark writing and reading recipes with recipe_robot_lib.roboplist,
+FoundationPlist (when PyObjC is available) and plistlib.
+
+usage: python benchmarks/bench_plist.py [recipe_count ...]
+"""
+
+
+import os
+import plistlib
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from recipe_robot_lib import roboplist
+try:
+    from recipe_robot_lib.FoundationPlist import FoundationPlist
+except ImportError:
+    FoundationPlist = None
+# pylint: enable=wrong-import-position
+
+
+def make_recipe(index):
+    """Build a recipe dict shaped like the ones Recipe Robot writes."""
+    name = "App%d" % index
+    return {
+        "Identifier": "com.github.example.munki.%s" % name,
+        "MinimumVersion": "0.6.1",
+        "ParentRecipe": "com.github.example.download.%s" % name,
+        "Description": "Downloads the latest version of %s and imports "
+                       "it into Munki." % name,
+        "Comment": "Created with Recipe Robot",
+        "Input": {
+            "NAME": name,
+            "MUNKI_REPO_SUBDIR": "apps/%NAME%",
+            "pkginfo": {
+                "catalogs": ["testing"],
+                "description": "An app & its <helpers>.",
+                "developer": "Example Corp",
+                "display_name": name,
+                "name": "%NAME%",
+                "unattended_install": True}},
+        "Process": [
+            {"Processor": "AppDmgVersioner",
+             "Arguments": {"dmg_path": "%pathname%"}},
+            {"Processor": "MunkiImporter",
+             "Arguments": {"pkg_path": "%pathname%",
+                           "repo_subdirectory": "%MUNKI_REPO_SUBDIR%",
+                           "version_comparison_key":
+                               "CFBundleShortVersionString"}}]}
+
+
+def time_backend(write, read, recipes, tmp_dir):
+    """Return (write seconds, read seconds) for all recipes."""
+    paths = [os.path.join(tmp_dir, "App%d.munki.recipe" % index)
+             for index in range(len(recipes))]
+    start = time.time()
+    for recipe, path in zip(recipes, paths):
+        write(recipe, path)
+    written = time.time()
+    for path in paths:
+        read(path)
+    return written - start, time.time() - written
+
+
+def main():
+    """Time each backend for each recipe count."""
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    backends = [("roboplist", roboplist.write_plist, roboplist.read_plist),
+                ("plistlib", plistlib.writePlist, plistlib.readPlist)]
+    if FoundationPlist is not None:
+        backends.append(("Foundation", FoundationPlist.writePlist,
+                         FoundationPlist.readPlist))
+    print "%8s %12s %12s %12s" % ("recipes", "backend", "write", "read")
+    for count in counts:
+        recipes = [make_recipe(index) for index in range(count)]
+        for name, write, read in backends:
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                write_time, read_time = time_backend(
+                    write, read, recipes, tmp_dir)
+            finally:
+                shutil.rmtree(tmp_dir)
+            print "%8d %12s %10.1fms %10.1fms" % (
+                count, name, write_time * 1000, read_time * 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+bench_startup.py
+
+Benchmark Recipe Robot's cold-start time, with a breakdown of the time
+spent importing each module (like Python 3's -X importtime).
+
+Each run is a new Python process, in one of these scenarios:
+
+    help      recipe-robot --help
+    config    recipe-robot --config, up to its first prompt (stdin is
+              empty, so the run ends there)
+    generate  Generating recipes from a facts file saved with
+              recipe-robot --save-facts (only with --facts FILE). The
+              recipes are written to a temporary directory, and the
+              user's preferences aren't used.
+
+The p50 and fastest wall time of each scenario are reported, followed by
+the modules that took the longest to import in its last run. Results
+can be saved, and later runs compared with them:
+
+    python benchmarks/bench_startup.py --save-baseline startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+
+The comparison fails (exit code 1) if the p50 of any scenario grew by
+more than --threshold.
+
+usage: python benchmarks/bench_startup.py [-n ITERATIONS] [--facts FILE]
+           [--top N] [--baseline FILE] [--save-baseline FILE]
+           [--threshold FRACTION]
+"""
+
+
+import __builtin__
+import argparse
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPE_ROBOT = os.path.join(SCRIPTS_DIR, "recipe-robot")
+
+DEFAULT_ITERATIONS = 10
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_TOP = 10
+
+# Scenario -> recipe-robot arguments.
+SCRIPT_SCENARIOS = (("help", ["--help"]), ("config", ["--config"]))
+
+
+class ImportTimer(object):
+    """Times every import that loads new modules, by requested name."""
+
+    def __init__(self):
+        # Module name -> (self seconds, cumulative seconds).
+        self.times = {}
+        # Seconds spent in nested imports, for each import in progress.
+        self._nested = []
+        self._import = None
+
+    def install(self):
+        """Start timing imports."""
+        self._import = __builtin__.__import__
+        __builtin__.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=None,
+                      level=-1):  # pylint: disable=redefined-builtin
+        loaded = len(sys.modules)
+        self._nested.append(0.0)
+        start = time.time()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.time() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            # "from . import x" has no name, so it's listed as ".x".
+            label = name or "." + ", .".join(fromlist or ())
+            if len(sys.modules) > loaded and label not in self.times:
+                self.times[label] = (elapsed - nested, elapsed)
+
+
+def run_generation(facts_path):
+    """Generate recipes from a facts file into a temporary directory."""
+    from recipe_robot_lib.facts import Facts
+    from recipe_robot_lib.recipe import Recipes
+    from recipe_robot_lib.recipe_generator import generate_recipes
+    from recipe_robot_lib.robolog import get_logger
+
+    recipe_dir = tempfile.mkdtemp()
+    try:
+        facts = Facts()
+        facts["args"] = argparse.Namespace(
+            input_path=None, app_mode=True, config=False, debug=False,
+            from_facts=facts_path, github_token=False, ignore_existing=True,
+            keep_cache=False, refresh_shared_processors=False,
+            search_dump=None, verbose=False)
+        facts["recipes"] = Recipes()
+        recipe_types = [recipe["type"] for recipe in facts["recipes"]]
+        with get_logger().capture():
+            facts.load(facts_path)
+            generate_recipes(facts, {"RecipeCreateCount": 0,
+                                     "RecipeCreateLocation": recipe_dir,
+                                     "RecipeIdentifierPrefix":
+                                         "com.example.benchmark",
+                                     "RecipeTypes": recipe_types})
+    finally:
+        shutil.rmtree(recipe_dir)
+
+
+def run_child(scenario, output_path, facts_path):
+    """Run one scenario in this process, timing its imports.
+
+    The import times are written to output_path as JSON when the
+    process exits, since recipe-robot ends by calling sys.exit().
+    """
+    timer = ImportTimer()
+
+    def write_times():
+        with open(output_path, "w") as output_file:
+            json.dump(timer.times, output_file)
+    atexit.register(write_times)
+
+    timer.install()
+    sys.path.insert(0, SCRIPTS_DIR)
+    if scenario == "generate":
+        run_generation(facts_path)
+    else:
+        sys.argv = [RECIPE_ROBOT] + dict(SCRIPT_SCENARIOS)[scenario]
+        execfile(RECIPE_ROBOT, {"__name__": "__main__",
+                                "__file__": RECIPE_ROBOT})
+
+
+def time_scenario(scenario, iterations, facts_path):
+    """Run a scenario in new processes.
+
+    Returns:
+        (list of wall times, import times of the last run) tuple.
+    """
+    output_fd, output_path = tempfile.mkstemp(suffix=".json")
+    os.close(output_fd)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", scenario,
+           "--output", output_path]
+    if facts_path:
+        cmd += ["--facts", facts_path]
+    wall_times = []
+    imports = {}
+    try:
+        with open(os.devnull, "r+") as devnull:
+            for _ in range(iterations):
+                start = time.time()
+                subprocess.call(cmd, stdin=devnull, stdout=devnull,
+                                stderr=devnull)
+                wall_times.append(time.time() - start)
+        with open(output_path) as output_file:
+            imports = json.loads(output_file.read() or "{}")
+    finally:
+        os.remove(output_path)
+    return wall_times, imports
+
+
+def compare(results, baseline, threshold):
+    """Print how results compare with baseline.
+
+    Returns:
+        True if no scenario's p50 grew by more than threshold.
+    """
+    ok = True
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        change = results[name]["p50"] / baseline[name]["p50"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print "%-10s p50 %+6.1f%% vs. baseline%s" % (
+            name, change * 100, "  REGRESSION" if regressed else "")
+    return ok
+
+
+def main():
+    """Time each scenario, and report (and compare) the results."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark Recipe Robot's startup time.")
+    parser.add_argument("-n", "--iterations", type=int,
+                        default=DEFAULT_ITERATIONS)
+    parser.add_argument("--facts", metavar="FILE",
+                        help="Facts file for the generate scenario.")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP,
+                        help="Number of slowest imports to show.")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        metavar="FRACTION",
+                        help="Allowed p50 growth over the baseline.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.output, args.facts)
+        return
+
+    scenarios = [name for name, _ in SCRIPT_SCENARIOS]
+    if args.facts:
+        scenarios.append("generate")
+    results = {}
+    for scenario in scenarios:
+        wall_times, imports = time_scenario(scenario, args.iterations,
+                                            args.facts)
+        wall_times.sort()
+        results[scenario] = {"p50": wall_times[len(wall_times) // 2],
+                             "min": wall_times[0]}
+        print "%s: p50 %.3fs, fastest %.3fs" % (
+            scenario, results[scenario]["p50"], results[scenario]["min"])
+        print "    %10s %10s  %s" % ("self", "cumulative", "module")
+        slowest = sorted(imports.items(), key=lambda item: -item[1][0])
+        for name, (self_time, cumulative) in slowest[:args.top]:
+            print "    %8.1fms %8.1fms  %s" % (
+                self_time * 1000, cumulative * 1000, name)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+bench_version.py
+
+Microbenchmark comparing the old LooseVersion loop used to pick the
+newest Sparkle enclosure with recipe_robot_lib.version.max_by_version.
+
+usage: python benchmarks/bench_version.py [enclosure_count ...]
+"""
+
+
+from distutils.version import LooseVersion
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipe_robot_lib import version  # pylint: disable=wrong-import-position
+
+
+def make_enclosures(count, seed=0):
+    """Build a synthetic list of (version, url) enclosures."""
+    rng = random.Random(seed)
+    enclosures = []
+    for _ in range(count):
+        this_version = "%d.%d.%d" % (rng.randint(0, 12), rng.randint(0, 30),
+                                     rng.randint(0, 99))
+        if rng.random() < 0.2:
+            this_version += "b%d" % rng.randint(1, 9)
+        enclosures.append(
+            (this_version, "https://example.com/App-%s.zip" % this_version))
+    return enclosures
+
+
+def loose_version_loop(enclosures):
+    """The selection loop inspect_sparkle_feed_url used to run."""
+    latest_version = "0"
+    latest_url = ""
+    for this_version, url in enclosures:
+        if LooseVersion(this_version) > LooseVersion(latest_version):
+            latest_version = this_version
+            latest_url = url
+    return latest_version, latest_url
+
+
+def shared_engine(enclosures):
+    """The selection inspect_sparkle_feed_url runs now."""
+    return version.max_by_version(enclosures,
+                                  key=lambda enclosure: enclosure[0])
+
+
+def main():
+    """Time both implementations for each enclosure count."""
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 10000]
+    print "%10s %14s %14s %8s" % ("enclosures", "LooseVersion", "version", "speedup")
+    for count in counts:
+        enclosures = make_enclosures(count)
+        number = max(1, 20000 // count)
+        loose = min(timeit.repeat(lambda: loose_version_loop(enclosures),
+                                  number=number, repeat=3)) / number
+        shared = min(timeit.repeat(lambda: shared_engine(enclosures),
+                                   number=number, repeat=3)) / number
+        print "%10d %12.3fms %12.3fms %7.1fx" % (
+            count, loose * 1000, shared * 1000, loose / shared)
+
+
+if __name__ == "__main__":
+    main()
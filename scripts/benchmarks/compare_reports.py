@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+compare_reports.py
+
+Summarize performance reports written with "recipe-robot --report FILE"
+by Recipe Robot version, to spot performance regressions.
+
+usage: python benchmarks/compare_reports.py [--json] REPORT [REPORT ...]
+"""
+
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipe_robot_lib import report  # pylint: disable=wrong-import-position
+
+
+def version_key(version):
+    """Sort versions like "1.0.10" after "1.0.2"."""
+    return [int(part) if part.isdigit() else part
+            for part in version.split(".")]
+
+
+def median(summary, key):
+    """Return the median of a summary's measurement, or 0 if missing."""
+    return summary[key]["median"] if key in summary else 0
+
+
+def main():
+    """Print the median measurements of each version's runs."""
+    args = sys.argv[1:]
+    as_json = "--json" in args
+    paths = [arg for arg in args if arg != "--json"]
+    if not paths:
+        print __doc__.strip().splitlines()[-1]
+        sys.exit(1)
+    summaries = report.aggregate_reports(
+        [report.read_report(path) for path in paths])
+    if as_json:
+        print json.dumps(summaries, indent=2, sort_keys=True)
+        return
+
+    print "%-10s %5s %6s %10s %10s %10s %10s" % (
+        "version", "runs", "failed", "time", "commands", "received",
+        "peak RSS")
+    for version in sorted(summaries, key=version_key):
+        summary = summaries[version]
+        print "%-10s %5d %6d %9.2fs %9.2fs %8.1fKB %8.1fMB" % (
+            version, summary["runs"], summary["failures"],
+            median(summary, "execution_time"),
+            median(summary, "command_seconds"),
+            median(summary, "bytes_received") / 1024.0,
+            median(summary, "peak_rss") / 1048576.0)
+
+
+if __name__ == "__main__":
+    main()
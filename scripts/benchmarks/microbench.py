@@ -0,0 +1,301 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+microbench.py
+
+Microbenchmarks of the parsers and data structures that Recipe Robot
+runs on every input, with synthetic inputs of several sizes:
+
+    sparkle_feed     Parsing a Sparkle feed and picking the newest
+                     enclosure (10 to 10,000 enclosures).
+    info_plist       Reading the keys inspect_app needs from an app's
+                     Info.plist (10 to 1,000 other keys).
+    package_info     Reading a flat package's PackageInfo (10 to 1,000
+                     bundles).
+    github_assets    Parsing a GitHub release and picking its download
+                     asset (10 to 10,000 assets).
+    search_results   Indexing "autopkg search" output and looking up
+                     an app (1 to 5,000 result lines).
+    recipe_write     Writing a recipe (1 to 100 processors).
+    facts            Setting and getting facts (100 to 10,000 of each).
+
+Each benchmark is timed with timeit, and the best time per call is
+reported. Results can be saved, and later runs compared with them:
+
+    python benchmarks/microbench.py --save-baseline baseline.json
+    python benchmarks/microbench.py --baseline baseline.json
+
+The comparison fails (exit code 1) if any benchmark is slower than its
+baseline by more than --threshold. Compare results from the same
+machine only.
+
+usage: python benchmarks/microbench.py [--only NAME] [--baseline FILE]
+           [--save-baseline FILE] [--threshold FRACTION]
+"""
+
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+from xml.etree.ElementTree import fromstring
+from xml.sax.saxutils import quoteattr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bench_plist import make_recipe
+from bench_version import make_enclosures
+from recipe_robot_lib.facts import Facts
+from recipe_robot_lib.inspect import (INFO_PLIST_KEYS, get_sparkle_enclosures,
+                                      parse_package_info,
+                                      select_download_asset)
+from recipe_robot_lib.recipe import Recipe
+from recipe_robot_lib.recipe_index import RecipeIndex
+from recipe_robot_lib.roboplist import read_plist_keys, write_plist
+from recipe_robot_lib.version import max_by_version
+# pylint: enable=wrong-import-position
+
+
+DEFAULT_THRESHOLD = 0.25
+# Minimum seconds each timing repeat should take.
+MIN_REPEAT_TIME = 0.1
+REPEATS = 3
+
+SPARKLE_NS = "http://www.andymatuschak.org/xml-namespaces/sparkle"
+
+
+def setup_sparkle_feed(count, _):
+    """Return a benchmark that parses a feed of count enclosures."""
+    items = []
+    for version, url in make_enclosures(count):
+        items.append(
+            "<item><title>Version %s</title><enclosure url=%s "
+            "sparkle:shortVersionString=%s length=\"1024\" "
+            "type=\"application/octet-stream\"/></item>" % (
+                version, quoteattr(url), quoteattr(version)))
+    feed = ("<?xml version=\"1.0\" encoding=\"utf-8\"?>"
+            "<rss version=\"2.0\" xmlns:sparkle=\"%s\"><channel>%s"
+            "</channel></rss>" % (SPARKLE_NS, "".join(items)))
+
+    def run():
+        enclosures = get_sparkle_enclosures(fromstring(feed))
+        return max_by_version(enclosures, key=lambda enclosure: enclosure[0])
+    return run
+
+
+def setup_info_plist(count, tmp_dir):
+    """Return a benchmark that reads an Info.plist with count extra keys."""
+    info = dict(("CFBundleDocumentType%d" % index,
+                 {"CFBundleTypeExtensions": ["ext%d" % index],
+                  "CFBundleTypeRole": "Viewer"})
+                for index in range(count))
+    info.update({"CFBundleExecutable": "App", "CFBundleIdentifier":
+                 "com.example.app", "CFBundleName": "App",
+                 "CFBundleShortVersionString": "1.2.3",
+                 "CFBundleVersion": "123",
+                 "SUFeedURL": "https://example.com/appcast.xml"})
+    path = os.path.join(tmp_dir, "Info-%d.plist" % count)
+    write_plist(info, path)
+    return lambda: read_plist_keys(path, INFO_PLIST_KEYS)
+
+
+def setup_package_info(count, tmp_dir):
+    """Return a benchmark that reads a PackageInfo of count bundles."""
+    bundles = "".join(
+        "<bundle id=\"com.example.bundle%d\" CFBundleVersion=\"1.0\" "
+        "path=\"./App.app/Contents/PlugIns/Plugin%d.bundle\"/>" % (
+            index, index) for index in range(count))
+    path = os.path.join(tmp_dir, "PackageInfo-%d" % count)
+    with open(path, "w") as pkginfo_file:
+        pkginfo_file.write(
+            "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
+            "<pkg-info format-version=\"2\" identifier=\"com.example.app\" "
+            "version=\"1.2.3\" install-location=\"/Applications/App.app\" "
+            "auth=\"root\"><payload numberOfFiles=\"%d\" "
+            "installKBytes=\"1024\"/><bundle id=\"com.example.app\" "
+            "path=\"./App.app\">%s</bundle><scripts/></pkg-info>" % (
+                count, bundles))
+    return lambda: parse_package_info(path)
+
+
+def setup_github_assets(count, _):
+    """Return a benchmark that picks from a release of count assets."""
+    rng = random.Random(0)
+    formats = ("zip", "dmg", "tar.gz", "txt", "sha256", "pkg")
+    assets = []
+    for version, _ in make_enclosures(count):
+        name = "App-%s.%s" % (version, rng.choice(formats))
+        assets.append({
+            "name": name, "size": 1024, "download_count": 0,
+            "browser_download_url": "https://github.com/example/App/"
+                                    "releases/download/v%s/%s" % (version,
+                                                                  name)})
+    release = json.dumps({"tag_name": "v1.0", "assets": assets})
+
+    def run():
+        return select_download_asset(
+            asset["browser_download_url"]
+            for asset in json.loads(release)["assets"])
+    return run
+
+
+def setup_search_results(count, tmp_dir):
+    """Return a benchmark that indexes count lines of search output."""
+    types = ("download", "munki", "pkg", "install", "jss")
+    path = os.path.join(tmp_dir, "search-%d.txt" % count)
+    with open(path, "w") as dump_file:
+        for index in range(count):
+            dump_file.write("App%d.%s.recipe  example-recipes  "
+                            "App%d/App%d.%s.recipe\n" % (
+                                index, types[index % len(types)], index,
+                                index, types[index % len(types)]))
+
+    def run():
+        index = RecipeIndex(index_path=None)
+        index.update(search_dump=path)
+        return index.find("App %d" % (count // 2), "com.example.app")
+    return run
+
+
+def setup_recipe_write(count, tmp_dir):
+    """Return a benchmark that writes a recipe of count processors."""
+    recipe = Recipe("munki", "Imports App into Munki.")
+    recipe["keys"].update(make_recipe(0))
+    processors = recipe["keys"]["Process"]
+    recipe["keys"]["Process"] = [processors[index % len(processors)]
+                                 for index in range(count)]
+    path = os.path.join(tmp_dir, "App-%d.munki.recipe" % count)
+    return lambda: recipe.write(path)
+
+
+def setup_facts(count, _):
+    """Return a benchmark that sets and gets count facts."""
+    keys = ["fact_%d" % index for index in range(count)]
+
+    def run():
+        facts = Facts()
+        for key in keys:
+            facts[key] = key
+        for key in keys:
+            facts.get(key)
+        return facts
+    return run
+
+
+# Benchmark name -> (setup function, sizes).
+BENCHMARKS = (
+    ("sparkle_feed", setup_sparkle_feed, (10, 100, 1000, 10000)),
+    ("info_plist", setup_info_plist, (10, 100, 1000)),
+    ("package_info", setup_package_info, (10, 100, 1000)),
+    ("github_assets", setup_github_assets, (10, 100, 1000, 10000)),
+    ("search_results", setup_search_results, (1, 50, 500, 5000)),
+    ("recipe_write", setup_recipe_write, (1, 10, 100)),
+    ("facts", setup_facts, (100, 1000, 10000)),
+)
+
+
+def time_call(func):
+    """Return the best seconds per call of func."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= MIN_REPEAT_TIME:
+            break
+        number *= 10 if elapsed < MIN_REPEAT_TIME / 10 else 2
+    best = min([elapsed] + timeit.repeat(func, number=number,
+                                         repeat=REPEATS - 1))
+    return best / number
+
+
+def run_benchmarks(only=None):
+    """Run the benchmarks, printing each result as it's measured.
+
+    Args:
+        only: Names of the benchmarks to run, or None for all of them.
+
+    Returns:
+        Dict of "name/size" -> seconds per call.
+    """
+    results = {}
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for name, setup, sizes in BENCHMARKS:
+            if only and name not in only:
+                continue
+            for size in sizes:
+                seconds = time_call(setup(size, tmp_dir))
+                key = "%s/%d" % (name, size)
+                results[key] = seconds
+                print "%-22s %12.3fms" % (key, seconds * 1000)
+    finally:
+        shutil.rmtree(tmp_dir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print how results compare with baseline.
+
+    Returns:
+        True if no benchmark is slower than threshold allows.
+    """
+    ok = True
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        change = results[key] / baseline[key] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print "%-22s %+7.1f%% vs. baseline%s" % (
+            key, change * 100, "  REGRESSION" if regressed else "")
+    return ok
+
+
+def main():
+    """Run the benchmarks and save or compare the results."""
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks of Recipe Robot's parsers.")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        choices=[benchmark[0] for benchmark in BENCHMARKS],
+                        help="Only run this benchmark (repeatable).")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        metavar="FRACTION",
+                        help="Allowed slowdown over the baseline.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
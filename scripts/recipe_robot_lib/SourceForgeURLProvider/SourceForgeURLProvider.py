@@ -1,15 +1,19 @@
 #!/usr/bin/env python
 
 import datetime
+import json
+import os
 import re
-from xml.dom.minidom import parse, parseString
 import urllib2
+from xml.etree.ElementTree import iterparse
 
 from autopkglib import Processor, ProcessorError
 
 __all__ = ["SourceForgeURLProvider"]
 
 FILE_INDEX_URL = 'http://sourceforge.net/api/file/index/project-id/%s/rss'
+PUBDATE_FORMAT = '%a, %d %b %Y %H:%M:%S UT'
+CHUNK_SIZE = 65536
 
 class SourceForgeURLProvider(Processor):
     '''Provides URL to the latest file that matches a pattern for a particular SourceForge project.'''
@@ -32,43 +36,118 @@ class SourceForgeURLProvider(Processor):
 
     description = __doc__
 
-    def get_sf_file_url(self, proj_id, pattern):
-        flisturl = FILE_INDEX_URL % proj_id
+    def get_cache_paths(self, proj_id):
+        '''Return (rss_path, metadata_path) for the cached file index, or
+        (None, None) if there is no recipe cache to keep it in.'''
+        cache_dir = self.env.get('RECIPE_CACHE_DIR')
+        if not cache_dir:
+            return None, None
+        rss_path = os.path.join(cache_dir, 'SourceForgeURLProvider',
+                                'project-%s.rss' % proj_id)
+        return rss_path, rss_path + '.json'
+
+    def open_rss(self, flisturl, rss_path, meta_path):
+        '''Return a file object for the file index RSS.
+
+        When a cached copy exists, the request is made conditional on its
+        ETag/Last-Modified headers and the cached copy is reused if the
+        server reports it unchanged.'''
+        request = urllib2.Request(flisturl)
+        meta = {}
+        if rss_path and os.path.exists(rss_path):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (IOError, ValueError):
+                meta = {}
+            if meta.get('url') == flisturl:
+                if meta.get('etag'):
+                    request.add_header('If-None-Match', meta['etag'])
+                if meta.get('last_modified'):
+                    request.add_header('If-Modified-Since',
+                                       meta['last_modified'])
 
         try:
-            f = urllib2.urlopen(flisturl)
-            rss = f.read()
-            f.close()
+            f = urllib2.urlopen(request)
+        except urllib2.HTTPError as e:
+            if e.code == 304 and meta:
+                self.output('RSS feed unchanged, using cached copy',
+                            verbose_level=2)
+                return open(rss_path, 'rb')
+            raise ProcessorError('Could not retrieve RSS feed %s' % flisturl)
         except BaseException as e:
             raise ProcessorError('Could not retrieve RSS feed %s' % flisturl)
 
-        re_file = re.compile(self.env.get('SOURCEFORGE_FILE_PATTERN'), re.I)
-
-        rss_parse = parseString(rss)
-
-        items = []
-
-        for i in  rss_parse.getElementsByTagName('item'):
-            pubDate = i.getElementsByTagName('pubDate')[0].firstChild.nodeValue
-            link = i.getElementsByTagName('link')[0].firstChild.nodeValue
+        if not rss_path:
+            return f
 
-            pubDatetime = datetime.datetime.strptime(pubDate, '%a, %d %b %Y %H:%M:%S UT')
-
-            if re_file.search(link):
-                items.append((pubDatetime, link),)
+        # Stream the feed into the cache, then parse it from disk.
+        try:
+            if not os.path.isdir(os.path.dirname(rss_path)):
+                os.makedirs(os.path.dirname(rss_path))
+            tmp_path = rss_path + '.download'
+            with open(tmp_path, 'wb') as cache_file:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    cache_file.write(chunk)
+            os.rename(tmp_path, rss_path)
+            headers = f.info()
+            with open(meta_path, 'w') as meta_file:
+                json.dump({'url': flisturl,
+                           'etag': headers.getheader('ETag'),
+                           'last_modified': headers.getheader('Last-Modified')},
+                          meta_file)
+        except (IOError, OSError) as e:
+            raise ProcessorError('Could not cache RSS feed %s: %s'
+                                 % (flisturl, e))
+        finally:
+            f.close()
 
-        items.sort(key=lambda r: r[0])
+        return open(rss_path, 'rb')
 
-        if len(items) < 1:
+    def get_sf_file_url(self, proj_id, re_file):
+        flisturl = FILE_INDEX_URL % proj_id
+        rss_path, meta_path = self.get_cache_paths(proj_id)
+        rss = self.open_rss(flisturl, rss_path, meta_path)
+
+        # Keep only the newest matching item. Dates are only parsed for
+        # items whose link matches. Equal dates go to the later item,
+        # as they did when the full list was sorted.
+        latest_date = None
+        latest_link = None
+        try:
+            for _, elem in iterparse(rss):
+                if elem.tag != 'item':
+                    continue
+                link = elem.findtext('link')
+                if link and re_file.search(link):
+                    pubDatetime = datetime.datetime.strptime(
+                        elem.findtext('pubDate'), PUBDATE_FORMAT)
+                    if latest_date is None or pubDatetime >= latest_date:
+                        latest_date = pubDatetime
+                        latest_link = link
+                elem.clear()
+        except SyntaxError as e:
+            # ParseError subclasses SyntaxError.
+            raise ProcessorError('Could not parse RSS feed %s: %s'
+                                 % (flisturl, e))
+        finally:
+            rss.close()
+
+        if latest_link is None:
             raise ProcessorError('No matched files')
 
-        return items[-1][1]
+        return latest_link
 
     def main(self):
         proj_id  = self.env.get('SOURCEFORGE_PROJECT_ID')
         file_pat = self.env.get('SOURCEFORGE_FILE_PATTERN')
 
-        self.env['url'] = self.get_sf_file_url(proj_id, file_pat)
+        re_file = re.compile(file_pat, re.I)
+
+        self.env['url'] = self.get_sf_file_url(proj_id, re_file)
         self.output('File URL %s' % self.env['url'])
 
 if __name__ == '__main__':
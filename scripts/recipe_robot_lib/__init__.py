@@ -22,6 +22,7 @@ recipe_robot_lib
 """
 
 
-from recipe_generator import generate_recipes
-# TODO (Shea): We can import stuff better here to cut down on length of calls.
-import tools
+# Modules are imported where they're used (e.g. "from
+# recipe_robot_lib.recipe_generator import generate_recipes") rather
+# than here, so that importing one part of the library doesn't load the
+# rest of it.
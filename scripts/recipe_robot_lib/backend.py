@@ -0,0 +1,518 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+backend.py
+
+The platform-specific operations Recipe Robot needs, behind one
+interface, so that inspection and generation also run on platforms
+other than OS X (e.g. Linux build workers).
+
+MacBackend uses the OS X tools and frameworks Recipe Robot always has:
+NSUserDefaults, distributed notifications, extended attributes,
+hdiutil, pkgutil, pax, codesign and sips. PurePythonBackend does what it
+can without them:
+
+    preferences       plist files in ~/.config/recipe-robot
+    notifications     none (there's no Recipe Robot app to listen)
+    extended attrs    none (so no download URL from file metadata)
+    disk images       can't be mounted (raises BackendError)
+    archives          zipfile and tarfile
+    packages          flatpkg (xar and cpio), including signer names
+    code signatures   can't be read (raises BackendError)
+    icons             the largest PNG image inside the icns file
+
+Plists are read and written with roboplist on every platform.
+
+get_backend() returns MacBackend on OS X, and PurePythonBackend
+elsewhere or when RECIPE_ROBOT_BACKEND=pure.
+"""
+
+
+from collections import namedtuple
+import os
+import re
+import struct
+import sys
+import tarfile
+import zipfile
+
+from .commands import run_command
+from .exceptions import BackendError, RoboError
+from . import flatpkg
+from .roboplist import (PlistError, read_plist, read_plist_from_string,
+                        write_plist)
+
+
+# Preference domains.
+RECIPE_ROBOT_DOMAIN = "com.elliotjordan.recipe-robot"
+AUTOPKG_DOMAIN = "com.github.autopkg"
+
+WHERE_FROMS_ATTR = "com.apple.metadata:kMDItemWhereFroms"
+
+# icns element types that hold a PNG image, in order of preference for a
+# 300 pixel icon (Munki's preferred size).
+ICNS_PNG_TYPES = ("ic09", "ic14", "ic08", "ic13", "ic10", "ic07", "ic12",
+                  "ic11")
+PNG_MAGIC = "\x89PNG\r\n\x1a\n"
+
+
+class CodeSignature(namedtuple("CodeSignature",
+                               "requirement authorities version")):
+    """An app's code signature.
+
+    Attributes:
+        requirement: The designated requirement, e.g. 'identifier
+            "com.example.App" and anchor apple generic and ...'.
+        authorities: List of the signing certificates' names, signing
+            certificate first.
+        version: The sealed resources version, as a string ("1" is
+            obsolete), or "" if unknown.
+    """
+
+
+class Backend(object):
+    """Platform-specific operations. See the module docstring."""
+
+    name = None
+
+    def read_prefs(self, domain):
+        """Return a domain's preferences as a dict (empty if none)."""
+        raise NotImplementedError
+
+    def read_pref(self, domain, key):
+        """Return one preference, or None if it isn't set."""
+        return self.read_prefs(domain).get(key)
+
+    def write_prefs(self, domain, prefs):
+        """Set each key in prefs in a domain, keeping other keys."""
+        raise NotImplementedError
+
+    def prefs_path(self, domain):
+        """Return the path of the plist a domain's preferences are in."""
+        raise NotImplementedError
+
+    def notification_transport(self):
+        """Return a notifications.Transport for the app, or None."""
+        return None
+
+    def read_where_froms(self, path):
+        """Return the URLs a downloaded file came from (maybe empty)."""
+        return []
+
+    def mount_disk_image(self, path):
+        """Mount a disk image, and return its mount point.
+
+        Raises:
+            BackendError: The disk image couldn't be mounted.
+        """
+        raise BackendError("Disk images can't be mounted on this platform.")
+
+    def unmount_disk_image(self, mount_point):
+        """Unmount a disk image mounted with mount_disk_image."""
+        pass
+
+    def unpack_archive(self, path, dest):
+        """Unpack a zip or tgz archive into dest.
+
+        Returns:
+            The archive's format, "zip" or "tgz".
+
+        Raises:
+            BackendError: The file isn't an archive that can be unpacked.
+        """
+        raise NotImplementedError
+
+    def package_signature(self, path):
+        """Return the names of the certificates a package is signed with.
+
+        Returns:
+            List of names, signing certificate first, or [] if the
+            package isn't signed.
+
+        Raises:
+            BackendError: Whether the package is signed is unknown.
+        """
+        raise NotImplementedError
+
+    def expand_package(self, path, dest):
+        """Expand a flat package into dest, like pkgutil --expand.
+
+        Raises:
+            BackendError: The package couldn't be expanded.
+        """
+        raise NotImplementedError
+
+    def list_payload_apps(self, path):
+        """Return the names of the apps in a package's Payload.
+
+        Names are as they appear in the payload, e.g. "./Foo.app", and
+        include apps inside other bundles.
+
+        Raises:
+            BackendError: The payload couldn't be read.
+        """
+        raise NotImplementedError
+
+    def extract_payload(self, path, dest, member="."):
+        """Extract a Payload member (by default, all of it) to dest.
+
+        Raises:
+            BackendError: The payload couldn't be extracted.
+        """
+        raise NotImplementedError
+
+    def code_signature(self, path):
+        """Return an app's CodeSignature, or None if it isn't signed.
+
+        Raises:
+            BackendError: Code signatures can't be read here.
+        """
+        raise BackendError(
+            "Code signatures can't be read on this platform.")
+
+    def convert_icon(self, icns_path, png_path, max_size=300):
+        """Convert an icns file to a PNG of at most max_size pixels.
+
+        Raises:
+            BackendError: The icon couldn't be converted.
+        """
+        raise NotImplementedError
+
+
+class MacBackend(Backend):
+    """Uses the tools and frameworks that come with OS X."""
+
+    name = "macos"
+
+    def _user_defaults(self, domain):
+        """Return the NSUserDefaults for a preference domain."""
+        # Loading PyObjC is a large part of Recipe Robot's startup time,
+        # so Foundation is only imported when it's needed.
+        # pylint: disable=no-name-in-module
+        from Foundation import NSUserDefaults
+        # pylint: enable=no-name-in-module
+        return NSUserDefaults.alloc().initWithSuiteName_(domain)
+
+    def read_prefs(self, domain):
+        return self._user_defaults(domain).dictionaryRepresentation()
+
+    def read_pref(self, domain, key):
+        return self._user_defaults(domain).objectForKey_(key)
+
+    def write_prefs(self, domain, prefs):
+        defaults = self._user_defaults(domain)
+        for key, value in prefs.iteritems():
+            defaults.setValue_forKey_(value, key)
+
+    def prefs_path(self, domain):
+        return os.path.expanduser("~/Library/Preferences/%s.plist" % domain)
+
+    def notification_transport(self):
+        from .notifications import DistributedNotificationTransport
+        return DistributedNotificationTransport()
+
+    def read_where_froms(self, path):
+        import xattr
+        try:
+            return read_plist_from_string(
+                xattr.getxattr(path, WHERE_FROMS_ATTR))
+        except (IOError, OSError, PlistError):
+            return []
+
+    def mount_disk_image(self, path):
+        # Determine whether the dmg has a software license agreement.
+        # Inspired by: https://github.com/autopkg/autopkg/blob/master/Code/autopkglib/DmgMounter.py#L74-L98
+        has_sla = False
+        result = run_command(
+            ["/usr/bin/hdiutil", "imageinfo", "-plist", path])
+        if result.exitcode == 0:
+            try:
+                info = read_plist_from_string(result.out)
+                if info.get("Properties", {}).get(
+                        "Software License Agreement") is True:
+                    has_sla = True
+            except PlistError:
+                pass
+
+        result = run_command(
+            ["/usr/bin/hdiutil", "attach", "-nobrowse", "-plist", path],
+            "Y\n" if has_sla else "")
+        if result.exitcode != 0:
+            raise BackendError(result.err)
+        # Clean the output for cases where the dmg has a license
+        # agreement.
+        try:
+            attached = read_plist_from_string(
+                result.out[result.out.find("<?xml"):])
+        except PlistError as error:
+            raise RoboError(
+                "Shoot, I had trouble parsing the output of hdiutil while "
+                "mounting the downloaded dmg. Sorry about that.", error)
+        for entity in attached.get("system-entities", []):
+            if "mount-point" in entity:
+                return entity["mount-point"]
+        raise BackendError("hdiutil didn't mount any volume.")
+
+    def unmount_disk_image(self, mount_point):
+        run_command(["/usr/bin/hdiutil", "detach", mount_point])
+
+    def unpack_archive(self, path, dest):
+        # Unzip the zip. (If this fails, try tgz next.)
+        archive_cmds = (
+            ("zip", ["/usr/bin/unzip", path, "-d", dest]),
+            ("tgz", ["/usr/bin/tar", "-zxvf", path, "-C", dest]))
+        errors = []
+        for archive_format, cmd in archive_cmds:
+            result = run_command(cmd)
+            if result.exitcode == 0:
+                return archive_format
+            errors.append(result.err.strip())
+        raise BackendError("\n".join(errors))
+
+    def package_signature(self, path):
+        result = run_command(
+            ["/usr/sbin/pkgutil", "--check-signature", path])
+        if result.exitcode == 1:
+            return []
+        if result.exitcode != 0:
+            raise BackendError("pkgutil returned exit code %s" %
+                               result.exitcode)
+        # Certificates are listed as "    1. Developer ID Installer: ...".
+        return [line[7:] for line in result.out.split("\n")
+                if re.match(r"^    \d\. ", line)]
+
+    def expand_package(self, path, dest):
+        result = run_command(["/usr/sbin/pkgutil", "--expand", path, dest])
+        if result.exitcode != 0:
+            raise BackendError(result.err)
+
+    def list_payload_apps(self, path):
+        # Payload listings can be long, so only keep the lines that
+        # could be apps.
+        names = []
+        def collect_app_line(line):
+            if line.endswith(".app"):
+                names.append(line)
+        result = run_command([["/usr/bin/gunzip", "-c", path], ["/bin/pax"]],
+                             on_line=collect_app_line)
+        if result.exitcode != 0:
+            raise BackendError(result.err)
+        return names
+
+    def extract_payload(self, path, dest, member="."):
+        if member == ".":
+            substitution = ",./,%s/," % dest
+        else:
+            substitution = ",%s,%s," % (member, dest)
+        result = run_command([["/usr/bin/gunzip", "-c", path],
+                              ["/bin/pax", "-r", "-s", substitution]])
+        if result.exitcode != 0:
+            raise BackendError(result.err)
+
+    def code_signature(self, path):
+        result = run_command(["/usr/bin/codesign", "--display",
+                              "--verbose=2", "-r-", path])
+        if result.exitcode != 0:
+            return None
+        requirement = ""
+        authorities = []
+        version = ""
+        # From stdout:
+        reqs_marker = "designated => "
+        for line in result.out.split("\n"):
+            if line.startswith(reqs_marker):
+                requirement = line[len(reqs_marker):]
+        # From stderr:
+        authority_marker = "Authority="
+        vers_marker = "Sealed Resources version="
+        for line in result.err.split("\n"):
+            if line.startswith(authority_marker):
+                authorities.append(line[len(authority_marker):])
+            if line.startswith(vers_marker):
+                version = line[len(vers_marker):len(vers_marker) + 1]
+        return CodeSignature(requirement, authorities, version)
+
+    def convert_icon(self, icns_path, png_path, max_size=300):
+        result = run_command(["/usr/bin/sips", "-s", "format", "png",
+                              icns_path, "--out", png_path,
+                              "--resampleHeightWidthMax", str(max_size)])
+        if result.exitcode != 0:
+            raise BackendError(result.err)
+
+
+class PurePythonBackend(Backend):
+    """Runs anywhere Python does, with what the standard library offers."""
+
+    name = "pure"
+
+    def __init__(self, prefs_dir=None):
+        """Set up a backend that keeps preferences in prefs_dir.
+
+        Args:
+            prefs_dir: Directory of preference plists. Defaults to
+                recipe-robot in $XDG_CONFIG_HOME (or ~/.config).
+        """
+        if prefs_dir is None:
+            prefs_dir = os.path.join(
+                os.environ.get("XDG_CONFIG_HOME",
+                               os.path.expanduser("~/.config")),
+                "recipe-robot")
+        self.prefs_dir = prefs_dir
+
+    def prefs_path(self, domain):
+        return os.path.join(self.prefs_dir, domain + ".plist")
+
+    def read_prefs(self, domain):
+        path = self.prefs_path(domain)
+        if not os.path.exists(path):
+            return {}
+        try:
+            return read_plist(path)
+        except PlistError as error:
+            raise RoboError("Unable to read preferences from %s." % path,
+                            error)
+
+    def write_prefs(self, domain, prefs):
+        merged = self.read_prefs(domain)
+        merged.update(prefs)
+        if not os.path.isdir(self.prefs_dir):
+            os.makedirs(self.prefs_dir)
+        write_plist(merged, self.prefs_path(domain))
+
+    def unpack_archive(self, path, dest):
+        try:
+            # Members are checked as they're extracted, since an earlier
+            # member (e.g. a symlink) can change where a later one lands.
+            if zipfile.is_zipfile(path):
+                with zipfile.ZipFile(path) as archive:
+                    for member in archive.infolist():
+                        flatpkg.safe_join(dest, member.filename)
+                        archive.extract(member, dest)
+                return "zip"
+            if tarfile.is_tarfile(path):
+                with tarfile.open(path, "r:gz") as archive:
+                    for member in archive:
+                        target = flatpkg.safe_join(dest, member.name)
+                        if member.issym():
+                            flatpkg.check_symlink(dest, target,
+                                                  member.linkname)
+                        elif member.islnk():
+                            member.linkname = os.path.relpath(
+                                flatpkg.safe_join(dest, member.linkname),
+                                dest)
+                        elif not (member.isfile() or member.isdir()):
+                            # Devices and fifos have no place in an app.
+                            continue
+                        # tarfile joins the name to dest itself, so make
+                        # sure it lands on the target that was checked.
+                        member.name = os.path.relpath(target, dest)
+                        archive.extract(member, dest)
+                return "tgz"
+        except (IOError, OSError, zipfile.BadZipfile, tarfile.TarError,
+                flatpkg.FlatPackageError) as error:
+            raise BackendError("Unable to unpack %s: %s" % (path, error))
+        raise BackendError("%s isn't a zip or tgz archive." % path)
+
+    def package_signature(self, path):
+        try:
+            return flatpkg.XarArchive(path).certificate_names()
+        except flatpkg.FlatPackageError as error:
+            raise BackendError(str(error))
+
+    def expand_package(self, path, dest):
+        try:
+            flatpkg.XarArchive(path).extract_all(dest)
+        except flatpkg.FlatPackageError as error:
+            raise BackendError(str(error))
+
+    def list_payload_apps(self, path):
+        try:
+            return [name for name in flatpkg.list_payload(path)
+                    if name.endswith(".app")]
+        except flatpkg.FlatPackageError as error:
+            raise BackendError(str(error))
+
+    def extract_payload(self, path, dest, member="."):
+        try:
+            flatpkg.extract_payload(path, dest, member)
+        except flatpkg.FlatPackageError as error:
+            raise BackendError(str(error))
+
+    def convert_icon(self, icns_path, png_path, max_size=300):
+        png = read_icns_png(icns_path)
+        try:
+            with open(png_path, "wb") as png_file:
+                png_file.write(png)
+        except (IOError, OSError) as error:
+            raise BackendError("Unable to write %s: %s" % (png_path, error))
+
+
+def read_icns_png(icns_path):
+    """Return the PNG image in an icns file that's closest to 300 pixels.
+
+    Icons made for OS X 10.7 and later hold PNG images, which are used
+    as they are. (Older formats aren't decoded.)
+
+    Raises:
+        BackendError: The file isn't an icns file with a PNG image.
+    """
+    try:
+        with open(icns_path, "rb") as icns_file:
+            data = icns_file.read()
+    except (IOError, OSError) as error:
+        raise BackendError("Unable to read %s: %s" % (icns_path, error))
+    if data[:4] != "icns":
+        raise BackendError("%s isn't an icns file." % icns_path)
+    images = {}
+    position = 8
+    while position + 8 <= len(data):
+        element_type, length = struct.unpack(">4sI",
+                                             data[position:position + 8])
+        if length < 8:
+            break
+        body = data[position + 8:position + length]
+        if body.startswith(PNG_MAGIC):
+            images[element_type] = body
+        position += length
+    for element_type in ICNS_PNG_TYPES:
+        if element_type in images:
+            return images[element_type]
+    raise BackendError("%s has no PNG image I can use." % icns_path)
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the process-wide Backend for this platform."""
+    global _backend  # pylint: disable=global-statement
+    if _backend is None:
+        if (sys.platform == "darwin" and
+                os.environ.get("RECIPE_ROBOT_BACKEND") != "pure"):
+            _backend = MacBackend()
+        else:
+            _backend = PurePythonBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Use backend from now on (None picks one again). For testing."""
+    global _backend  # pylint: disable=global-statement
+    _backend = backend
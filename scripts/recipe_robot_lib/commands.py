@@ -0,0 +1,329 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+commands.py
+
+Runs external commands.
+
+Commands are given as argument lists, and a pipeline as a list of
+argument lists, so nothing is split or interpreted by a shell. Every
+command has a timeout, after which all of its processes are killed.
+Standard output can be streamed to a callback line by line instead of
+being collected, and the stderr and exit code of every pipeline stage
+are kept.
+
+At most MAX_CONCURRENT_COMMANDS commands run at the same time (see
+set_max_concurrency), so running many inspections at once doesn't
+start an unbounded number of processes.
+
+Every command is recorded in a CommandLedger with its wall time, the CPU
+time used by child processes while it ran, how much it output, and its
+exit code. (Child CPU time comes from getrusage(RUSAGE_CHILDREN), so
+commands that overlap share each other's CPU time.)
+"""
+
+
+from collections import namedtuple
+import os
+import resource
+from subprocess import Popen, PIPE
+import threading
+import time
+
+from . import metrics
+from .robolog import LogLevel, get_logger
+from .tracing import span
+
+
+# Seconds a command may run before it's killed.
+DEFAULT_TIMEOUT = 600
+MAX_CONCURRENT_COMMANDS = 8
+# Exit code reported for a command that was killed by its timeout.
+TIMEOUT_EXITCODE = -9
+
+_limiter = threading.BoundedSemaphore(MAX_CONCURRENT_COMMANDS)
+
+
+class CommandResult(namedtuple("CommandResult",
+                               "exitcode out err exitcodes timed_out")):
+    """The outcome of run_command.
+
+    Attributes:
+        exitcode: The last stage's exit code (TIMEOUT_EXITCODE if the
+            command timed out).
+        out: The last stage's standard output, or "" if it was streamed
+            to a callback.
+        err: The standard error of all stages, in stage order.
+        exitcodes: List of every stage's exit code.
+        timed_out: True if the command was killed by its timeout.
+    """
+
+    @property
+    def failed_stages(self):
+        """Indexes of the pipeline stages that exited with an error."""
+        return [index for index, code in enumerate(self.exitcodes) if code]
+
+
+class CommandLedger(object):
+    """Records the cost of every command run during this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = []
+
+    def record(self, name, wall, user, system, output_bytes, exitcode):
+        """Add an entry for a finished command.
+
+        Args:
+            name: The command's name, e.g. "hdiutil" or "gunzip | pax".
+            wall: Seconds the command took.
+            user: Seconds of user CPU time used by child processes.
+            system: Seconds of system CPU time used by child processes.
+            output_bytes: Bytes written to stdout and stderr.
+            exitcode: The command's exit code.
+        """
+        entry = {"command": name, "wall": wall, "user": user,
+                 "system": system, "output_bytes": output_bytes,
+                 "exitcode": exitcode}
+        with self._lock:
+            self.entries.append(entry)
+
+    def clear(self):
+        """Forget all entries."""
+        with self._lock:
+            self.entries = []
+
+    def summary(self):
+        """Return totals per command name, most wall time first.
+
+        Returns:
+            List of dicts with "command", "runs", "failures", "wall",
+            "user", "system" and "output_bytes" keys.
+        """
+        totals = {}
+        with self._lock:
+            entries = list(self.entries)
+        for entry in entries:
+            total = totals.setdefault(entry["command"], {
+                "command": entry["command"], "runs": 0, "failures": 0,
+                "wall": 0.0, "user": 0.0, "system": 0.0, "output_bytes": 0})
+            total["runs"] += 1
+            total["failures"] += 1 if entry["exitcode"] else 0
+            for key in ("wall", "user", "system", "output_bytes"):
+                total[key] += entry[key]
+        return sorted(totals.values(), key=lambda total: -total["wall"])
+
+    def format_table(self):
+        """Return the summary as lines of a text table."""
+        lines = ["%-20s %5s %6s %9s %9s %9s %10s" % (
+            "Command", "Runs", "Failed", "Wall", "User", "System",
+            "Output")]
+        for total in self.summary():
+            lines.append("%-20s %5d %6d %8.2fs %8.2fs %8.2fs %8.1fKB" % (
+                total["command"][:20], total["runs"], total["failures"],
+                total["wall"], total["user"], total["system"],
+                total["output_bytes"] / 1024.0))
+        return lines
+
+
+_ledger = CommandLedger()
+
+
+def get_command_ledger():
+    """Return the process-wide CommandLedger."""
+    return _ledger
+
+
+def set_max_concurrency(count):
+    """Allow at most count commands to run at the same time.
+
+    Should be called before any commands are run.
+    """
+    global _limiter  # pylint: disable=global-statement
+    _limiter = threading.BoundedSemaphore(count)
+
+
+def _is_pipeline(args):
+    """Return True if args is a list of argument lists."""
+    return bool(args) and not isinstance(args[0], basestring)
+
+
+def _read_lines(stream, on_line, sizes):
+    """Pass each line read from stream (without its newline) to on_line.
+
+    The length of each line is appended to sizes.
+    """
+    for line in iter(stream.readline, ""):
+        sizes.append(len(line))
+        on_line(line.rstrip("\n"))
+    stream.close()
+
+
+def _read_all(stream, chunks):
+    """Append everything read from stream to chunks."""
+    chunks.append(stream.read())
+    stream.close()
+
+
+def _write_stdin(stream, data):
+    """Write data to a process's stdin, and close it."""
+    try:
+        if data:
+            stream.write(data)
+    except IOError:
+        # The process exited without reading all of its input.
+        pass
+    finally:
+        try:
+            stream.close()
+        except IOError:
+            pass
+
+
+def _kill(processes):
+    """Kill every process that's still running."""
+    for process in processes:
+        if process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+def run_command(args, stdin="", timeout=DEFAULT_TIMEOUT, on_line=None,
+                cwd=None):
+    """Run a command or pipeline and wait for it to finish.
+
+    Args:
+        args: An argument list (e.g. ["/usr/bin/hdiutil", "detach",
+            path]), or a list of argument lists to run as a pipeline,
+            each stage's stdout feeding the next stage's stdin.
+        stdin: String to write to the (first stage's) standard input.
+        timeout: Seconds to wait before killing every process in the
+            command. None means wait forever.
+        on_line: Optional function called from a reader thread with
+            each line of (the last stage's) standard output, without its
+            newline. Output passed to on_line isn't collected.
+        cwd: Working directory for the command.
+
+    Returns:
+        A CommandResult.
+    """
+    stages = args if _is_pipeline(args) else [args]
+    logger = get_logger()
+    if logger.is_enabled(LogLevel.DEBUG):
+        logger.log("Running: %s", LogLevel.DEBUG, 4,
+                   (" | ".join(" ".join(stage) for stage in stages),))
+    name = " | ".join(os.path.basename(stage[0]) for stage in stages)
+    streamed_sizes = []
+    with _limiter, span(name, "command") as this_span:
+        start = time.time()
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        result = _run_stages(stages, stdin, timeout, on_line, cwd,
+                             streamed_sizes)
+        end_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        output_bytes = (len(result.out) + sum(streamed_sizes) +
+                        len(result.err))
+        wall = time.time() - start
+        metrics.COMMAND_SECONDS.observe(wall, command=name)
+        _ledger.record(name, wall,
+                       end_usage.ru_utime - usage.ru_utime,
+                       end_usage.ru_stime - usage.ru_stime,
+                       output_bytes, result.exitcode)
+        this_span.set(exitcode=result.exitcode, output_bytes=output_bytes)
+    return result
+
+
+def _run_stages(stages, stdin, timeout, on_line, cwd, streamed_sizes):
+    """Start the pipeline's processes and collect their results."""
+    processes = []
+    threads = []
+    err_chunks = [[] for _ in stages]
+    out_chunks = []
+    try:
+        for index, stage in enumerate(stages):
+            if processes:
+                stage_stdin = processes[-1].stdout
+            else:
+                stage_stdin = PIPE
+            try:
+                process = Popen(stage, stdin=stage_stdin, stdout=PIPE,
+                                stderr=PIPE, cwd=cwd, close_fds=True)
+            except OSError as error:
+                _kill(processes)
+                for process in processes:
+                    process.wait()
+                exitcodes = [process.returncode for process in processes]
+                exitcodes += [127] * (len(stages) - len(processes))
+                return CommandResult(
+                    127, "", "%s: %s" % (stage[0], error.strerror or error),
+                    exitcodes, False)
+            if processes:
+                # Let the previous stage get SIGPIPE if this one exits.
+                processes[-1].stdout.close()
+            processes.append(process)
+            threads.append(threading.Thread(
+                target=_read_all, args=(process.stderr, err_chunks[index])))
+
+        if on_line is not None:
+            threads.append(threading.Thread(
+                target=_read_lines,
+                args=(processes[-1].stdout, on_line, streamed_sizes)))
+        else:
+            threads.append(threading.Thread(
+                target=_read_all, args=(processes[-1].stdout, out_chunks)))
+        threads.append(threading.Thread(
+            target=_write_stdin, args=(processes[0].stdin, stdin)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        timed_out = threading.Event()
+        timer = None
+        if timeout is not None:
+            def expire():
+                timed_out.set()
+                _kill(processes)
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            for thread in threads:
+                thread.join()
+            for process in processes:
+                process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+                timer.join()
+    except BaseException:
+        # E.g. KeyboardInterrupt: don't leave processes behind.
+        _kill(processes)
+        raise
+
+    exitcodes = [process.returncode for process in processes]
+    err = "".join("".join(chunks) for chunks in err_chunks)
+    if timed_out.is_set():
+        err += "Timed out after %s seconds." % timeout
+        exitcode = TIMEOUT_EXITCODE
+    else:
+        exitcode = exitcodes[-1]
+    return CommandResult(exitcode, "".join(out_chunks), err, exitcodes,
+                         timed_out.is_set())
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+events.py
+
+Machine-readable event stream (--events=jsonl).
+
+Events go to the target given with --events-target. There's no default,
+and stdout and stderr aren't accepted, because Recipe Robot's regular
+output goes there and events mixed in with it couldn't be parsed as JSON
+lines.
+
+Each event is one line of JSON with an "event" type and a "time"
+timestamp, plus fields specific to that type:
+
+    phase_start        phase
+    phase_end          phase, status ("ok" or "error"), duration
+    fact_set           key, value
+    error, warning,
+    reminder           message
+    recipe_written     type, path
+    download_progress  url, bytes, total
+
+Lines are written through a buffered writer, so consumers should read
+them incrementally rather than expecting each event to arrive the moment
+it happens. Download progress is throttled to one sample per
+PROGRESS_INTERVAL seconds per download.
+"""
+
+
+from collections import Mapping, Sequence
+from contextlib import contextmanager
+import json
+import os
+import socket
+import threading
+import time
+
+
+BUFFER_SIZE = 65536
+
+# Minimum seconds between download_progress samples for one download.
+PROGRESS_INTERVAL = 0.25
+
+# Minimum seconds between flushes for high-frequency events.
+FLUSH_INTERVAL = 0.1
+
+# Events that are frequent enough to only flush every FLUSH_INTERVAL.
+_LOW_PRIORITY_EVENTS = frozenset(("fact_set", "download_progress"))
+
+
+class EventWriter(object):
+    """Writes events as JSON lines to a buffered file object."""
+
+    def __init__(self, stream, closer=None):
+        """Set up an EventWriter.
+
+        Args:
+            stream: A writable (preferably buffered) file object.
+            closer: Optional function to call after the stream is closed.
+        """
+        self.stream = stream
+        self._closer = closer
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        # Progress key -> time of the last sample written.
+        self._last_progress = {}
+
+    def emit(self, event_type, **fields):
+        """Write an event.
+
+        Args:
+            event_type: The event's type, e.g. "phase_start".
+            fields: Event-specific fields. Values that aren't JSON types
+                are converted to lists, dicts or strings.
+        """
+        fields["event"] = event_type
+        fields["time"] = time.time()
+        line = json.dumps(fields, default=_json_default) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            now = fields["time"]
+            if (event_type not in _LOW_PRIORITY_EVENTS or
+                    now - self._last_flush >= FLUSH_INTERVAL):
+                self.stream.flush()
+                self._last_flush = now
+
+    def progress(self, url, done, total):
+        """Write a throttled download_progress sample.
+
+        The first and final samples of a download are always written.
+
+        Args:
+            url: The URL being downloaded.
+            done: Bytes downloaded so far.
+            total: Total bytes, or 0 if unknown.
+        """
+        now = time.time()
+        last = self._last_progress.get(url)
+        finished = total > 0 and done >= total
+        if (last is not None and not finished and
+                now - last < PROGRESS_INTERVAL):
+            return
+        self._last_progress[url] = now
+        self.emit("download_progress", url=url, bytes=done, total=total)
+
+    def close(self):
+        """Flush and close the stream."""
+        with self._lock:
+            try:
+                self.stream.flush()
+                self.stream.close()
+            finally:
+                if self._closer:
+                    self._closer()
+
+
+def _json_default(obj):
+    """Convert Recipe Robot's containers and other objects for JSON."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Sequence):
+        return list(obj)
+    return str(obj)
+
+
+def open_target(target):
+    """Open an event stream target for buffered writing.
+
+    Args:
+        target: "fd:N" for an open file descriptor, "unix:PATH" for a
+            Unix domain socket, or a file path.
+
+    Returns:
+        A tuple of (file object, closer function or None).
+    """
+    if target.startswith("fd:"):
+        # Duplicate the descriptor so closing the stream leaves it open.
+        fd = os.dup(int(target[len("fd:"):]))
+        return os.fdopen(fd, "w", BUFFER_SIZE), None
+    if target.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len("unix:"):])
+        return sock.makefile("w", BUFFER_SIZE), sock.close
+    return open(os.path.expanduser(target), "w", BUFFER_SIZE), None
+
+
+_writer = None
+
+
+def open_event_stream(target):
+    """Start writing events to target. See open_target()."""
+    global _writer  # pylint: disable=global-statement
+    stream, closer = open_target(target)
+    _writer = EventWriter(stream, closer)
+    return _writer
+
+
+def close_event_stream():
+    """Flush and stop the event stream, if there is one."""
+    global _writer  # pylint: disable=global-statement
+    if _writer is not None:
+        writer, _writer = _writer, None
+        writer.close()
+
+
+def emit_event(event_type, **fields):
+    """Write an event, if an event stream is open."""
+    if _writer is not None:
+        _writer.emit(event_type, **fields)
+
+
+def emit_progress(url, done, total):
+    """Write a throttled download progress sample, if a stream is open."""
+    if _writer is not None:
+        _writer.progress(url, done, total)
+
+
+@contextmanager
+def phase(name):
+    """Emit phase_start and phase_end events around a block."""
+    if _writer is None:
+        yield
+        return
+    start = time.time()
+    emit_event("phase_start", phase=name)
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        emit_event("phase_end", phase=name, status=status,
+                   duration=time.time() - start)
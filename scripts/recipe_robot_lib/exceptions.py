@@ -58,3 +58,7 @@ class RoboError(RoboException):
     """Something happened which means we can't continue."""
     pass
 
+
+class BackendError(RoboException):
+    """A platform operation failed, or isn't supported here."""
+    pass
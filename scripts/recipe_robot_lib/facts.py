@@ -20,24 +20,30 @@
 """
 facts.py
 
-Facts is a dictionary-like object that defines recipe-robot specific
-MutableSequences; NotifyingList and NoisyNotifyingList.
+Facts is the dict that holds everything Recipe Robot learns, with the
+known keys declared in FACT_TYPES. This module also defines
+recipe-robot specific MutableSequences; NotifyingList and
+NoisyNotifyingList.
 
-The NotifyingList is used to post a NSNotification whenever a value is
-set or inserted.
+The NotifyingList is used to post a notification whenever a value is
+set or inserted. Notifications go through the notification bus (see
+notifications.py), so they cost nothing unless something subscribed.
 
-The NoisyNotifyingList posts NSNotifications under the same conditions,
+The NoisyNotifyingList posts notifications under the same conditions,
 but also robo_prints the message as well.
 """
 
 
-# pylint: disable=no-name-in-module
-from Foundation import (NSDistributedNotificationCenter,
-                        NSNotificationDeliverImmediately)
-# pylint: enable=no-name-in-module
+from collections import Sequence
+import json
+import os
+import shutil
 
-from .roboabc import RoboDict, RoboList
-from .tools import (LogLevel, robo_print)
+from .events import emit_event
+from .exceptions import RoboError
+from .notifications import post_notification
+from .roboabc import RoboList
+from .tools import (LogLevel, robo_print, __version__)
 
 
 # pylint: disable=too-few-public-methods
@@ -45,54 +51,221 @@ class NotificationMixin(object):
     """Adds a send_notification method to Notifying classes."""
 
     def send_notification(self, message):
-        """Send an NSNotification to our stored center."""
-        if isinstance(message, unicode):
-            message = message.encode("utf-8")
-        userInfo = {"message": message}  # pylint: disable=invalid-name
-        self.notification_center.postNotificationName_object_userInfo_options_(
-            "com.elliotjordan.recipe-robot.dnc.%s" % self.message_type,
-            None,
-            userInfo,
-            NSNotificationDeliverImmediately)
+        """Post a notification of our message_type to the bus."""
+        post_notification(self.message_type, message)
 
 # pylint: enable=too-few-public-methods
 
-class Facts(RoboDict):
-    """Dictionary-like object for holding all of recipe-robot's data.
 
-    To aid in intercommunication with the App, all dictionary values
-    are cast to notification-sending subclassed-variants of that type.
-
-    i.e. lists -> NotifyingList, str -> NotifyingString.
+# Known facts, and the type of value each one holds. Strings and bools
+# are stored as-is (a notification is posted when they're set). Lists
+# are stored as NotifyingLists, so appending to them posts a
+# notification too. "object" facts are stored untouched.
+FACT_TYPES = {
+    "app_file": str,
+    "app_name": str,
+    "app_name_key": str,
+    "app_path": str,
+    "args": object,
+    "bitbucket_repo": str,
+    "blocking_applications": list,
+    "bundle_id": str,
+    "codesign_authorities": list,
+    "codesign_reqs": str,
+    "description": str,
+    "developer": str,
+    "download_filename": str,
+    "download_format": str,
+    "download_url": str,
+    "errors": list,
+    "execution_time": object,
+    "github_repo": str,
+    "icon_path": str,
+    "icons": list,
+    "input_path": str,
+    "input_type": str,
+    "inspections": list,
+    "is_from_app_store": bool,
+    "recipe_dest_dir": str,
+    "recipes": object,
+    "relative_path": str,
+    "reminders": list,
+    "sourceforge_id": object,
+    "sparkle_feed": str,
+    "sparkle_provides_version": bool,
+    "specify_filename": bool,
+    "version_key": str,
+    "warnings": list,
+}
+
+
+# Facts that only make sense for the run that produced them, and so are
+# left out of snapshots.
+TRANSIENT_FACTS = frozenset(
+    ("args", "errors", "execution_time", "icons", "recipes"))
+
+SNAPSHOT_FORMAT = 1
+
+
+class Facts(dict):
+    """Dictionary for holding all of recipe-robot's data.
+
+    Facts is a plain dict, so reads cost nothing extra. Writes go through
+    __setitem__ (update() and setdefault() included), which stores
+    values by their FACT_TYPES type and tells the App about the change.
+    Keys that aren't in FACT_TYPES are handled based on their value.
+
+    Facts that are expensive to look up can be registered with provide()
+    instead of being set right away. They're only computed when someone
+    asks for them with resolve().
     """
     default_suffix = "information"
 
     def __init__(self):
         """Set up a Fact instance with required list-like objects."""
         super(Facts, self).__init__()
-        self._dict.update({"errors": NoisyNotifyingList("errors"),
+        # Fact key -> function that sets it (and possibly other facts).
+        self._providers = {}
+        dict.update(self, {"errors": NoisyNotifyingList("errors"),
                            "reminders": NoisyNotifyingList("reminders"),
                            "warnings": NoisyNotifyingList("warnings"),
                            "recipes": NotifyingList("recipes"),
                            "icons": NotifyingList("icons"),})
 
     def __setitem__(self, key, val):
-        if isinstance(val, basestring):
-            val = NotifyingString(self.default_suffix, val)
-        elif isinstance(val, list):
+        fact_type = FACT_TYPES.get(key)
+        if fact_type is None:
+            if isinstance(val, basestring):
+                fact_type = str
+            elif isinstance(val, list):
+                fact_type = list
+            elif isinstance(val, bool):
+                fact_type = bool
+        if fact_type is str and isinstance(val, basestring):
+            if isinstance(val, unicode):
+                val = val.encode("utf-8")
+            post_notification(self.default_suffix, val)
+        elif fact_type is list and isinstance(val, list):
             val = NotifyingList(self.default_suffix, val)
-        elif isinstance(val, bool):
-            val = NotifyingBool(self.default_suffix, val)
-        super(Facts, self).__setitem__(key, val)
+        elif fact_type is bool and isinstance(val, bool):
+            post_notification(self.default_suffix, val)
+        dict.__setitem__(self, key, val)
+        emit_event("fact_set", key=key, value=val)
+
+    def update(self, *args, **kwargs):
+        """Set each item through __setitem__."""
+        for key, val in dict(*args, **kwargs).iteritems():
+            self[key] = val
+
+    def setdefault(self, key, default=None):
+        """Set key to default through __setitem__ if it's missing."""
+        if key not in self:
+            self[key] = default
+        return self[key]
 
     def is_from_app_store(self):
         """Can't make this recipe if the app is from the App Store."""
         return self["is_from_app_store"]
 
+    def provide(self, keys, provider):
+        """Register a function that sets keys when they're needed.
+
+        Args:
+            keys: The fact keys the provider sets.
+            provider: A function that takes no arguments and sets (some
+                of) keys. It's called at most once.
+        """
+        for key in keys:
+            self._providers[key] = provider
+
+    def resolve(self, *keys):
+        """Run the providers of any of keys that haven't been run yet."""
+        for key in keys:
+            provider = self._providers.pop(key, None)
+            if provider is None:
+                continue
+            for other_key, other in self._providers.items():
+                if other is provider:
+                    del self._providers[other_key]
+            provider()
+
+    def resolve_all(self):
+        """Run every provider that hasn't been run yet."""
+        self.resolve(*self._providers.keys())
+
+    def save(self, path):
+        """Write a JSON snapshot of everything inspection found.
+
+        The app's icon usually lives in the cache, which is removed at
+        the end of the run, so it's copied next to the snapshot (with an
+        .icns extension) and icon_path is pointed at the copy.
+
+        Args:
+            path: File to write the snapshot to.
+        """
+        self.resolve_all()
+        saved_facts = dict((key, val) for key, val in self.iteritems()
+                           if key not in TRANSIENT_FACTS)
+        if "icon_path" in saved_facts:
+            icon_path = saved_facts["icon_path"]
+            if not icon_path.endswith(".icns"):
+                icon_path += ".icns"
+            icon_copy = os.path.splitext(os.path.abspath(path))[0] + ".icns"
+            try:
+                if os.path.abspath(icon_path) != icon_copy:
+                    shutil.copyfile(icon_path, icon_copy)
+            except (IOError, OSError) as error:
+                self["warnings"].append(
+                    "Unable to save the app icon with the facts: %s" % error)
+                del saved_facts["icon_path"]
+            else:
+                saved_facts["icon_path"] = icon_copy
+        snapshot = {"format": SNAPSHOT_FORMAT,
+                    "version": __version__,
+                    "facts": saved_facts}
+        try:
+            with open(path, "w") as snapshot_file:
+                json.dump(snapshot, snapshot_file, indent=2, sort_keys=True,
+                          default=_snapshot_default)
+        except (IOError, TypeError) as error:
+            raise RoboError("Unable to save facts to %s." % path, error)
+
+    def load(self, path):
+        """Restore facts from a snapshot written by save().
+
+        Warnings and reminders from the original inspection are added
+        (and shown) again.
+
+        Args:
+            path: Snapshot file to read.
+        """
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (IOError, ValueError) as error:
+            raise RoboError("Unable to load facts from %s." % path, error)
+        if snapshot.get("format") != SNAPSHOT_FORMAT:
+            raise RoboError("%s is not a facts snapshot this version of "
+                            "Recipe Robot can read." % path)
+        for key, val in snapshot["facts"].iteritems():
+            key = str(key)
+            if isinstance(self.get(key), NotifyingList):
+                for item in val:
+                    self[key].append(item)
+            else:
+                self[key] = val
+
+
+def _snapshot_default(obj):
+    """Convert NotifyingLists for JSON."""
+    if isinstance(obj, Sequence):
+        return list(obj)
+    raise TypeError("%r is not JSON serializable" % obj)
+
 
 # pylint: disable=too-few-public-methods, too-many-ancestors
 class NotifyingList(NotificationMixin, RoboList):
-    """A list that robo_prints and sends NSNotifications on changes"""
+    """A list that sends notifications on changes"""
 
     def __init__(self, message_type, iterable=None):
         """Set up NotifyingList for use.
@@ -102,10 +275,6 @@ class NotifyingList(NotificationMixin, RoboList):
             iterable: Optional iterable to use to fill the instance.
         """
         super(NotifyingList, self).__init__(iterable)
-        # NSDistributedNotificationCenter is the NotificationCenter
-        # that allows messages to be sent between applications.
-        self.notification_center = (
-            NSDistributedNotificationCenter.defaultCenter())
         self.message_type = message_type
 
     def __setitem__(self, index, val):
@@ -125,61 +294,10 @@ class NoisyNotifyingList(NotifyingList):
     def send_notification(self, message):
         """Notify that an item has been set, and robo_print it."""
         super(NoisyNotifyingList, self).send_notification(message)
+        emit_event(self.message_type.rstrip("s"), message=message)
         log_level = LogLevel.__getattribute__(
             LogLevel, self.message_type.rstrip("s").upper())
         robo_print(message, log_level)
 
 
-class NotifyingString(NotificationMixin, str):
-    """A string that sends notifications."""
-
-    def __new__(cls, message_type, text=""):
-        """Set up NotifyingString for use.
-
-        Args:
-            message_type: String name appended to message identifier.
-            text: Optional string to use to fill the instance.
-        """
-        instance = super(NotifyingString, cls).__new__(cls, text.encode("utf-8"))
-        instance.message_type = message_type
-        return instance
-
-    # pylint: disable=unused-argument
-    def __init__(self, message_type, text=""):
-        """Set up NotifyingString for use.
-
-        Args:
-            message_type: String name appended to message identifier.
-            text: Optional string to use to fill the instance.
-        """
-        # NSDistributedNotificationCenter is the NotificationCenter
-        # that allows messages to be sent between applications.
-        self.notification_center = (
-            NSDistributedNotificationCenter.defaultCenter())
-        self.send_notification(text)
-        super(NotifyingString, self).__init__(self, text)
-
-    # pylint: enable=unused-argument
-
-
-class NotifyingBool(NotificationMixin, object):
-    """A bool that sends notifications."""
-
-    def __new__(cls, message_type, val):
-        """Set up NotifyingBool for use.
-
-        Args:
-            message_type: String name appended to message identifier.
-            val: True or False
-        """
-        instance = super(NotifyingBool, cls).__new__(cls)
-        instance.message_type = message_type
-        # NSDistributedNotificationCenter is the NotificationCenter
-        # that allows messages to be sent between applications.
-        instance.notification_center = (
-            NSDistributedNotificationCenter.defaultCenter())
-        instance.send_notification(val)
-        return bool(val)
-
-
 # pylint: enable=too-few-public-methods, too-many-ancestors
@@ -0,0 +1,422 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+flatpkg.py
+
+Pure-Python reading of flat packages and their payloads, for platforms
+without pkgutil and pax.
+
+A flat package is a xar archive: a binary header, a zlib-compressed XML
+table of contents, and a heap that holds each file's (possibly
+compressed) data. The table of contents also holds the certificates the
+package was signed with.
+
+A package's Payload is a cpio archive in the "odc" format, compressed
+with gzip or, in newer packages, wrapped in pbzx (a series of xz
+chunks). pbzx payloads need the lzma module (Python 3, or backports.lzma
+on Python 2).
+"""
+
+
+import base64
+import bz2
+import gzip
+import os
+import stat
+import struct
+import zlib
+from xml.etree.ElementTree import fromstring, ParseError
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+XAR_MAGIC = "xar!"
+# magic, header size, version, compressed and uncompressed TOC length,
+# checksum algorithm.
+XAR_HEADER = struct.Struct(">4sHHQQI")
+XMLDSIG_NS = "{http://www.w3.org/2000/09/xmldsig#}"
+
+CPIO_MAGIC = "070707"
+CPIO_HEADER_SIZE = 76
+CPIO_TRAILER = "TRAILER!!!"
+GZIP_MAGIC = "\x1f\x8b"
+PBZX_MAGIC = "pbzx"
+XZ_MAGIC = "\xfd7zXZ\x00"
+
+# The DER encoding of the commonName attribute's OID (2.5.4.3).
+COMMON_NAME_OID = "\x06\x03\x55\x04\x03"
+# DER tags of the string types a commonName can be.
+DER_STRING_TAGS = ("\x0c", "\x13", "\x14", "\x16", "\x1e")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class FlatPackageError(ValueError):
+    """A flat package or payload couldn't be read."""
+    pass
+
+
+def _is_within(dest, path):
+    """Return True if path is dest or inside it."""
+    return path == dest or path.startswith(dest + os.sep)
+
+
+def safe_join(dest, path):
+    """Join an archive member's path to dest, refusing to leave dest.
+
+    Symlinks already extracted are followed, so a member can't be
+    written outside dest through a symlink to a directory outside it.
+    """
+    dest = os.path.normpath(dest)
+    target = os.path.normpath(os.path.join(dest, path.lstrip("/")))
+    parent = target if target == dest else os.path.dirname(target)
+    if not (_is_within(dest, target) and
+            _is_within(os.path.realpath(dest), os.path.realpath(parent))):
+        raise FlatPackageError("Refusing to extract %s outside %s" % (
+            path, dest))
+    return target
+
+
+def check_symlink(dest, target, link):
+    """Refuse to make a symlink at target to link if it leads out of dest.
+
+    Args:
+        dest: The directory being extracted to.
+        target: Path the symlink will be made at (from safe_join).
+        link: The symlink's contents.
+
+    Raises:
+        FlatPackageError: The symlink would point outside dest.
+    """
+    resolved = os.path.realpath(os.path.join(os.path.dirname(target), link))
+    if not _is_within(os.path.realpath(dest), resolved):
+        raise FlatPackageError("Refusing to extract a symlink from %s to %s "
+                               "outside %s" % (target, link, dest))
+
+
+class XarArchive(object):
+    """A xar archive (e.g. a flat package), read from its table of contents."""
+
+    def __init__(self, path):
+        """Read the header and table of contents of the archive at path.
+
+        Raises:
+            FlatPackageError: The file isn't a readable xar archive.
+        """
+        self.path = path
+        try:
+            with open(path, "rb") as xar_file:
+                header = xar_file.read(XAR_HEADER.size)
+                if len(header) < XAR_HEADER.size or \
+                        header[:4] != XAR_MAGIC:
+                    raise FlatPackageError("%s isn't a flat package." % path)
+                _, header_size, _, toc_length, _, _ = XAR_HEADER.unpack(
+                    header)
+                xar_file.seek(header_size)
+                toc = zlib.decompress(xar_file.read(toc_length))
+            self.toc = fromstring(toc).find("toc")
+        except (IOError, OSError, zlib.error, ParseError) as error:
+            raise FlatPackageError("Unable to read %s: %s" % (path, error))
+        if self.toc is None:
+            raise FlatPackageError("%s has no table of contents." % path)
+        self.heap_offset = header_size + toc_length
+
+    def files(self):
+        """Return (path, element) for each file, parents first."""
+        files = []
+        parents = [(self.toc, "")]
+        while parents:
+            parent, prefix = parents.pop(0)
+            for element in parent.findall("file"):
+                path = prefix + element.findtext("name", "")
+                files.append((path, element))
+                parents.append((element, path + "/"))
+        return files
+
+    def _copy_data(self, element, out_file):
+        """Write a file element's decoded data to out_file."""
+        data = element.find("data")
+        if data is None:
+            return
+        offset = int(data.findtext("offset"))
+        remaining = int(data.findtext("length"))
+        encoding = data.find("encoding")
+        style = "" if encoding is None else encoding.get("style", "")
+        if style == "application/x-gzip":
+            decompressor = zlib.decompressobj()
+        elif style == "application/x-bzip2":
+            decompressor = bz2.BZ2Decompressor()
+        else:
+            decompressor = None
+        with open(self.path, "rb") as xar_file:
+            xar_file.seek(self.heap_offset + offset)
+            while remaining > 0:
+                chunk = xar_file.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise FlatPackageError("%s is truncated." % self.path)
+                remaining -= len(chunk)
+                out_file.write(decompressor.decompress(chunk)
+                               if decompressor else chunk)
+
+    def extract_all(self, dest):
+        """Extract every file and directory into dest, like pkgutil --expand.
+
+        Raises:
+            FlatPackageError: A file couldn't be read or written.
+        """
+        try:
+            if not os.path.isdir(dest):
+                os.makedirs(dest)
+            for path, element in self.files():
+                target = safe_join(dest, path)
+                file_type = element.findtext("type")
+                if file_type == "directory":
+                    if not os.path.isdir(target):
+                        os.makedirs(target)
+                elif file_type == "file":
+                    with open(target, "wb") as out_file:
+                        self._copy_data(element, out_file)
+        except (IOError, OSError, zlib.error) as error:
+            raise FlatPackageError("Unable to expand %s: %s" % (
+                self.path, error))
+
+    def certificate_names(self):
+        """Return the names of the certificates the archive is signed with.
+
+        Returns:
+            List of the certificates' common names, signing certificate
+            first (as pkgutil --check-signature lists them). Empty if
+            the archive isn't signed.
+        """
+        signature = self.toc.find("signature")
+        if signature is None:
+            return []
+        names = []
+        for certificate in signature.iter(XMLDSIG_NS + "X509Certificate"):
+            name = certificate_common_name(
+                base64.b64decode("".join((certificate.text or "").split())))
+            if name:
+                names.append(name)
+        return names
+
+
+def certificate_common_name(der):
+    """Return the subject common name of a DER-encoded X.509 certificate.
+
+    The certificate isn't decoded in full. Its issuer name comes before
+    its subject name, so the subject's common name is the second one
+    found (or the only one, if the issuer has none).
+    """
+    names = []
+    start = der.find(COMMON_NAME_OID)
+    while start != -1 and len(names) < 2:
+        position = start + len(COMMON_NAME_OID)
+        if der[position:position + 1] in DER_STRING_TAGS:
+            tag = der[position]
+            length = ord(der[position + 1])
+            position += 2
+            if length & 0x80:
+                size = length & 0x7f
+                length = int(der[position:position + size].encode("hex"), 16)
+                position += size
+            value = der[position:position + length]
+            names.append(value.decode("utf-16-be") if tag == "\x1e"
+                         else value.decode("utf-8", "replace"))
+        start = der.find(COMMON_NAME_OID, start + 1)
+    return names[-1] if names else None
+
+
+class _PbzxReader(object):
+    """File-like reader of the cpio data in a pbzx payload."""
+
+    def __init__(self, path):
+        if lzma is None:
+            raise FlatPackageError(
+                "Reading %s needs the lzma module." % path)
+        self._file = open(path, "rb")
+        self._file.read(12)  # magic and flags
+        self._buffer = ""
+
+    def _next_chunk(self):
+        header = self._file.read(16)
+        if len(header) < 16:
+            return False
+        _, length = struct.unpack(">QQ", header)
+        chunk = self._file.read(length)
+        self._buffer += (lzma.decompress(chunk)
+                         if chunk.startswith(XZ_MAGIC) else chunk)
+        return True
+
+    def read(self, size):
+        while len(self._buffer) < size and self._next_chunk():
+            pass
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def _open_payload(path):
+    """Return a file-like object of a payload's uncompressed cpio data."""
+    with open(path, "rb") as payload_file:
+        magic = payload_file.read(len(CPIO_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic.startswith(PBZX_MAGIC):
+        return _PbzxReader(path)
+    if magic == CPIO_MAGIC:
+        return open(path, "rb")
+    raise FlatPackageError("%s isn't a payload I can read." % path)
+
+
+def _read_exact(stream, size):
+    """Read exactly size bytes from stream."""
+    data = stream.read(size)
+    if len(data) != size:
+        raise FlatPackageError("Payload is truncated.")
+    return data
+
+
+class _MemberReader(object):
+    """Reads one payload member's data, and no further."""
+
+    def __init__(self, stream, size):
+        self._stream = stream
+        self.remaining = size
+
+    def read(self, size=CHUNK_SIZE):
+        """Read up to size bytes of the member's data."""
+        data = _read_exact(self._stream, min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def skip(self):
+        """Read past whatever data hasn't been read yet."""
+        while self.remaining:
+            self.read()
+
+
+def iter_payload(path):
+    """Read the members of a payload, in order.
+
+    Args:
+        path: Path to a Payload file.
+
+    Yields:
+        (name, mode, reader) tuples. reader.read() returns the member's
+        data (a symlink's target, for symlinks) until it's all read.
+
+    Raises:
+        FlatPackageError: The payload isn't a readable cpio archive.
+    """
+    try:
+        stream = _open_payload(path)
+    except (IOError, OSError) as error:
+        raise FlatPackageError("Unable to read %s: %s" % (path, error))
+    try:
+        while True:
+            header = _read_exact(stream, CPIO_HEADER_SIZE)
+            if header[:6] != CPIO_MAGIC:
+                raise FlatPackageError("%s isn't an odc cpio archive." % path)
+            mode = int(header[18:24], 8)
+            name_size = int(header[59:65], 8)
+            file_size = int(header[65:76], 8)
+            name = _read_exact(stream, name_size).rstrip("\0")
+            if name == CPIO_TRAILER:
+                return
+            reader = _MemberReader(stream, file_size)
+            yield name, mode, reader
+            reader.skip()
+    except (IOError, EOFError, zlib.error) as error:
+        raise FlatPackageError("Unable to read %s: %s" % (path, error))
+    finally:
+        stream.close()
+
+
+def list_payload(path):
+    """Return the names of a payload's members (e.g. "./App.app")."""
+    return [name for name, _, _ in iter_payload(path)]
+
+
+def extract_payload(path, dest, member="."):
+    """Extract a payload member, and everything in it, to dest.
+
+    This is what pax -r -s ",member,dest," does with a payload, except
+    that nothing outside member is extracted.
+
+    Args:
+        path: Path to a Payload file.
+        dest: Path to extract member to.
+        member: Name of the member in the payload. The default, ".", is
+            the whole payload.
+
+    Returns:
+        The number of files, directories and symlinks extracted.
+
+    Raises:
+        FlatPackageError: The payload couldn't be read, member isn't in
+            it, or a file couldn't be written.
+    """
+    member = member.rstrip("/") or "."
+    dest = os.path.normpath(dest)
+    count = 0
+    try:
+        for name, mode, reader in iter_payload(path):
+            if name == member or name.startswith(member + "/"):
+                relative_name = name[len(member):]
+            elif member == ".":
+                # Not every payload prefixes its names with "./".
+                relative_name = name
+            else:
+                continue
+            target = safe_join(dest, relative_name)
+            if stat.S_ISDIR(mode):
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+            else:
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+                if os.path.lexists(target):
+                    os.remove(target)
+                if stat.S_ISLNK(mode):
+                    link = reader.read(reader.remaining)
+                    check_symlink(dest, target, link)
+                    os.symlink(link, target)
+                elif stat.S_ISREG(mode):
+                    with open(target, "wb") as out_file:
+                        while reader.remaining:
+                            out_file.write(reader.read())
+                    os.chmod(target, stat.S_IMODE(mode))
+                else:
+                    continue
+            count += 1
+    except (IOError, OSError) as error:
+        raise FlatPackageError("Unable to extract %s from %s: %s" % (
+            member, path, error))
+    if not count:
+        raise FlatPackageError("%s isn't in %s." % (member, path))
+    return count
@@ -0,0 +1,380 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+har.py
+
+Logs every HTTP request with its network timings, in the shape of an
+HTTP Archive (HAR 1.2) entry.
+
+The urllib2 handlers here use httplib connections that time each phase
+of a request:
+
+    dns      resolving the host name
+    connect  opening the TCP connection (including TLS, as in HAR)
+    ssl      the TLS handshake
+    send     sending the request
+    wait     waiting for the response headers (time to first byte)
+    receive  reading the response body
+
+Each redirect is its own entry, with redirectURL set. Requests that fail
+before a response arrives are logged with status 0 and an "_error".
+Whether a CDN served the response from its cache (X-Cache and similar
+headers) is recorded as "_cache": "hit" or "miss".
+"""
+
+
+from datetime import datetime
+import httplib
+import json
+import os
+import socket
+import threading
+import time
+import urllib2
+from urlparse import urlparse
+
+from . import metrics
+
+
+# Response headers that say whether a CDN cache served the response.
+CACHE_HEADERS = ("x-cache", "cf-cache-status", "x-cache-status")
+
+
+def _ms(seconds):
+    """Convert seconds to whole milliseconds."""
+    return int(round(seconds * 1000))
+
+
+class HarLog(object):
+    """Collects HAR entries for the requests made during a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = []
+
+    def add(self, entry):
+        """Add an entry. It may still be updated until its body is read."""
+        with self._lock:
+            self.entries.append(entry)
+
+    def clear(self):
+        """Forget all entries."""
+        with self._lock:
+            self.entries = []
+
+    def to_har(self, creator_version=""):
+        """Return the log as a HAR dict."""
+        with self._lock:
+            entries = list(self.entries)
+        return {"log": {
+            "version": "1.2",
+            "creator": {"name": "Recipe Robot", "version": creator_version},
+            "pages": [],
+            "entries": entries}}
+
+    def write(self, path, creator_version=""):
+        """Write the log to path as a HAR file."""
+        with open(os.path.expanduser(path), "w") as har_file:
+            json.dump(self.to_har(creator_version), har_file, indent=2)
+
+    def host_summary(self):
+        """Return request totals per host, most time first.
+
+        Returns:
+            List of dicts with "host", "requests", "errors", "time" (ms),
+            "wait" (ms) and "bytes" keys.
+        """
+        totals = {}
+        with self._lock:
+            entries = list(self.entries)
+        for entry in entries:
+            host = urlparse(entry["request"]["url"]).netloc
+            total = totals.setdefault(host, {
+                "host": host, "requests": 0, "errors": 0, "time": 0,
+                "wait": 0, "bytes": 0})
+            total["requests"] += 1
+            status = entry["response"]["status"]
+            total["errors"] += 1 if not status or status >= 400 else 0
+            total["time"] += entry["time"]
+            total["wait"] += max(entry["timings"]["wait"], 0)
+            total["bytes"] += max(entry["response"]["bodySize"], 0)
+        return sorted(totals.values(), key=lambda total: -total["time"])
+
+    def format_table(self):
+        """Return the host summary as lines of a text table."""
+        lines = ["%-30s %8s %6s %9s %9s %10s" % (
+            "Host", "Requests", "Errors", "Time", "Wait", "Received")]
+        for total in self.host_summary():
+            lines.append("%-30s %8d %6d %8.2fs %8.2fs %8.1fKB" % (
+                total["host"][:30], total["requests"], total["errors"],
+                total["time"] / 1000.0, total["wait"] / 1000.0,
+                total["bytes"] / 1024.0))
+        return lines
+
+
+_log = HarLog()
+
+
+def get_har_log():
+    """Return the process-wide HarLog."""
+    return _log
+
+
+def _headers_list(headers):
+    """Convert a headers dict or message to HAR's list of name/values."""
+    return [{"name": name, "value": value} for name, value in
+            sorted(headers.items())]
+
+
+def _cache_status(message):
+    """Return "hit" or "miss" if a CDN cache header says so, else None."""
+    for header in CACHE_HEADERS:
+        value = message.getheader(header)
+        if value:
+            return "hit" if "HIT" in value.upper() else "miss"
+    return None
+
+
+def _absolute_url(conn, url):
+    """Return the full URL of a request for url (usually a path) on conn."""
+    if not url.startswith("/"):
+        # Requests sent to a proxy already use the full URL.
+        return url
+    host = conn.host
+    if conn.port != conn.default_port:
+        host += ":%d" % conn.port
+    return "%s://%s%s" % (conn.har_scheme, host, url)
+
+
+def _new_entry(conn, method, url, headers):
+    """Start a HAR entry for a request on conn."""
+    conn.har_start = time.time()
+    conn.har_timings = {"blocked": -1, "dns": -1, "connect": -1,
+                        "ssl": -1, "send": 0, "wait": 0, "receive": 0}
+    conn.har_entry = {
+        "startedDateTime": datetime.utcfromtimestamp(
+            conn.har_start).isoformat() + "Z",
+        "time": 0,
+        "request": {
+            "method": method,
+            "url": _absolute_url(conn, url),
+            "httpVersion": "HTTP/1.1",
+            "headers": _headers_list(headers),
+            "queryString": [],
+            "cookies": [],
+            "headersSize": -1,
+            "bodySize": 0},
+        "response": {
+            "status": 0,
+            "statusText": "",
+            "httpVersion": "",
+            "headers": [],
+            "cookies": [],
+            "content": {"size": 0, "mimeType": ""},
+            "redirectURL": "",
+            "headersSize": -1,
+            "bodySize": -1},
+        "cache": {},
+        "timings": conn.har_timings}
+
+
+def _fail_entry(conn, error):
+    """Log the entry for a request that failed before a response."""
+    entry = conn.har_entry
+    entry["_error"] = "%s: %s" % (type(error).__name__, error)
+    entry["time"] = _ms(time.time() - conn.har_start)
+    _log.add(entry)
+
+
+def _timed_create_connection(conn):
+    """Return a socket.create_connection replacement that times conn."""
+    def create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
+                          source_address=None):
+        host, port = address
+        start = time.time()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        resolved = time.time()
+        conn.har_timings["dns"] = _ms(resolved - start)
+        error = socket.error("getaddrinfo returned an empty list")
+        for family, socktype, proto, _, sockaddr in addresses:
+            sock = None
+            try:
+                sock = socket.socket(family, socktype, proto)
+                if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+            except socket.error as this_error:
+                error = this_error
+                if sock is not None:
+                    sock.close()
+                continue
+            conn.har_timings["connect"] = _ms(time.time() - resolved)
+            conn.har_entry["serverIPAddress"] = sockaddr[0]
+            return sock
+        raise error
+    return create_connection
+
+
+def _timed_request(conn, base, method, url, body, headers):
+    """Send a request on conn, timing the connection and the send."""
+    _new_entry(conn, method, url, headers)
+    conn._create_connection = _timed_create_connection(conn)
+    start = time.time()
+    try:
+        base.request(conn, method, url, body, headers)
+    except Exception as error:
+        _fail_entry(conn, error)
+        raise
+    connected = sum(max(conn.har_timings[key], 0)
+                    for key in ("dns", "connect"))
+    conn.har_timings["send"] = max(_ms(time.time() - start) - connected, 0)
+    conn.har_sent = time.time()
+
+
+def _timed_getresponse(conn, base, buffering):
+    """Wait for the response headers on conn, and log the entry."""
+    try:
+        response = base.getresponse(conn, buffering)
+    except Exception as error:
+        _fail_entry(conn, error)
+        raise
+    received = time.time()
+    conn.har_timings["wait"] = _ms(received - conn.har_sent)
+    entry = conn.har_entry
+    entry["response"].update({
+        "status": response.status,
+        "statusText": response.reason,
+        "httpVersion": "HTTP/1.1" if response.version == 11 else "HTTP/1.0",
+        "headers": _headers_list(dict(response.msg.items())),
+        "redirectURL": (response.getheader("location", "")
+                        if 300 <= response.status < 400 else "")})
+    entry["response"]["content"]["mimeType"] = response.getheader(
+        "content-type", "")
+    cache = _cache_status(response.msg)
+    if cache:
+        entry["_cache"] = cache
+        metrics.CACHE_LOOKUPS.inc(cache="http", result=cache)
+    entry["time"] = _ms(received - conn.har_start)
+    response.har_entry = entry
+    response.har_host = urlparse(entry["request"]["url"]).netloc
+    response.har_start = conn.har_start
+    response.har_received = received
+    _log.add(entry)
+    return response
+
+
+class TimedHTTPResponse(httplib.HTTPResponse):
+    """Response that finishes its HAR entry once the body is read."""
+
+    har_entry = None
+    har_host = ""
+
+    def __init__(self, *args, **kwargs):
+        httplib.HTTPResponse.__init__(self, *args, **kwargs)
+        self.har_bytes = 0
+        self.har_done = False
+
+    def read(self, amt=None):
+        # httplib closes the response inside read() once the body has
+        # been read, so the size is updated after every read.
+        data = httplib.HTTPResponse.read(self, amt)
+        if data:
+            self.har_bytes += len(data)
+            metrics.DOWNLOAD_BYTES.inc(len(data), host=self.har_host)
+        if self.har_entry is not None:
+            self.har_entry["response"]["bodySize"] = self.har_bytes
+            self.har_entry["response"]["content"]["size"] = self.har_bytes
+        if not data or self.fp is None:
+            self._finish_entry()
+        return data
+
+    def close(self):
+        httplib.HTTPResponse.close(self)
+        self._finish_entry()
+
+    def _finish_entry(self):
+        """Record the time taken to receive the body, once."""
+        if self.har_entry is None or self.har_done:
+            return
+        self.har_done = True
+        now = time.time()
+        self.har_entry["timings"]["receive"] = _ms(now - self.har_received)
+        self.har_entry["time"] = _ms(now - self.har_start)
+
+
+class TimedHTTPConnection(httplib.HTTPConnection):
+    """HTTPConnection that logs a HAR entry for each request."""
+
+    har_scheme = "http"
+    response_class = TimedHTTPResponse
+
+    def request(self, method, url, body=None, headers=None):
+        _timed_request(self, httplib.HTTPConnection, method, url, body,
+                       headers or {})
+
+    def getresponse(self, buffering=False):
+        return _timed_getresponse(self, httplib.HTTPConnection, buffering)
+
+
+class TimedHTTPSConnection(httplib.HTTPSConnection):
+    """HTTPSConnection that logs a HAR entry for each request."""
+
+    har_scheme = "https"
+    response_class = TimedHTTPResponse
+
+    def connect(self):
+        start = time.time()
+        httplib.HTTPSConnection.connect(self)
+        # Everything after the TCP connection is the TLS handshake.
+        elapsed = _ms(time.time() - start)
+        tcp = sum(max(self.har_timings[key], 0)
+                  for key in ("dns", "connect"))
+        self.har_timings["ssl"] = max(elapsed - tcp, 0)
+        self.har_timings["connect"] = max(self.har_timings["connect"], 0) + \
+            self.har_timings["ssl"]
+
+    def request(self, method, url, body=None, headers=None):
+        _timed_request(self, httplib.HTTPSConnection, method, url, body,
+                       headers or {})
+
+    def getresponse(self, buffering=False):
+        return _timed_getresponse(self, httplib.HTTPSConnection, buffering)
+
+
+class TimedHTTPHandler(urllib2.HTTPHandler):
+    """urllib2 handler for http:// URLs that logs HAR entries."""
+
+    def http_open(self, req):
+        return self.do_open(TimedHTTPConnection, req)
+
+
+class TimedHTTPSHandler(urllib2.HTTPSHandler):
+    """urllib2 handler for https:// URLs that logs HAR entries."""
+
+    def https_open(self, req):
+        return self.do_open(TimedHTTPSConnection, req,
+                            context=self._context)
+
+
+def build_timed_opener():
+    """Return a urllib2 opener whose requests are logged."""
+    return urllib2.build_opener(TimedHTTPHandler, TimedHTTPSHandler)
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+http_client.py
+
+The one place Recipe Robot makes HTTP requests.
+
+open_url() and fetch() are thin wrappers around urllib2 that time each
+request as a tracing span, and log it with its network timings (see
+har.py). Errors are urllib2's own (HTTPError and URLError), so callers
+handle them as before.
+
+Requests can be sent somewhere other than where their URLs point with
+set_url_rewrites(), so that inspection can run against a local fixture
+server (see benchmarks/bench_end_to_end.py).
+"""
+
+
+from urllib2 import Request
+
+from .har import build_timed_opener
+from .tracing import span
+
+
+_opener = build_timed_opener()
+# List of (URL prefix, replacement prefix), longest prefix first.
+_url_rewrites = []
+
+
+def set_url_rewrites(rewrites):
+    """Request URLs that start with certain prefixes from elsewhere.
+
+    Args:
+        rewrites: Dict of URL prefix (e.g. "https://api.github.com/") to
+            the prefix to request instead (e.g.
+            "http://127.0.0.1:8000/api.github.com/"). An empty dict
+            turns rewriting off.
+    """
+    global _url_rewrites  # pylint: disable=global-statement
+    _url_rewrites = sorted(rewrites.items(),
+                           key=lambda rewrite: -len(rewrite[0]))
+
+
+def rewrite_url(url):
+    """Return the URL to request for url (see set_url_rewrites)."""
+    for prefix, replacement in _url_rewrites:
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+    return url
+
+
+def open_url(url, user_agent=None, timeout=None):
+    """Open url and return the response, ready to be read.
+
+    The span covers the time until the response headers have arrived.
+
+    Args:
+        url: The URL to request.
+        user_agent: Optional User-Agent header to send.
+        timeout: Optional socket timeout, in seconds.
+
+    Returns:
+        The urllib2 response object.
+
+    Raises:
+        urllib2.HTTPError, urllib2.URLError
+    """
+    request = Request(rewrite_url(url))
+    if user_agent:
+        request.add_header("User-agent", user_agent)
+    with span("GET", "http", url=url) as this_span:
+        if timeout is None:
+            response = _opener.open(request)
+        else:
+            response = _opener.open(request, timeout=timeout)
+        this_span.set(status=response.getcode(),
+                      content_length=response.info().get("Content-Length"))
+    return response
+
+
+def fetch(url, user_agent=None, timeout=None):
+    """Request url and return the whole response body.
+
+    Args:
+        url: The URL to request.
+        user_agent: Optional User-Agent header to send.
+        timeout: Optional socket timeout, in seconds.
+
+    Returns:
+        The response body as a string.
+
+    Raises:
+        urllib2.HTTPError, urllib2.URLError
+    """
+    with span("fetch", "http", url=url) as this_span:
+        data = open_url(url, user_agent, timeout).read()
+        this_span.set(bytes=len(data))
+    return data
@@ -24,25 +24,42 @@ Look at a path or URL for an app and generate facts about it.
 """
 
 
-from distutils.version import StrictVersion, LooseVersion
+from functools import partial
 import json
 import os
 import re
 import shutil
+import socket
 import sys
-import xattr
-from urllib2 import urlopen, HTTPError, URLError, build_opener
+from urllib import quote
+from urllib2 import HTTPError, URLError
 from urlparse import urlparse
-from xml.etree.ElementTree import parse, ParseError
-
-from recipe_robot_lib import FoundationPlist as FoundationPlist
-from recipe_robot_lib.exceptions import RoboError
+from xml.etree.ElementTree import iterparse, parse, ParseError
+
+from recipe_robot_lib import metrics
+from recipe_robot_lib.backend import get_backend
+from recipe_robot_lib.events import emit_progress
+from recipe_robot_lib.exceptions import BackendError, RoboError
+from recipe_robot_lib.http_client import fetch, open_url
+from recipe_robot_lib.profiling import memory_checkpoint
+from recipe_robot_lib.roboplist import read_plist_keys, PlistError
 from recipe_robot_lib.tools import (
     robo_print, LogLevel, any_item_in_string, SUPPORTED_INSTALL_FORMATS,
     SUPPORTED_IMAGE_FORMATS, SUPPORTED_ARCHIVE_FORMATS,
-    get_exitcode_stdout_stderr, ALL_SUPPORTED_FORMATS, CACHE_DIR)
+    ALL_SUPPORTED_FORMATS, CACHE_DIR)
+from recipe_robot_lib.tracing import current_span, span, traced
+from recipe_robot_lib.version import (is_strict_version, max_by_version,
+                                      version_from_filename)
+
 
+# The Info.plist keys used by inspect_app and find_app_icon.
+INFO_PLIST_KEYS = ("CFBundleExecutable", "CFBundleIconFile",
+                   "CFBundleIdentifier", "CFBundleName",
+                   "CFBundleShortVersionString", "CFBundleVersion",
+                   "SUFeedURL", "SUOriginalFeedURL")
 
+
+@traced("inspect")
 def process_input_path(facts):
     """Determine which functions to call based on type of input path.
 
@@ -125,9 +142,15 @@ def process_input_path(facts):
                         "valid input path.")
 
     if inspect_func:
-        facts = inspect_func(input_path, args, facts)
+        input_type = inspect_func.__name__.replace("inspect_", "", 1)
+        facts["input_type"] = input_type
+        metrics.INSPECTIONS.inc(input_type=input_type)
+        with metrics.INSPECTION_SECONDS.time(input_type=input_type), \
+                metrics.count_messages("inspect", facts):
+            facts = inspect_func(input_path, args, facts)
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_app(input_path, args, facts):
     """Process an app
 
@@ -161,10 +184,10 @@ def inspect_app(input_path, args, facts):
     # Read the app's Info.plist.
     robo_print("Validating app...", LogLevel.VERBOSE)
     try:
-        info_plist = FoundationPlist.readPlist(
-            input_path + "/Contents/Info.plist")
+        info_plist = read_plist_keys(input_path + "/Contents/Info.plist",
+                                     INFO_PLIST_KEYS)
         robo_print("App seems valid", LogLevel.VERBOSE, 4)
-    except (ValueError, FoundationPlist.NSPropertyListSerializationException) as error:
+    except PlistError as error:
         raise RoboError("%s doesn't look like a valid app to me." % input_path,
                         error)
 
@@ -182,7 +205,7 @@ def inspect_app(input_path, args, facts):
         app_name = info_plist["CFBundleExecutable"]
     else:
         app_name = app_file
-    robo_print("App name is: %s" % app_name, LogLevel.VERBOSE, 4)
+    robo_print("App name is: %s", LogLevel.VERBOSE, 4, app_name)
     facts["app_name"] = app_name
 
     # If the app's filename is different than the app's name, we need to
@@ -190,7 +213,8 @@ def inspect_app(input_path, args, facts):
     # for this.
     if app_name != app_file:
         robo_print("App name differs from the actual app filename.", LogLevel.VERBOSE)
-        robo_print("Actual app filename: %s.app" % app_file, LogLevel.VERBOSE, 4)
+        robo_print("Actual app filename: %s.app",
+                   LogLevel.VERBOSE, 4, app_file)
         facts["app_file"] = app_file
 
     # Determine the bundle identifier of the app. (Overwrites any
@@ -202,7 +226,7 @@ def inspect_app(input_path, args, facts):
         bundle_id = info_plist["CFBundleIdentifier"]
     else:
         raise RoboError("Strange, this app doesn't have a bundle identifier.")
-    robo_print("Bundle identifier is: %s" % bundle_id, LogLevel.VERBOSE, 4)
+    robo_print("Bundle identifier is: %s", LogLevel.VERBOSE, 4, bundle_id)
     facts["bundle_id"] = bundle_id
 
     # Attempt to determine how to download this app.
@@ -237,41 +261,59 @@ def inspect_app(input_path, args, facts):
         if "CFBundleShortVersionString" in info_plist:
             if "CFBundleVersion" in info_plist:
                 # Both keys exist, so we must decide with a cage match!
-                try:
-                    if StrictVersion(info_plist["CFBundleShortVersionString"]):
-                        # CFBundleShortVersionString is strict. Use it.
-                        version_key = "CFBundleShortVersionString"
-                except ValueError:
-                    # CFBundleShortVersionString is not strict.
-                    try:
-                        if StrictVersion(info_plist["CFBundleVersion"]):
-                            # CFBundleVersion is strict. Use it.
-                            version_key = "CFBundleVersion"
-                    except ValueError:
-                        # Neither are strict versions. Are they
-                        # integers?
-                        if info_plist["CFBundleShortVersionString"].isdigit():
-                            version_key = "CFBundleShortVersionString"
-                        elif info_plist["CFBundleVersion"].isdigit():
-                            version_key = "CFBundleVersion"
-                        else:
-                            # CFBundleShortVersionString wins by
-                            # default.
-                            version_key = "CFBundleShortVersionString"
+                short_version = info_plist["CFBundleShortVersionString"]
+                bundle_version = info_plist["CFBundleVersion"]
+                if is_strict_version(short_version):
+                    # CFBundleShortVersionString is strict. Use it.
+                    version_key = "CFBundleShortVersionString"
+                elif is_strict_version(bundle_version):
+                    # CFBundleVersion is strict. Use it.
+                    version_key = "CFBundleVersion"
+                elif short_version.isdigit():
+                    # Neither are strict versions, but this one is an
+                    # integer.
+                    version_key = "CFBundleShortVersionString"
+                elif bundle_version.isdigit():
+                    version_key = "CFBundleVersion"
+                else:
+                    # CFBundleShortVersionString wins by default.
+                    version_key = "CFBundleShortVersionString"
             else:
                 version_key = "CFBundleShortVersionString"
         else:
             if "CFBundleVersion" in info_plist:
                 version_key = "CFBundleVersion"
         if version_key != "":
-            robo_print("Version key is: %s (%s)" %
-                       (version_key, info_plist[version_key]), LogLevel.VERBOSE, 4)
+            robo_print("Version key is: %s (%s)",
+                       LogLevel.VERBOSE, 4, version_key,
+                       info_plist[version_key])
             facts["version_key"] = version_key
         else:
             raise RoboError("Sorry, I can't determine which version key to "
                             "use for this app.")
 
-    # Determine path to the app's icon.
+    # The icon, description and code signature are only looked up if the
+    # recipes being generated need them. (See Facts.resolve().)
+    facts.provide(("icon_path",),
+                  partial(find_app_icon, input_path, info_plist, facts))
+    facts.provide(("description",),
+                  partial(describe_app, app_name, facts))
+    facts.provide(("codesign_reqs", "codesign_authorities", "developer"),
+                  partial(inspect_code_signature, input_path, facts))
+
+    return facts
+
+
+def find_app_icon(input_path, info_plist, facts):
+    """Record the path to the app's icon.
+
+    Args:
+        input_path: The path to the app.
+        info_plist: The app's parsed Info.plist.
+        facts: A continually-updated dictionary containing all the
+            information we know so far about the app associated with the
+            input path.
+    """
     if "icon_path" not in facts:
         icon_path = ""
         robo_print("Looking for app icon...", LogLevel.VERBOSE)
@@ -280,72 +322,84 @@ def inspect_app(input_path, args, facts):
         else:
             facts["warnings"].append("Can't determine app icon.")
         if icon_path != "":
-            robo_print("App icon is: %s" % icon_path, LogLevel.VERBOSE, 4)
+            robo_print("App icon is: %s", LogLevel.VERBOSE, 4, icon_path)
             facts["icon_path"] = icon_path
 
-    # Attempt to get a description of the app from MacUpdate.com.
+
+def describe_app(app_name, facts):
+    """Record a description of the app from MacUpdate.com.
+
+    Args:
+        app_name: The name of the app.
+        facts: A continually-updated dictionary containing all the
+            information we know so far about the app associated with the
+            input path.
+    """
     if "description" not in facts:
         robo_print("Getting app description from MacUpdate...", LogLevel.VERBOSE)
         description, warning = get_app_description(app_name)
         if description:
-            robo_print("Description: %s" % description, LogLevel.VERBOSE, 4)
+            robo_print("Description: %s", LogLevel.VERBOSE, 4, description)
             facts["description"] = description
         if warning:
             facts["warnings"].append(warning)
 
-    # Gather info from code signing attributes, including:
-    #    - Code signature verification requirements
-    #    - Expected authority names
-    #    - Name of developer (according to signing certificate)
-    #    - Code signature version (version 1 is obsolete, treated as unsigned)
+
+@traced("inspect", attrs=("input_path",))
+def inspect_code_signature(input_path, facts):
+    """Record the code signing details of the app.
+
+    Details include:
+       - Code signature verification requirements
+       - Expected authority names
+       - Name of developer (according to signing certificate)
+       - Code signature version (version 1 is obsolete, treated as unsigned)
+
+    Args:
+        input_path: The path to the app.
+        facts: A continually-updated dictionary containing all the
+            information we know so far about the app associated with the
+            input path.
+    """
     if facts.get("codesign_reqs", "") == "" and len(facts["codesign_authorities"]) == 0:
         codesign_reqs = ""
         codesign_authorities = []
         developer = ""
         codesign_version = ""
         robo_print("Gathering code signature information...", LogLevel.VERBOSE)
-        cmd = "codesign --display --verbose=2 -r- \"%s\"" % (input_path)
-        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-        if exitcode == 0:
-            # From stdout:
-            reqs_marker = "designated => "
-            for line in out.split("\n"):
-                if line.startswith(reqs_marker):
-                    codesign_reqs = line[len(reqs_marker):]
-            # From stderr:
-            authority_marker = "Authority="
-            dev_marker = "Authority=Developer ID Application: "
-            vers_marker = "Sealed Resources version="
-            for line in err.split("\n"):  # The info we need is in stderr.
-                if line.startswith(authority_marker):
-                    codesign_authorities.append(line[len(authority_marker):])
-                if line.startswith(dev_marker):
-                    if " (" in line:
-                        line = line.split(" (")[0]
-                    developer = line[len(dev_marker):]
-                if line.startswith(vers_marker):
-                    codesign_version = line[len(vers_marker):len(vers_marker) + 1]
-                    if codesign_version == "1":
-                        facts["warnings"].append(
-                            "This app uses an obsolete code signature.")
-                        # Clear code signature markers, treat app as
-                        # unsigned.
-                        codesign_reqs = ""
-                        codesign_authorities = []
-                        break
+        try:
+            signature = get_backend().code_signature(input_path)
+        except BackendError as error:
+            facts["warnings"].append(
+                "I can't read code signatures on this platform, so I'm "
+                "treating this app as unsigned.")
+            signature = None
+        if signature is not None:
+            codesign_reqs = signature.requirement
+            codesign_authorities = signature.authorities
+            dev_marker = "Developer ID Application: "
+            for authority in codesign_authorities:
+                if authority.startswith(dev_marker):
+                    developer = authority[len(dev_marker):].split(" (")[0]
+            codesign_version = signature.version
+            if codesign_version == "1":
+                facts["warnings"].append(
+                    "This app uses an obsolete code signature.")
+                # Clear code signature markers, treat app as unsigned.
+                codesign_reqs = ""
+                codesign_authorities = []
         if codesign_reqs == "" and len(codesign_authorities) == 0:
             robo_print("App is not signed", LogLevel.VERBOSE, 4)
         else:
             robo_print("Code signature verification requirements recorded", LogLevel.VERBOSE, 4)
             facts["codesign_reqs"] = codesign_reqs
-            robo_print("%s authority names recorded" % len(codesign_authorities), LogLevel.VERBOSE, 4)
+            robo_print("%s authority names recorded",
+                       LogLevel.VERBOSE, 4, len(codesign_authorities))
             facts["codesign_authorities"] = codesign_authorities
         if developer != "":
-            robo_print("Developer: %s" % developer, LogLevel.VERBOSE, 4)
+            robo_print("Developer: %s", LogLevel.VERBOSE, 4, developer)
             facts["developer"] = developer
 
-    return facts
-
 
 def get_app_description(app_name):
     """Use an app's name to generate a description from MacUpdate.com.
@@ -365,29 +419,30 @@ def get_app_description(app_name):
     # MacUpdate search results page.
     description_marker = "-shortdescrip\">"
 
-    cmd = "curl --silent \"http://www.macupdate.com/find/mac/%s\"" % app_name
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
+    try:
+        html = fetch("http://www.macupdate.com/find/mac/%s" % quote(app_name),
+                     timeout=60)
+    except (URLError, socket.error) as err:
+        warning = ("Error occurred while getting description from "
+                   "MacUpdate: %s" % err)
+        return (description, warning)
 
     # For each line in the resulting text, look for the description
     # marker.
-    html = out.split("\n")
-    if exitcode == 0:
-        for line in html:
-            if description_marker in line:
-                # Trim the HTML from the beginning of the line.
-                start = line.find(description_marker) + len(description_marker)
-                # Trim the HTML from the end of the line.
-                description = line[start:].rstrip("</span>")
-                # If we found a description, no need to process further
-                # lines.
-                break
-    else:
-        warning = ("Error occurred while getting description from "
-                   "MacUpdate: %s" % err)
+    for line in html.split("\n"):
+        if description_marker in line:
+            # Trim the HTML from the beginning of the line.
+            start = line.find(description_marker) + len(description_marker)
+            # Trim the HTML from the end of the line.
+            description = line[start:].split("</span>")[0]
+            # If we found a description, no need to process further
+            # lines.
+            break
 
     return (description, warning)
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_archive(input_path, args, facts):
     """Process an archive
 
@@ -412,79 +467,75 @@ def inspect_archive(input_path, args, facts):
 
     # See if we can determine the download URL from the file metadata.
     if "download_url" not in facts:
-        where_froms_string = xattr.getxattr(input_path, "com.apple.metadata:kMDItemWhereFroms")
-        where_froms = FoundationPlist.readPlistFromString(where_froms_string)
+        where_froms = read_where_froms(input_path)
         if len(where_froms) > 0:
             facts["download_url"] = where_froms[0]
-            robo_print("Download URL found in file metadata: %s" % where_froms[0], LogLevel.VERBOSE, 4)
-
-    # Unzip the zip and look for an app. (If this fails, we try tgz
-    # next.)
-    archive_cmds = ({
-        "format": "zip",
-        "cmd": "/usr/bin/unzip \"%s\" -d \"%s\"" % (input_path, os.path.join(CACHE_DIR, "unpacked"))
-    },{
-        "format": "tgz",
-        "cmd": "/usr/bin/tar -zxvf \"%s\" -C \"%s\"" % (input_path, os.path.join(CACHE_DIR, "unpacked"))
-    })
-    for this_format in archive_cmds:
-        exitcode, out, err = get_exitcode_stdout_stderr(this_format["cmd"])
-        if exitcode == 0:
-
-            # Confirmed; the download was a disk image. Make a note of
-            # that.
-            robo_print("Successfully unarchived %s" % this_format["format"], LogLevel.VERBOSE, 4)
-            facts["download_format"] = this_format["format"]
-
-            # If the download filename was ambiguous, change it.
-            if not facts.get("download_filename", input_path).endswith(SUPPORTED_ARCHIVE_FORMATS):
-                facts["download_filename"] = "%s.%s" % (facts.get("download_filename", os.path.basename(input_path)), this_format["format"])
-
-            # Locate and inspect any apps or pkgs on the root level.
-            stop_searching_archive = False
-            for this_file in os.listdir(os.path.join(CACHE_DIR, "unpacked")):
-                if this_file.endswith(".app"):
-                    facts = inspect_app(os.path.join(CACHE_DIR, "unpacked", this_file), args, facts)
-                    stop_searching_archive = True
-                    return facts
-                elif this_file.endswith(SUPPORTED_INSTALL_FORMATS):
-                    facts = inspect_pkg(os.path.join(CACHE_DIR, "unpacked", this_file), args, facts)
-                    stop_searching_archive = True
-                    return facts
+            robo_print("Download URL found in file metadata: %s",
+                       LogLevel.VERBOSE, 4, where_froms[0])
 
-            # Didn't find an app or pkg on the root level? Look deeper.
-            # TODO(Elliot): Pass the relative app/pkg path into the recipe generator.
-            if stop_searching_archive is False:
-                for dirpath, dirnames, filenames in os.walk(os.path.join(CACHE_DIR, "unpacked")):
-                    for dirname in dirnames:
-                        if dirname.startswith("."):
-                            dirnames.remove(dirname)
-                        elif dirname.endswith(".app"):
-                            facts = inspect_app(os.path.join(dirpath, dirname), args, facts)
-                            facts["relative_path"] = os.path.relpath(
-                                os.path.join(dirpath), os.path.join(
-                                    CACHE_DIR, "unpacked")) + "/"
-                            return facts
-                        elif dirname.endswith(".pkg"):  # bundle packages
-                            facts = inspect_pkg(os.path.join(dirpath, dirname), args, facts)
-                            facts["relative_path"] = os.path.relpath(
-                                os.path.join(dirpath), os.path.join(
-                                    CACHE_DIR, "unpacked")) + "/"
-                            return facts
-                    for filename in filenames:
-                        if filename.endswith(".pkg"):  # flat packages
-                            facts = inspect_pkg(os.path.join(dirpath, filename), args, facts)
-                            facts["relative_path"] = os.path.relpath(
-                                os.path.join(dirpath), os.path.join(
-                                    CACHE_DIR, "unpacked")) + "/"
-                            return facts
+    # Unpack the archive (zip, or failing that, tgz) and look for an app.
+    try:
+        archive_format = get_backend().unpack_archive(
+            input_path, os.path.join(CACHE_DIR, "unpacked"))
+    except BackendError:
+        robo_print("Unable to unpack this archive: %s\n(You can ignore this message if the previous attempt to mount the downloaded file as a disk image succeeded.)",
+                   LogLevel.DEBUG, 0, input_path)
+        return facts
 
+    # Confirmed; the download was a disk image. Make a note of
+    # that.
+    robo_print("Successfully unarchived %s",
+               LogLevel.VERBOSE, 4, archive_format)
+    memory_checkpoint("unpack")
+    facts["download_format"] = archive_format
+
+    # If the download filename was ambiguous, change it.
+    if not facts.get("download_filename", input_path).endswith(SUPPORTED_ARCHIVE_FORMATS):
+        facts["download_filename"] = "%s.%s" % (facts.get("download_filename", os.path.basename(input_path)), archive_format)
+
+    # Locate and inspect any apps or pkgs on the root level.
+    stop_searching_archive = False
+    for this_file in os.listdir(os.path.join(CACHE_DIR, "unpacked")):
+        if this_file.endswith(".app"):
+            facts = inspect_app(os.path.join(CACHE_DIR, "unpacked", this_file), args, facts)
+            stop_searching_archive = True
+            return facts
+        elif this_file.endswith(SUPPORTED_INSTALL_FORMATS):
+            facts = inspect_pkg(os.path.join(CACHE_DIR, "unpacked", this_file), args, facts)
+            stop_searching_archive = True
             return facts
 
-    robo_print("Unable to unpack this archive: %s\n(You can ignore this message if the previous attempt to mount the downloaded file as a disk image succeeded.)" % input_path, LogLevel.DEBUG)
+    # Didn't find an app or pkg on the root level? Look deeper.
+    # TODO(Elliot): Pass the relative app/pkg path into the recipe generator.
+    if stop_searching_archive is False:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(CACHE_DIR, "unpacked")):
+            for dirname in dirnames:
+                if dirname.startswith("."):
+                    dirnames.remove(dirname)
+                elif dirname.endswith(".app"):
+                    facts = inspect_app(os.path.join(dirpath, dirname), args, facts)
+                    facts["relative_path"] = os.path.relpath(
+                        os.path.join(dirpath), os.path.join(
+                            CACHE_DIR, "unpacked")) + "/"
+                    return facts
+                elif dirname.endswith(".pkg"):  # bundle packages
+                    facts = inspect_pkg(os.path.join(dirpath, dirname), args, facts)
+                    facts["relative_path"] = os.path.relpath(
+                        os.path.join(dirpath), os.path.join(
+                            CACHE_DIR, "unpacked")) + "/"
+                    return facts
+            for filename in filenames:
+                if filename.endswith(".pkg"):  # flat packages
+                    facts = inspect_pkg(os.path.join(dirpath, filename), args, facts)
+                    facts["relative_path"] = os.path.relpath(
+                        os.path.join(dirpath), os.path.join(
+                            CACHE_DIR, "unpacked")) + "/"
+                    return facts
+
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_bitbucket_url(input_path, args, facts):
     """Process a BitBucket URL
 
@@ -514,7 +565,8 @@ def inspect_bitbucket_url(input_path, args, facts):
     if r_obj is not None:
         bitbucket_repo = r_obj.group(0)
     if bitbucket_repo != "":
-        robo_print("BitBucket repo is: %s" % bitbucket_repo, LogLevel.VERBOSE, 4)
+        robo_print("BitBucket repo is: %s",
+                   LogLevel.VERBOSE, 4, bitbucket_repo)
         facts["bitbucket_repo"] = bitbucket_repo
 
         # Use GitHub API to obtain information about the repo and
@@ -522,9 +574,9 @@ def inspect_bitbucket_url(input_path, args, facts):
         repo_api_url = "https://api.bitbucket.org/2.0/repositories/%s" % bitbucket_repo
         releases_api_url = "https://api.bitbucket.org/2.0/repositories/%s/downloads" % bitbucket_repo
         try:
-            raw_json_repo = urlopen(repo_api_url).read()
+            raw_json_repo = fetch(repo_api_url)
             parsed_repo = json.loads(raw_json_repo)
-            raw_json_release = urlopen(releases_api_url).read()
+            raw_json_release = fetch(releases_api_url)
             parsed_release = json.loads(raw_json_release)
         except HTTPError as err:
             if err.code == 403:
@@ -564,7 +616,7 @@ def inspect_bitbucket_url(input_path, args, facts):
             if parsed_repo.get("name", "") != "":
                 app_name = parsed_repo["name"]
             if app_name != "":
-                robo_print("App name is: %s" % app_name, LogLevel.VERBOSE, 4)
+                robo_print("App name is: %s", LogLevel.VERBOSE, 4, app_name)
                 facts["app_name"] = app_name
 
         # Get full name of owner.
@@ -573,7 +625,8 @@ def inspect_bitbucket_url(input_path, args, facts):
             developer = parsed_repo["owner"]["display_name"]
         if developer != "":
             robo_print("BitBucket owner full name "
-                       "is: %s" % developer, LogLevel.VERBOSE, 4)
+                       "is: %s",
+                       LogLevel.VERBOSE, 4, developer)
             facts["developer"] = developer
 
         # Get app description.
@@ -583,7 +636,8 @@ def inspect_bitbucket_url(input_path, args, facts):
             if parsed_repo.get("description", "") != "":
                 description = parsed_repo["description"]
             if description != "":
-                robo_print("BitBucket description is: %s" % description, LogLevel.VERBOSE, 4)
+                robo_print("BitBucket description is: %s",
+                           LogLevel.VERBOSE, 4, description)
                 facts["description"] = description
             else:
                 facts["warnings"].append(
@@ -595,22 +649,21 @@ def inspect_bitbucket_url(input_path, args, facts):
             download_url = ""
             robo_print("Getting information from latest BitBucket release...", LogLevel.VERBOSE)
             if "values" in parsed_release:
-                for asset in parsed_release["values"]:
-                    for this_format in ALL_SUPPORTED_FORMATS:
-                        if asset["links"]["self"]["href"].endswith(this_format):
-                            download_format = this_format
-                            download_url = asset["links"]["self"]["href"]
-                            break
+                download_url, download_format = select_download_asset(
+                    asset["links"]["self"]["href"]
+                    for asset in parsed_release["values"])
             if download_format != "":
                 robo_print("BitBucket release download format "
-                           "is: %s" % download_format, LogLevel.VERBOSE, 4)
+                           "is: %s",
+                           LogLevel.VERBOSE, 4, download_format)
                 facts["download_format"] = download_format
             else:
                 facts["warnings"].append(
                     "Could not detect BitBucket release download format.")
             if download_url != "":
                 robo_print("BitBucket release download URL "
-                           "is: %s" % download_url, LogLevel.VERBOSE, 4)
+                           "is: %s",
+                           LogLevel.VERBOSE, 4, download_url)
                 facts["download_url"] = download_url
                 facts = inspect_download_url(download_url, args, facts)
             else:
@@ -629,6 +682,7 @@ def inspect_bitbucket_url(input_path, args, facts):
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_disk_image(input_path, args, facts):
     """Process an image
 
@@ -653,85 +707,53 @@ def inspect_disk_image(input_path, args, facts):
 
     # See if we can determine the download URL from the file metadata.
     if "download_url" not in facts:
-        where_froms_string = xattr.getxattr(input_path, "com.apple.metadata:kMDItemWhereFroms")
-        where_froms = FoundationPlist.readPlistFromString(where_froms_string)
+        where_froms = read_where_froms(input_path)
         if len(where_froms) > 0:
             facts["download_url"] = where_froms[0]
-            robo_print("Download URL found in file metadata: %s" % where_froms[0], LogLevel.VERBOSE, 4)
-
-    # Determine whether the dmg has a software license agreement.
-    # Inspired by: https://github.com/autopkg/autopkg/blob/master/Code/autopkglib/DmgMounter.py#L74-L98
-    dmg_has_sla = False
-    cmd = "/usr/bin/hdiutil imageinfo -plist \"%s\"" % input_path
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if exitcode == 0:
-        with open(os.path.join(CACHE_DIR, "dmg_info.plist"), "wb") as dmg_plist:
-            dmg_plist.write(out)
-        try:
-            dmg_info = FoundationPlist.readPlist(os.path.join(CACHE_DIR, "dmg_info.plist"))
-            if dmg_info.get("Properties").get("Software License Agreement") == True:
-                dmg_has_sla = True
-        except FoundationPlist.NSPropertyListSerializationException:
-            pass
+            robo_print("Download URL found in file metadata: %s",
+                       LogLevel.VERBOSE, 4, where_froms[0])
 
     # Mount the dmg and look for an app.
-    cmd = "/usr/bin/hdiutil attach -nobrowse -plist \"%s\"" % input_path
-    if dmg_has_sla is True:
-        exitcode, out, err = get_exitcode_stdout_stderr(cmd, "Y\n")
-    else:
-        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if exitcode == 0:
-
-        # Confirmed; the download was a disk image. Make a note of that.
-        robo_print("Successfully mounted disk image", LogLevel.VERBOSE, 4)
-        facts["download_format"] = "dmg"  # most common disk image format
-
-        # If the download filename was ambiguous, change it.
-        if not facts.get("download_filename", input_path).endswith(SUPPORTED_IMAGE_FORMATS):
-            facts["download_filename"] = facts.get("download_filename", input_path) + ".dmg"
-
-        # Clean the output for cases where the dmg has a license
-        # agreement.
-        out_clean = out[out.find("<?xml"):]
+    try:
+        dmg_mount = get_backend().mount_disk_image(input_path)
+    except BackendError as error:
+        robo_print("Unable to mount %s. (%s)\n(You can ignore this message if the upcoming attempt to unzip the downloaded file as an archive succeeds.)",
+                   LogLevel.DEBUG, 0, input_path, error)
+        return facts
 
-        # Locate and inspect the app.
-        with open(os.path.join(CACHE_DIR, "dmg_attach.plist"), "wb") as dmg_plist:
-            dmg_plist.write(out_clean)
-        try:
-            dmg_dict = FoundationPlist.readPlist(os.path.join(CACHE_DIR, "dmg_attach.plist"))
-        except Exception as error:
-            raise RoboError(
-                "Shoot, I had trouble parsing the output of hdiutil while "
-                "mounting the downloaded dmg. Sorry about that.", error)
-        for entity in dmg_dict["system-entities"]:
-            if "mount-point" in entity:
-                dmg_mount = entity["mount-point"]
-                break
-        for this_file in os.listdir(dmg_mount):
-            if this_file.endswith(".app"):
-                # Copy app to cache folder.
-                # TODO(Elliot): What if .app isn't on root of dmg mount? (#26)
-                attached_app_path = os.path.join(dmg_mount, this_file)
-                cached_app_path = os.path.join(CACHE_DIR, "unpacked", this_file)
-                if not os.path.exists(cached_app_path):
-                    try:
-                        shutil.copytree(attached_app_path, cached_app_path)
-                    except shutil.Error:
-                        pass
-                # Unmount attached volume when done.
-                cmd = "/usr/bin/hdiutil detach \"%s\"" % dmg_mount
-                exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-                facts = inspect_app(cached_app_path, args, facts)
-                break
-            if this_file.endswith(SUPPORTED_INSTALL_FORMATS):
-                facts = inspect_pkg(os.path.join(dmg_mount, this_file), args, facts)
-                break
-    else:
-        robo_print("Unable to mount %s. (%s)\n(You can ignore this message if the upcoming attempt to unzip the downloaded file as an archive succeeds.)" % (input_path, err), LogLevel.DEBUG)
+    # Confirmed; the download was a disk image. Make a note of that.
+    robo_print("Successfully mounted disk image", LogLevel.VERBOSE, 4)
+    facts["download_format"] = "dmg"  # most common disk image format
+
+    # If the download filename was ambiguous, change it.
+    if not facts.get("download_filename", input_path).endswith(SUPPORTED_IMAGE_FORMATS):
+        facts["download_filename"] = facts.get("download_filename", input_path) + ".dmg"
+
+    # Locate and inspect the app.
+    for this_file in os.listdir(dmg_mount):
+        if this_file.endswith(".app"):
+            # Copy app to cache folder.
+            # TODO(Elliot): What if .app isn't on root of dmg mount? (#26)
+            attached_app_path = os.path.join(dmg_mount, this_file)
+            cached_app_path = os.path.join(CACHE_DIR, "unpacked", this_file)
+            if not os.path.exists(cached_app_path):
+                try:
+                    shutil.copytree(attached_app_path, cached_app_path)
+                except shutil.Error:
+                    pass
+            memory_checkpoint("unpack")
+            # Unmount attached volume when done.
+            get_backend().unmount_disk_image(dmg_mount)
+            facts = inspect_app(cached_app_path, args, facts)
+            break
+        if this_file.endswith(SUPPORTED_INSTALL_FORMATS):
+            facts = inspect_pkg(os.path.join(dmg_mount, this_file), args, facts)
+            break
 
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_download_url(input_path, args, facts):
     """Process a direct download URL
 
@@ -758,7 +780,7 @@ def inspect_download_url(input_path, args, facts):
     input_path = input_path.strip().replace(" ", "%20")
 
     # Save the download URL to the dictionary of facts.
-    robo_print("Download URL is: %s" % input_path, LogLevel.VERBOSE, 4)
+    robo_print("Download URL is: %s", LogLevel.VERBOSE, 4, input_path)
     facts["download_url"] = input_path
     facts["is_from_app_store"] = False
 
@@ -803,14 +825,12 @@ def inspect_download_url(input_path, args, facts):
 
     # Actually download the file.
     try:
-        raw_download = urlopen(input_path)
+        raw_download = open_url(input_path)
     except HTTPError as err:
         if err.code == 403:
             # Try again, this time with a user-agent.
             try:
-                opener = build_opener()
-                opener.addheaders = [("User-agent", "Mozilla/5.0")]
-                raw_download = opener.open(input_path)
+                raw_download = open_url(input_path, user_agent="Mozilla/5.0")
                 facts["warnings"].append(
                     "I had to use a different user-agent in order to "
                     "download this file. If you run the recipes and get a "
@@ -859,7 +879,8 @@ def inspect_download_url(input_path, args, facts):
     else:
         # File size is unknown, so we can't show progress.
         file_size = 0
-    with open(os.path.join(CACHE_DIR, filename), "wb") as download_file:
+    with open(os.path.join(CACHE_DIR, filename), "wb") as download_file, \
+            span("download", "http", url=input_path) as download_span:
         file_size_dl = 0
         block_sz = 8192
         while True:
@@ -869,6 +890,7 @@ def inspect_download_url(input_path, args, facts):
             # Write downloaded chunk.
             file_size_dl += len(buffer)
             download_file.write(buffer)
+            emit_progress(input_path, file_size_dl, file_size)
             # Show progress if file size is known.
             if file_size > 0:
                 p = float(file_size_dl) / file_size
@@ -876,12 +898,15 @@ def inspect_download_url(input_path, args, facts):
                 status = status + chr(8)*(len(status)+1)
                 if not args.app_mode:
                     sys.stdout.write(status)
-    robo_print("Downloaded to %s" % os.path.join(CACHE_DIR, filename), LogLevel.VERBOSE, 4)
+        download_span.set(bytes=file_size_dl)
+    robo_print("Downloaded to %s",
+               LogLevel.VERBOSE, 4, os.path.join(CACHE_DIR, filename))
+    memory_checkpoint("download")
 
     # Just in case the "download" was actually a Sparkle feed.
     hidden_sparkle = False
     with open(os.path.join(CACHE_DIR, filename), "r") as download_file:
-        if download_file.read()[:6] == "<?xml ":
+        if download_file.read(6) == "<?xml ":
             robo_print("This download is actually a Sparkle "
                        "feed", LogLevel.VERBOSE, 4)
             hidden_sparkle = True
@@ -899,7 +924,9 @@ def inspect_download_url(input_path, args, facts):
         if filename.lower().endswith(this_format) or this_format in parsed_url.query:
             download_format = this_format
             facts["download_format"] = this_format
-            robo_print("File extension is %s" % this_format, LogLevel.VERBOSE, 4)
+            current_span().set(format=this_format)
+            robo_print("File extension is %s",
+                       LogLevel.VERBOSE, 4, this_format)
             break  # should stop after the first format match
 
     # If we've already seen the app and the download format, there's no
@@ -925,7 +952,8 @@ def inspect_download_url(input_path, args, facts):
     # one).
     if download_format in SUPPORTED_INSTALL_FORMATS:
 
-        robo_print("Download format is %s" % download_format, LogLevel.VERBOSE, 4)
+        robo_print("Download format is %s",
+                   LogLevel.VERBOSE, 4, download_format)
         facts["download_format"] = download_format
 
         # Inspect the package.
@@ -939,6 +967,7 @@ def inspect_download_url(input_path, args, facts):
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_github_url(input_path, args, facts):
     """Process a GitHub URL
 
@@ -985,7 +1014,7 @@ def inspect_github_url(input_path, args, facts):
     else:
         github_repo = path[0] + "/" + path[1]
     if github_repo != "":
-        robo_print("GitHub repo is: %s" % github_repo, LogLevel.VERBOSE, 4)
+        robo_print("GitHub repo is: %s", LogLevel.VERBOSE, 4, github_repo)
         facts["github_repo"] = github_repo
 
         # TODO(Elliot): How can we use GitHub tokens to prevent rate
@@ -999,9 +1028,9 @@ def inspect_github_url(input_path, args, facts):
 
         # Download the information from the GitHub API.
         try:
-            raw_json_repo = urlopen(repo_api_url).read()
-            raw_json_release = urlopen(releases_api_url).read()
-            raw_json_user = urlopen(user_api_url).read()
+            raw_json_repo = fetch(repo_api_url)
+            raw_json_release = fetch(releases_api_url)
+            raw_json_user = fetch(user_api_url)
         except HTTPError as err:
             if err.code == 403:
                 facts["warnings"].append(
@@ -1048,7 +1077,7 @@ def inspect_github_url(input_path, args, facts):
             if parsed_repo.get("name", None) is not None:
                 app_name = parsed_repo["name"]
             if app_name != "":
-                robo_print("App name is: %s" % app_name, LogLevel.VERBOSE, 4)
+                robo_print("App name is: %s", LogLevel.VERBOSE, 4, app_name)
                 facts["app_name"] = app_name
 
         # Get app description.
@@ -1058,8 +1087,8 @@ def inspect_github_url(input_path, args, facts):
             if parsed_repo.get("description", None) is not None:
                 description = parsed_repo["description"]
             if description != "":
-                robo_print("GitHub description is: %s" % description,
-                           LogLevel.VERBOSE, 4)
+                robo_print("GitHub description is: %s",
+                           LogLevel.VERBOSE, 4, description)
                 facts["description"] = description
             else:
                 facts["warnings"].append("No GitHub description provided.")
@@ -1071,23 +1100,21 @@ def inspect_github_url(input_path, args, facts):
             robo_print("Getting information from latest GitHub release...",
                        LogLevel.VERBOSE)
             if "assets" in parsed_release:
-                for asset in parsed_release["assets"]:
-                    for this_format in ALL_SUPPORTED_FORMATS:
-                        if asset["browser_download_url"].endswith(this_format):
-                            download_format = this_format
-                            download_url = asset["browser_download_url"]
-                            break
+                download_url, download_format = select_download_asset(
+                    asset["browser_download_url"]
+                    for asset in parsed_release["assets"])
             if download_format != "":
                 robo_print("GitHub release download format "
-                           "is: %s" % download_format,
-                           LogLevel.VERBOSE, 4)
+                           "is: %s",
+                           LogLevel.VERBOSE, 4, download_format)
                 facts["download_format"] = download_format
             else:
                 facts["warnings"].append(
                     "Could not detect GitHub release download format.")
             if download_url != "":
                 robo_print("GitHub release download URL "
-                           "is: %s" % download_url, LogLevel.VERBOSE, 4)
+                           "is: %s",
+                           LogLevel.VERBOSE, 4, download_url)
                 facts["download_url"] = download_url
                 facts = inspect_download_url(download_url, args, facts)
             else:
@@ -1103,7 +1130,8 @@ def inspect_github_url(input_path, args, facts):
                 developer = parsed_user["name"]
             if developer != "":
                 robo_print("GitHub developer "
-                           "is: %s" % developer, LogLevel.VERBOSE, 4)
+                           "is: %s",
+                           LogLevel.VERBOSE, 4, developer)
                 facts["developer"] = developer
             else:
                 facts["warnings"].append("Could not detect GitHub developer.")
@@ -1125,6 +1153,7 @@ def inspect_github_url(input_path, args, facts):
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_pkg(input_path, args, facts):
     """Process a package
 
@@ -1149,33 +1178,36 @@ def inspect_pkg(input_path, args, facts):
 
     # See if we can determine the download URL from the file metadata.
     if "download_url" not in facts:
-        where_froms_string = xattr.getxattr(input_path, "com.apple.metadata:kMDItemWhereFroms")
-        where_froms = FoundationPlist.readPlistFromString(where_froms_string)
+        where_froms = read_where_froms(input_path)
         if len(where_froms) > 0:
             facts["download_url"] = where_froms[0]
-            robo_print("Download URL found in file metadata: %s" % where_froms[0], LogLevel.VERBOSE, 4)
+            robo_print("Download URL found in file metadata: %s",
+                       LogLevel.VERBOSE, 4, where_froms[0])
 
     # Check whether package is signed.
     robo_print("Checking whether package is signed...", LogLevel.VERBOSE)
-    cmd = "/usr/sbin/pkgutil --check-signature \"%s\"" % input_path
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if exitcode == 1:
-        robo_print("Package is not signed", LogLevel.VERBOSE, 4)
-    elif exitcode == 0:
-        robo_print("Package is signed", LogLevel.VERBOSE, 4)
+    try:
+        pkg_authorities = get_backend().package_signature(input_path)
+    except BackendError as error:
+        robo_print("I don't know whether the package is signed - probably not "
+                   "(%s)", LogLevel.VERBOSE, 4, error)
+        pkg_authorities = []
+    else:
+        if pkg_authorities:
+            robo_print("Package is signed", LogLevel.VERBOSE, 4)
+        else:
+            robo_print("Package is not signed", LogLevel.VERBOSE, 4)
+    if pkg_authorities:
 
         # Get developer name from pkg signature.
         if "developer" not in facts:
             developer = ""
             robo_print("Getting developer from pkg signature...", LogLevel.VERBOSE)
-            marker = "    1. Developer ID Installer: "
-            for line in out.split("\n"):
-                if line.startswith(marker):
-                    if " (" in line:
-                        line = line.split(" (")[0]
-                    developer = line[len(marker):]
+            marker = "Developer ID Installer: "
+            if pkg_authorities[0].startswith(marker):
+                developer = pkg_authorities[0][len(marker):].split(" (")[0]
             if developer != "":
-                robo_print("Developer is: %s" % developer, LogLevel.VERBOSE, 4)
+                robo_print("Developer is: %s", LogLevel.VERBOSE, 4, developer)
                 facts["developer"] = developer
             else:
                 robo_print("Developer is unknown", LogLevel.VERBOSE, 4)
@@ -1183,132 +1215,129 @@ def inspect_pkg(input_path, args, facts):
         # Get code signature verification authority names from pkg
         # signature.
         if len(facts["codesign_authorities"]) == 0:
-            codesign_authorities = []
             robo_print("Getting package signature authority names...", LogLevel.VERBOSE)
-            for line in out.split("\n"):
-                if re.match("^    [\d]\. ", line):
-                    codesign_authorities.append(line[7:])
-            if codesign_authorities != []:
-                robo_print("%s authority names recorded" % len(codesign_authorities), LogLevel.VERBOSE, 4)
-                facts["codesign_authorities"] = codesign_authorities
-            else:
-                robo_print("Authority names unknown, treating as unsigned", LogLevel.VERBOSE, 4)
-
-    else:
-        robo_print("I don't know whether the package is signed - probably not "
-                   "(pkgutil returned exit code %s)" % exitcode, LogLevel.VERBOSE, 4)
+            robo_print("%s authority names recorded",
+                       LogLevel.VERBOSE, 4, len(pkg_authorities))
+            facts["codesign_authorities"] = pkg_authorities
 
     # Expand the flat package and look for more facts.
     robo_print("Expanding package to look for clues...", LogLevel.VERBOSE)
     expand_path = os.path.join(CACHE_DIR, "expanded")
     if os.path.exists(expand_path):
         shutil.rmtree(expand_path)
-    cmd = "/usr/sbin/pkgutil --expand \"%s\" \"%s\"" % (input_path, expand_path)
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if exitcode == 0:
-        # Locate and inspect the app.
-        robo_print("Package expanded to: %s" % os.path.join(CACHE_DIR, "expanded"), LogLevel.VERBOSE, 4)
-        install_filename = ""
-        for dirpath, dirnames, filenames in os.walk(os.path.join(CACHE_DIR, "expanded")):
-            for dirname in dirnames:
-                if dirname.startswith("."):
-                    dirnames.remove(dirname)
-            for filename in filenames:
+    try:
+        get_backend().expand_package(input_path, expand_path)
+    except BackendError as error:
+        robo_print("Unable to expand package (%s)", LogLevel.DEBUG, 4, error)
+        return facts
 
-                if filename == "PackageInfo":
-                    robo_print("Getting information from PackageInfo file...", LogLevel.VERBOSE)
-                    pkginfo_file = open(os.path.join(CACHE_DIR, "expanded", dirpath, filename), "r")
-                    pkginfo_parsed = parse(pkginfo_file)
-
-                    bundle_id = ""
-                    if "bundle_id" not in facts:
-                        bundle_id = pkginfo_parsed.getroot().attrib["identifier"]
-                    if bundle_id != "":
-                        robo_print("Bundle identifier: %s" % bundle_id, LogLevel.VERBOSE, 4)
-                        facts["bundle_id"] = bundle_id
-
-                    install_loc = pkginfo_parsed.getroot().attrib.get("install-location", "")
-                    if install_loc != "":
-                        robo_print("Install location: %s" % install_loc, LogLevel.VERBOSE, 4)
+    # Locate and inspect the app.
+    robo_print("Package expanded to: %s",
+               LogLevel.VERBOSE, 4, os.path.join(CACHE_DIR, "expanded"))
+    install_filename = ""
+    for dirpath, dirnames, filenames in os.walk(os.path.join(CACHE_DIR, "expanded")):
+        for dirname in dirnames:
+            if dirname.startswith("."):
+                dirnames.remove(dirname)
+        for filename in filenames:
+
+            if filename == "PackageInfo":
+                robo_print("Getting information from PackageInfo file...", LogLevel.VERBOSE)
+                bundle_id, install_loc = parse_package_info(
+                    os.path.join(CACHE_DIR, "expanded", dirpath, filename))
+
+                if "bundle_id" not in facts and bundle_id != "":
+                    robo_print("Bundle identifier: %s",
+                               LogLevel.VERBOSE, 4, bundle_id)
+                    facts["bundle_id"] = bundle_id
+
+                if install_loc != "":
+                    robo_print("Install location: %s",
+                               LogLevel.VERBOSE, 4, install_loc)
+                else:
+                    robo_print("No install location specified", LogLevel.VERBOSE, 4)
+
+                install_filename = os.path.basename(install_loc)
+                robo_print("Install filename: %s",
+                           LogLevel.VERBOSE, 4, install_filename)
+                continue  # TODO(Elliot): Or should we stop after the first? (#27)
+
+            if filename == "Payload":
+                # We found a payload. Let's peek inside and see if
+                # there's an app.
+                robo_print("Extracting the package payload to see if we "
+                           "can find an app...", LogLevel.VERBOSE)
+                app_found = False
+                payload_path = os.path.join(CACHE_DIR, "expanded", dirpath, filename)
+                if install_filename.endswith(".app"):
+                    extracted_app_path = os.path.join(CACHE_DIR, "extracted_apps", install_filename)
+                    if os.path.exists(extracted_app_path):
+                        shutil.rmtree(extracted_app_path)
+                    try:
+                        get_backend().extract_payload(payload_path,
+                                                      extracted_app_path)
+                    except BackendError as error:
+                        robo_print("Error extracting the payload. (%s)",
+                                   LogLevel.VERBOSE, 4, error)
                     else:
-                        robo_print("No install location specified", LogLevel.VERBOSE, 4)
-
-                    install_filename = os.path.basename(install_loc)
-                    robo_print("Install filename: %s" % install_filename, LogLevel.VERBOSE, 4)
-                    continue  # TODO(Elliot): Or should we stop after the first? (#27)
-
-                if filename == "Payload":
-                    # We found a payload. Let's peek inside and see if
-                    # there's an app.
-                    robo_print("Extracting the package payload to see if we "
-                               "can find an app...", LogLevel.VERBOSE)
-                    app_found = False
-                    payload_path = os.path.join(CACHE_DIR, "expanded", dirpath, filename)
-                    if install_filename.endswith(".app"):
-                        extracted_app_path = os.path.join(CACHE_DIR, "extracted_apps", install_filename)
-                        if os.path.exists(extracted_app_path):
-                            shutil.rmtree(extracted_app_path)
-                        cmd = "/usr/bin/gunzip -c \"%s\" | pax -r -s \",./,%s/,\"" % (payload_path, extracted_app_path)
-                        # TODO(Elliot): This doesn't work because it's outside the working directory. (#27)
-                        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-                        if exitcode == 0:
+                        app_found = True
+                        robo_print("Found app: %s",
+                                   LogLevel.VERBOSE, 4,
+                                   extracted_app_path)
+                        facts = inspect_app(extracted_app_path, args, facts)
+                        break  # Struck pay dirt, so stop iterating
+                               # through apps in the payload
+
+                elif install_filename == "":
+                    try:
+                        app_lines = get_backend().list_payload_apps(
+                            payload_path)
+                    except BackendError as error:
+                        robo_print("Error while examining the package payload. "
+                                   "(%s)",
+                                   LogLevel.VERBOSE, 4, error)
+                        app_lines = []
+                    for line in app_lines:
+                        facts["blocking_applications"].append(os.path.basename(line))
+                        if ".app/Contents/" not in line:
                             app_found = True
-                            robo_print("Found app: %s" % extracted_app_path, LogLevel.VERBOSE, 4)
-                            facts = inspect_app(extracted_app_path, args, facts)
-                            break  # Struck pay dirt, so stop iterating
-                                   # through apps in the payload
-                        else:
-                            robo_print("Error extracting the payload. (%s)" % err, LogLevel.VERBOSE, 4)
-
-                    elif install_filename == "":
-
-                        cmd = "/usr/bin/gunzip -c \"%s\" | pax" % payload_path
-                        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-                        if exitcode == 0:
-                            out = out.split("\n")
-                            for line in out:
-                                if line.endswith(".app"):
-                                    facts["blocking_applications"].append(os.path.basename(line))
-                                    if ".app/Contents/" not in line:
-                                        app_found = True
-                                        robo_print("Found app: %s" % line, LogLevel.VERBOSE, 4)
-                                        extracted_app_path = os.path.join(CACHE_DIR, "extracted_apps", os.path.split(line)[1])
-                                        cmd = "/usr/bin/gunzip -c \"%s\" | pax -r -s \",%s,%s,\"" % (os.path.join(CACHE_DIR, "expanded", filename), line, extracted_app_path)
-                                        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-                                        if exitcode == 0:
-                                            facts = inspect_app(extracted_app_path, args, facts)
-                                            break  # Struck pay dirt, so stop iterating
-                                                   # through apps in the payload
-                                            # TODO(Elliot): Should we stop at the first app? (#27)
-                                            # Find multiple, but use the one with the shortest path?
-                                            # Find multiple, but use the largest file size?
-                                            # Inspect all of them, use only the one with a Sparkle feed?
-                                        else:
-                                            robo_print("Error while extracting the package payload. "
-                                                       "(%s)" % err, LogLevel.VERBOSE, 4)
-                        else:
-                            robo_print("Error while examining the package payload. "
-                                       "(%s)" % err, LogLevel.VERBOSE, 4)
-
-                    if app_found is False:
-                        robo_print("Did not find an app in the package "
-                                   "payload", LogLevel.VERBOSE, 4)
-                    break  # Once we're done examining the Payload, there's not
-                           # much else we can examine.
-
-                if filename.endswith(".app"):
-                    facts = inspect_app(filename, args, facts)
-                    break  # Struck pay dirt, so stop iterating through files
-                           # in the package
-
-    else:
-        robo_print("Unable to expand package", LogLevel.DEBUG, 4)
+                            robo_print("Found app: %s",
+                                       LogLevel.VERBOSE, 4, line)
+                            extracted_app_path = os.path.join(CACHE_DIR, "extracted_apps", os.path.split(line)[1])
+                            try:
+                                get_backend().extract_payload(
+                                    payload_path, extracted_app_path, line)
+                            except BackendError as error:
+                                robo_print("Error while extracting the package payload. "
+                                           "(%s)",
+                                           LogLevel.VERBOSE, 4,
+                                           error)
+                            else:
+                                facts = inspect_app(extracted_app_path, args, facts)
+                                break  # Struck pay dirt, so stop iterating
+                                       # through apps in the payload
+                                # TODO(Elliot): Should we stop at the first app? (#27)
+                                # Find multiple, but use the one with the shortest path?
+                                # Find multiple, but use the largest file size?
+                                # Inspect all of them, use only the one with a Sparkle feed?
+
+                if app_found is False:
+                    robo_print("Did not find an app in the package "
+                               "payload", LogLevel.VERBOSE, 4)
+                break  # Once we're done examining the Payload, there's not
+                       # much else we can examine.
+
+            if filename.endswith(".app"):
+                facts = inspect_app(filename, args, facts)
+                break  # Struck pay dirt, so stop iterating through files
+                       # in the package
 
     # TODO(Elliot): What info do we need to gather to produce recipes here? (#27)
 
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_sourceforge_url(input_path, args, facts):
     """Process a SourceForge URL
 
@@ -1364,7 +1393,7 @@ def inspect_sourceforge_url(input_path, args, facts):
         # Use SourceForge API to obtain project information.
         project_api_url = "https://sourceforge.net/rest/p/" + proj_name
         try:
-            raw_json = urlopen(project_api_url).read()
+            raw_json = fetch(project_api_url)
         except HTTPError as err:
             if err.code == 403:
                 facts["warnings"].append(
@@ -1407,7 +1436,7 @@ def inspect_sourceforge_url(input_path, args, facts):
                 if parsed_json["name"] != "":
                     app_name = parsed_json["name"]
             if app_name != "":
-                robo_print("App name is: %s" % app_name, LogLevel.VERBOSE, 4)
+                robo_print("App name is: %s", LogLevel.VERBOSE, 4, app_name)
                 facts["app_name"] = app_name
 
         # Determine project ID.
@@ -1417,7 +1446,8 @@ def inspect_sourceforge_url(input_path, args, facts):
             if "sourceforge_group_id" in this_dict:
                 proj_id = this_dict["sourceforge_group_id"]
         if proj_id != "":
-            robo_print("SourceForge project ID is: %s" % proj_id, LogLevel.VERBOSE, 4)
+            robo_print("SourceForge project ID is: %s",
+                       LogLevel.VERBOSE, 4, proj_id)
             facts["sourceforge_id"] = proj_id
         else:
             facts["warnings"].append(
@@ -1433,7 +1463,8 @@ def inspect_sourceforge_url(input_path, args, facts):
                 elif parsed_json["short_description"] != "":
                     description = parsed_json["short_description"]
             if description != "":
-                robo_print("SourceForge description is: %s" % description, LogLevel.VERBOSE, 4)
+                robo_print("SourceForge description is: %s",
+                           LogLevel.VERBOSE, 4, description)
                 facts["description"] = description
             else:
                 facts["warnings"].append(
@@ -1447,7 +1478,7 @@ def inspect_sourceforge_url(input_path, args, facts):
             # Example: http://sourceforge.net/projects/cord/rss
             files_rss = "http://sourceforge.net/projects/%s/rss" % proj_name
             try:
-                raw_xml = urlopen(files_rss)
+                raw_xml = open_url(files_rss)
             except Exception as err:
                 facts["warnings"].append(
                     "Error occurred while inspecting SourceForge RSS feed: "
@@ -1455,8 +1486,8 @@ def inspect_sourceforge_url(input_path, args, facts):
             doc = parse(raw_xml)
 
             # Get the latest download URL.
-            download_url = ""
             robo_print("Determining download URL from SourceForge RSS feed...", LogLevel.VERBOSE)
+            file_urls = []
             for item in doc.iterfind("channel/item"):
                 # TODO(Elliot): The extra-info tag is not a reliable
                 # indicator of which item should actually be downloaded.
@@ -1464,8 +1495,13 @@ def inspect_sourceforge_url(input_path, args, facts):
                 # http://sourceforge.net/projects/grandperspectiv/rss
                 search = "{https://sourceforge.net/api/files.rdf#}extra-info"
                 if item.find(search).text.startswith("data"):
-                    download_url = item.find("link").text.rstrip("/download")
-                    break
+                    file_urls.append(item.find("link").text.rstrip("/download"))
+            # Prefer the newest file we know how to handle, but fall back
+            # to the newest file of any kind.
+            download_url, _ = select_download_asset(file_urls)
+            if download_url == "":
+                download_url = max_by_version(
+                    file_urls, key=version_from_filename) or ""
             if download_url != "":
                 facts = inspect_download_url(download_url, args, facts)
             else:
@@ -1486,6 +1522,7 @@ def inspect_sourceforge_url(input_path, args, facts):
     return facts
 
 
+@traced("inspect", attrs=("input_path",))
 def inspect_sparkle_feed_url(input_path, args, facts):
     """Process a Sparkle feed URL
 
@@ -1509,19 +1546,17 @@ def inspect_sparkle_feed_url(input_path, args, facts):
         facts["inspections"].append("sparkle_feed_url")
 
     # Save the Sparkle feed URL to the dictionary of facts.
-    robo_print("Sparkle feed is: %s" % input_path, LogLevel.VERBOSE, 4)
+    robo_print("Sparkle feed is: %s", LogLevel.VERBOSE, 4, input_path)
     facts["sparkle_feed"] = input_path
 
     # Download the Sparkle feed.
     try:
-        raw_xml = urlopen(input_path)
+        raw_xml = open_url(input_path)
     except HTTPError as err:
         if err.code == 403:
             # Try again, this time with a user-agent.
             try:
-                opener = build_opener()
-                opener.addheaders = [("User-agent", "Mozilla/5.0")]
-                raw_xml = opener.open(input_path)
+                raw_xml = open_url(input_path, user_agent="Mozilla/5.0")
                 facts["warnings"].append(
                     "I had to use a different user-agent in order to read "
                     "this Sparkle feed. If you run the recipes and get a "
@@ -1561,7 +1596,6 @@ def inspect_sparkle_feed_url(input_path, args, facts):
             return facts
 
     # Parse the Sparkle feed.
-    xmlns = "http://www.andymatuschak.org/xml-namespaces/sparkle"
     try:
         doc = parse(raw_xml)
     except ParseError as err:
@@ -1572,22 +1606,14 @@ def inspect_sparkle_feed_url(input_path, args, facts):
 
 
     # Determine whether the Sparkle feed provides a version number.
-    sparkle_provides_version = False
-    latest_version = "0"
+    latest_version = ""
     latest_url = ""
     robo_print("Getting information from Sparkle feed...", LogLevel.VERBOSE)
-    for item in doc.iterfind("channel/item/enclosure"):
-        if item.get("{%s}shortVersionString" % xmlns) is not None:
-            sparkle_provides_version = True
-            if LooseVersion(item.get("{%s}shortVersionString" % xmlns)) > LooseVersion(latest_version):
-                latest_version = item.get("{%s}shortVersionString" % xmlns)
-                latest_url = item.attrib["url"]
-        if item.get("{%s}version" % xmlns) is not None:
-            sparkle_provides_version = True
-            if LooseVersion(item.get("{%s}version" % xmlns)) > LooseVersion(latest_version):
-                latest_version = item.get("{%s}version" % xmlns)
-                latest_url = item.attrib["url"]
+    enclosures = get_sparkle_enclosures(doc)
+    sparkle_provides_version = len(enclosures) > 0
     if sparkle_provides_version is True:
+        latest_version, latest_url = max_by_version(
+            enclosures, key=lambda enclosure: enclosure[0])
         robo_print("The Sparkle feed provides a version "
                    "number", LogLevel.VERBOSE, 4)
     else:
@@ -1595,7 +1621,8 @@ def inspect_sparkle_feed_url(input_path, args, facts):
                    "number", LogLevel.VERBOSE, 4)
     facts["sparkle_provides_version"] = sparkle_provides_version
     if latest_version != "":
-        robo_print("The latest version is %s" % latest_version, LogLevel.VERBOSE, 4)
+        robo_print("The latest version is %s",
+                   LogLevel.VERBOSE, 4, latest_version)
     if latest_url != "":
         facts = inspect_download_url(latest_url, args, facts)
 
@@ -1609,3 +1636,87 @@ def inspect_sparkle_feed_url(input_path, args, facts):
             facts = inspect_sourceforge_url(input_path, args, facts)
 
     return facts
+
+
+def read_where_froms(path):
+    """Return the URLs a downloaded file came from, per its metadata.
+
+    Args:
+        path: Path to a downloaded file.
+
+    Returns:
+        The list of URLs in the file's kMDItemWhereFroms attribute
+        (empty if it has none, or the platform doesn't keep them).
+    """
+    return get_backend().read_where_froms(path)
+
+
+def get_sparkle_enclosures(doc):
+    """Collect the versioned enclosures from a parsed Sparkle feed.
+
+    Args:
+        doc: An ElementTree of the Sparkle feed.
+
+    Returns:
+        A list of (version, url) tuples, in feed order. An enclosure
+        that specifies both shortVersionString and version contributes
+        a tuple for each.
+    """
+    xmlns = "http://www.andymatuschak.org/xml-namespaces/sparkle"
+    version_attribs = ("{%s}shortVersionString" % xmlns, "{%s}version" % xmlns)
+    enclosures = []
+    for item in doc.iterfind("channel/item/enclosure"):
+        for attrib in version_attribs:
+            version = item.get(attrib)
+            if version is not None:
+                enclosures.append((version, item.attrib["url"]))
+    return enclosures
+
+
+def parse_package_info(path):
+    """Read the identifier and install location from a PackageInfo file.
+
+    Both are attributes of the root pkg-info element, so parsing stops
+    at its start tag instead of building the tree of bundles and
+    scripts that follows.
+
+    Args:
+        path: Path to the PackageInfo file of an expanded flat package.
+
+    Returns:
+        A (bundle_id, install_location) tuple. Either is an empty string
+        if the PackageInfo doesn't specify it.
+
+    Raises:
+        ParseError: The file isn't valid XML.
+    """
+    with open(path) as pkginfo_file:
+        for _, root in iterparse(pkginfo_file, events=("start",)):
+            return (root.attrib.get("identifier", ""),
+                    root.attrib.get("install-location", ""))
+    return "", ""
+
+
+def select_download_asset(urls):
+    """Choose the newest downloadable file from a list of release URLs.
+
+    Only files in a supported format are considered. Versions are taken
+    from the file names; files without a recognizable version tie with
+    each other, in which case the first one wins.
+
+    Args:
+        urls: An iterable of download URLs.
+
+    Returns:
+        A (download_url, download_format) tuple. Both are empty strings
+        if no URL is in a supported format.
+    """
+    candidates = []
+    for url in urls:
+        for this_format in ALL_SUPPORTED_FORMATS:
+            if url.endswith(this_format):
+                candidates.append((url, this_format))
+                break
+    newest = max_by_version(candidates,
+                            key=lambda asset: version_from_filename(asset[0]))
+    return newest or ("", "")
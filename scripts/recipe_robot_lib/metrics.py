@@ -0,0 +1,403 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+metrics.py
+
+Counters and histograms that add up across runs, for when Recipe Robot
+is run many times by the same process (or watched by a monitoring
+system).
+
+Metrics are kept in a MetricsRegistry and rendered in the Prometheus
+text exposition format. They can be written to a file at intervals
+(start_file_writer), served over HTTP at /metrics (start_server), or
+both. The metrics Recipe Robot records are defined at the bottom of this
+module, and are updated at the boundaries of the inspect and generate
+phases, and by the command runner and HTTP client.
+"""
+
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from contextlib import contextmanager
+import os
+import tempfile
+import threading
+import time
+
+
+# Upper bounds of the buckets for histograms of seconds.
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+                   300, float("inf"))
+
+# Seconds between writes of the metrics file.
+DEFAULT_WRITE_INTERVAL = 15
+
+# The Facts lists whose new items are counted as messages.
+MESSAGE_LEVELS = (("warnings", "warning"), ("errors", "error"),
+                  ("reminders", "reminder"))
+
+
+def _format_value(value):
+    """Format a sample value as Prometheus expects."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values):
+    """Format label names and values as {name="value",...}."""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = unicode(value).encode("utf-8") if isinstance(
+            value, unicode) else str(value)
+        value = value.replace("\\", "\\\\").replace(
+            "\"", "\\\"").replace("\n", "\\n")
+        pairs.append("%s=\"%s\"" % (name, value))
+    return "{%s}" % ",".join(pairs)
+
+
+class _Metric(object):
+    """Shared parts of Counter and Histogram."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        # Tuple of label values -> value.
+        self._values = {}
+
+    def _key(self, labels):
+        """Return the label values for labels, in order."""
+        if set(labels) != set(self.labels):
+            raise ValueError("%s takes labels %s, not %s" % (
+                self.name, ", ".join(self.labels), ", ".join(labels)))
+        return tuple(labels[name] for name in self.labels)
+
+    def clear(self):
+        """Forget all recorded values."""
+        with self._lock:
+            self._values = {}
+
+    def render(self):
+        """Return the metric in the Prometheus text format, as lines."""
+        lines = ["# HELP %s %s" % (self.name, self.documentation),
+                 "# TYPE %s %s" % (self.name, self.kind)]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        """Return the sample lines for one set of label values."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A count that only goes up, e.g. of inspections or bytes."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the count for labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the count for labels."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def items(self):
+        """Return a list of (labels dict, count) pairs."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(dict(zip(self.labels, key)), value)
+                for key, value in values]
+
+    def _render_value(self, key, value):
+        return ["%s%s %s" % (self.name, _format_labels(self.labels, key),
+                             _format_value(value))]
+
+
+class Histogram(_Metric):
+    """Observations (e.g. latencies) counted in buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=SECONDS_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+
+    def observe(self, value, **labels):
+        """Record one observation of value for labels."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how many seconds the block took, even if it raises."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def count(self, **labels):
+        """Return how many observations were recorded for labels."""
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        names = self.labels + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append("%s_bucket%s %d" % (
+                self.name, _format_labels(names, key + (_format_value(
+                    bound),)), cumulative))
+        labels = _format_labels(self.labels, key)
+        lines.append("%s_sum%s %s" % (self.name, labels,
+                                      _format_value(total)))
+        lines.append("%s_count%s %d" % (self.name, labels, cumulative))
+        return lines
+
+
+class MetricsRegistry(object):
+    """The set of metrics that are exported together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        """Create and register a Counter."""
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(),
+                  buckets=SECONDS_BUCKETS):
+        """Create and register a Histogram."""
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def clear(self):
+        """Forget the values recorded by every metric."""
+        for metric in self._metrics:
+            metric.clear()
+
+    def render(self):
+        """Return every metric in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Replace path with the current metrics, atomically.
+
+        Scrapers reading the file (e.g. node_exporter's textfile
+        collector) never see it half-written.
+        """
+        path = os.path.expanduser(path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as metrics_file:
+                metrics_file.write(self.render())
+            os.chmod(temp_path, 0644)
+            os.rename(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """Return the process-wide MetricsRegistry."""
+    return _registry
+
+
+class MetricsFileWriter(object):
+    """Writes a registry to a file every few seconds, from a thread."""
+
+    def __init__(self, registry, path, interval=DEFAULT_WRITE_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name="metrics-writer")
+        self._thread.daemon = True
+
+    def start(self):
+        """Write the file now, and then at every interval."""
+        self.registry.write(self.path)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.registry.write(self.path)
+            except (IOError, OSError):
+                # Try again at the next interval.
+                pass
+
+    def stop(self):
+        """Stop writing at intervals, and write the file one last time."""
+        self._stopped.set()
+        self._thread.join()
+        self.registry.write(self.path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the registry's metrics at /metrics."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MetricsServer(object):
+    """Serves a registry over HTTP, for Prometheus to scrape."""
+
+    def __init__(self, registry, port, address="127.0.0.1"):
+        self._server = HTTPServer((address, port), _MetricsHandler)
+        self._server.registry = registry
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="metrics-server")
+        self._thread.daemon = True
+
+    def start(self):
+        """Start answering requests."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop answering requests and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_exporters = []
+
+
+def start_file_writer(path, interval=DEFAULT_WRITE_INTERVAL):
+    """Write the process-wide metrics to path every interval seconds."""
+    writer = MetricsFileWriter(_registry, path, interval)
+    writer.start()
+    _exporters.append(writer)
+    return writer
+
+
+def start_server(port, address="127.0.0.1"):
+    """Serve the process-wide metrics at http://address:port/metrics."""
+    server = MetricsServer(_registry, port, address)
+    server.start()
+    _exporters.append(server)
+    return server
+
+
+def stop_exporters():
+    """Stop every exporter, writing metrics files one last time."""
+    while _exporters:
+        _exporters.pop().stop()
+
+
+@contextmanager
+def count_messages(phase, facts):
+    """Count the warnings, errors and reminders added during a phase.
+
+    An exception that escapes the block is counted as an error.
+
+    Args:
+        phase: The phase's name, e.g. "inspect".
+        facts: The Facts whose message lists are watched.
+    """
+    before = dict((key, len(facts[key])) for key, _ in MESSAGE_LEVELS)
+    try:
+        yield
+    except BaseException:
+        MESSAGES.inc(level="error", phase=phase)
+        raise
+    finally:
+        for key, level in MESSAGE_LEVELS:
+            added = len(facts[key]) - before[key]
+            if added > 0:
+                MESSAGES.inc(added, level=level, phase=phase)
+
+
+INSPECTIONS = _registry.counter(
+    "recipe_robot_inspections_total",
+    "Input paths inspected, by input type.", ("input_type",))
+INSPECTION_SECONDS = _registry.histogram(
+    "recipe_robot_inspection_seconds",
+    "Time taken to inspect an input path, by input type.", ("input_type",))
+GENERATION_SECONDS = _registry.histogram(
+    "recipe_robot_generation_seconds",
+    "Time taken to generate a recipe, by recipe type.", ("recipe_type",))
+RECIPES_WRITTEN = _registry.counter(
+    "recipe_robot_recipes_written_total",
+    "Recipes written, by recipe type.", ("recipe_type",))
+MESSAGES = _registry.counter(
+    "recipe_robot_messages_total",
+    "Warnings, errors and reminders, by phase.", ("level", "phase"))
+DOWNLOAD_BYTES = _registry.counter(
+    "recipe_robot_download_bytes_total",
+    "Bytes of HTTP response bodies received, by host.", ("host",))
+CACHE_LOOKUPS = _registry.counter(
+    "recipe_robot_cache_lookups_total",
+    "Cache lookups, by cache and result (hit or miss).", ("cache", "result"))
+COMMAND_SECONDS = _registry.histogram(
+    "recipe_robot_command_seconds",
+    "Wall time of external commands, by command.", ("command",))
@@ -0,0 +1,271 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+notifications.py
+
+Delivers Facts updates to whoever is listening (usually the Recipe Robot
+app).
+
+Notifications are posted to a NotificationBus, which queues them and
+hands them to its transports in batches from a background thread.
+Identical notifications posted within the same batch window are only
+delivered once. If no transport is subscribed, posting does nothing.
+"""
+
+
+import atexit
+import json
+import socket
+import threading
+import time
+
+from .tools import robo_print, LogLevel
+
+
+NOTIFICATION_PREFIX = "com.elliotjordan.recipe-robot.dnc."
+
+# Seconds to wait for more notifications before delivering a batch.
+DEFAULT_WINDOW = 0.05
+
+
+class NotificationBus(object):
+    """Queues, coalesces and delivers notifications to transports."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        """Set up a bus with no transports.
+
+        Args:
+            window: Seconds to collect notifications before delivering
+                them as one batch.
+        """
+        self.window = window
+        self._transports = []
+        self._pending = []
+        self._pending_set = set()
+        self._delivering = False
+        self._flushing = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def active(self):
+        """True if any transport is subscribed."""
+        return bool(self._transports)
+
+    def subscribe(self, transport):
+        """Start delivering notifications to transport."""
+        with self._cond:
+            self._transports.append(transport)
+
+    def unsubscribe(self, transport):
+        """Stop delivering notifications to transport, and close it."""
+        self.flush()
+        with self._cond:
+            if transport in self._transports:
+                self._transports.remove(transport)
+        transport.close()
+
+    def post(self, message_type, message):
+        """Queue a notification for delivery.
+
+        Args:
+            message_type: Notification type, e.g. "warnings". The app
+                listens for NOTIFICATION_PREFIX + message_type.
+            message: The notification's message.
+        """
+        if not self._transports:
+            return
+        if isinstance(message, unicode):
+            message = message.encode("utf-8")
+        event = (message_type, message)
+        with self._cond:
+            if event in self._pending_set:
+                return
+            self._pending.append(event)
+            self._pending_set.add(event)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="NotificationBus")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued notification has been delivered.
+
+        Args:
+            timeout: Maximum number of seconds to wait.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            # Don't wait out the batch window.
+            self._flushing = True
+            self._cond.notify_all()
+            try:
+                while self._pending or self._delivering:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing = False
+
+    def close(self):
+        """Deliver what's queued, stop delivering, then close transports."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            # A later post() starts a new delivery thread.
+            self._closed = False
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def _run(self):
+        """Deliver batches of notifications as they arrive."""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Give related notifications a moment to arrive.
+                deadline = time.time() + self.window
+                while not self._flushing and not self._closed:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending
+                self._pending = []
+                self._pending_set = set()
+                self._delivering = True
+                transports = list(self._transports)
+            try:
+                for transport in transports:
+                    try:
+                        transport.send(batch)
+                    except Exception as error:  # pylint: disable=broad-except
+                        robo_print("Unable to deliver notifications via %s: %s",
+                                   LogLevel.DEBUG, 0,
+                                   type(transport).__name__, error)
+            finally:
+                with self._cond:
+                    self._delivering = False
+                    self._cond.notify_all()
+
+
+class Transport(object):
+    """Base class for notification transports."""
+
+    def send(self, events):
+        """Deliver a batch of (message_type, message) tuples."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the transport."""
+        pass
+
+
+class DistributedNotificationTransport(Transport):
+    """Posts notifications to the macOS distributed notification center."""
+
+    def __init__(self):
+        # pylint: disable=no-name-in-module
+        from Foundation import (NSDistributedNotificationCenter,
+                                NSNotificationDeliverImmediately)
+        # pylint: enable=no-name-in-module
+        # NSDistributedNotificationCenter is the NotificationCenter
+        # that allows messages to be sent between applications.
+        self.notification_center = (
+            NSDistributedNotificationCenter.defaultCenter())
+        self.options = NSNotificationDeliverImmediately
+
+    def send(self, events):
+        for message_type, message in events:
+            userInfo = {"message": message}  # pylint: disable=invalid-name
+            self.notification_center.postNotificationName_object_userInfo_options_(
+                NOTIFICATION_PREFIX + message_type, None, userInfo,
+                self.options)
+
+
+class JSONLinesTransport(Transport):
+    """Writes each notification as a line of JSON to a file object."""
+
+    def __init__(self, stream):
+        """Set up a transport that writes to stream.
+
+        Args:
+            stream: A writable file-like object.
+        """
+        self.stream = stream
+
+    def send(self, events):
+        for message_type, message in events:
+            self.stream.write(json.dumps(
+                {"type": message_type, "message": message}) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+class UnixSocketTransport(JSONLinesTransport):
+    """Streams notifications as JSON lines over a Unix domain socket."""
+
+    def __init__(self, path):
+        """Connect to the Unix socket at path."""
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        super(UnixSocketTransport, self).__init__(self.socket.makefile("w"))
+
+    def close(self):
+        super(UnixSocketTransport, self).close()
+        self.socket.close()
+
+
+class MemoryTransport(Transport):
+    """Keeps delivered notifications in a list. Useful for testing."""
+
+    def __init__(self):
+        self.events = []
+
+    def send(self, events):
+        self.events.extend(events)
+
+
+_bus = NotificationBus()
+atexit.register(_bus.close)
+
+
+def get_notification_bus():
+    """Return the process-wide NotificationBus."""
+    return _bus
+
+
+def post_notification(message_type, message):
+    """Post a notification to the process-wide bus."""
+    _bus.post(message_type, message)
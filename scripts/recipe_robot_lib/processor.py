@@ -25,20 +25,54 @@ write recipes.
 
 Makes Processor subclasses from importing and introspection on the
 AutoPkg autopkglib.
-"""
 
+Importing autopkglib imports every AutoPkg processor, which takes a
+while, so it's put off until a processor class is first used (e.g.
+processor.MunkiImporter). The module in sys.modules is a
+_LazyProcessorModule whose __getattr__ builds the classes on that first
+use.
 
-import sys
+Off OS X, where AutoPkg usually isn't installed, classes are built
+from KNOWN_PROCESSORS instead: the AutoPkg processors Recipe Robot
+uses, with their input variables.
+"""
 
-from .roboabc import RoboDict
-from .tools import robo_print, LogLevel
 
-sys.path.append("/Library/AutoPkg")
-try:
-    import autopkglib
-except ImportError:
-    robo_print("AutoPkg must be installed!")
-    sys.exit(1)
+import sys
+import types
+
+from .exceptions import RoboError
+
+
+# The AutoPkg processors Recipe Robot uses, and their input variables,
+# for when autopkglib isn't available.
+KNOWN_PROCESSORS = {
+    "AppDmgVersioner": ("dmg_path", ),
+    "CodeSignatureVerifier": (
+        "DISABLE_CODE_SIGNATURE_VERIFICATION", "input_path",
+        "expected_authority_names", "requirement", "deep_verification",
+        "strict_verification"),
+    "EndOfCheckPhase": (),
+    "GitHubReleasesInfoProvider": (
+        "asset_regex", "github_repo", "include_prereleases",
+        "sort_by_highest_tag_names"),
+    "MunkiImporter": (
+        "MUNKI_REPO", "pkg_path", "munkiimport_pkgname",
+        "munkiimport_appname", "repo_subdirectory", "pkginfo",
+        "force_munkiimport", "additional_makepkginfo_options",
+        "version_comparison_key", "MUNKI_PKGINFO_FILE_EXTENSION"),
+    "SparkleUpdateInfoProvider": (
+        "appcast_url", "appcast_request_headers", "appcast_query_pairs",
+        "alternate_xmlns_url", "pkginfo_keys_to_copy_from_sparkle_feed",
+        "urlencode_path_component"),
+    "URLDownloader": (
+        "url", "request_headers", "curl_opts", "download_dir", "filename",
+        "PKG", "CHECK_FILESIZE_ONLY", "CURL_PATH"),
+    "Unarchiver": (
+        "archive_path", "destination_path", "purge_destination",
+        "archive_format"),
+    "Versioner": ("input_plist_path", "plist_version_key"),
+}
 
 
 class AbstractProcessor(object):
@@ -89,14 +123,59 @@ def ProcessorFactory(name, attributes, base_class=AbstractProcessor):
     return newclass
 
 
-# Processors without input_variables are meant to be used as base
-# classes.
-processor_classes = [
-    ProcessorFactory(proc_type,
-                     autopkglib.get_processor(proc_type).input_variables)
-    for proc_type in autopkglib.processor_names() if
-    hasattr(autopkglib.get_processor(proc_type), "input_variables")]
+def load_processor_classes():
+    """Import autopkglib, and build a class for each AutoPkg processor.
 
-# Add classes to this module for each AutoPkg processor.
-for processor in processor_classes:
-    globals()[processor.__name__] = processor
+    If autopkglib isn't installed and this isn't OS X, the classes are
+    built from KNOWN_PROCESSORS.
+
+    Returns:
+        List of AbstractProcessor subclasses.
+
+    Raises:
+        RoboError: AutoPkg isn't installed on OS X.
+    """
+    sys.path.append("/Library/AutoPkg")
+    try:
+        import autopkglib
+    except ImportError:
+        if sys.platform != "darwin":
+            return [ProcessorFactory(proc_type, input_variables) for
+                    proc_type, input_variables in
+                    sorted(KNOWN_PROCESSORS.items())]
+        raise RoboError("AutoPkg must be installed!")
+
+    # Processors without input_variables are meant to be used as base
+    # classes.
+    return [
+        ProcessorFactory(proc_type,
+                         autopkglib.get_processor(proc_type).input_variables)
+        for proc_type in autopkglib.processor_names() if
+        hasattr(autopkglib.get_processor(proc_type), "input_variables")]
+
+
+class _LazyProcessorModule(types.ModuleType):
+    """This module, with the processor classes built on first use."""
+
+    def __init__(self, module):
+        super(_LazyProcessorModule, self).__init__(module.__name__,
+                                                   module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # The functions above use the original module's globals, which
+        # Python 2 clears if that module is garbage collected.
+        self._module = module
+        self._loaded = False
+
+    def __getattr__(self, name):
+        if name.startswith("__") or self._loaded:
+            raise AttributeError(
+                "'module' object has no attribute '%s'" % name)
+        self.processor_classes = load_processor_classes()
+        # Add classes to this module for each AutoPkg processor.
+        for processor in self.processor_classes:
+            setattr(self, processor.__name__, processor)
+        self._loaded = True
+        return getattr(self, name)
+
+
+sys.modules[__name__] = _LazyProcessorModule(sys.modules[__name__])
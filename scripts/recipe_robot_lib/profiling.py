@@ -0,0 +1,180 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+profiling.py
+
+CPU and memory profiling of a whole run (--profile FILE and
+--memprofile).
+
+run_profiled() runs a function under cProfile and saves the stats for
+pstats or a viewer such as SnakeViz, and summarize_profile() lists the
+most expensive functions.
+
+The memory profiler measures memory at checkpoints placed at phase
+boundaries (after the download, after unpacking, after inspection and
+after generation). When tracemalloc is available (Python 3, or Python 2
+built with pytracemalloc) each checkpoint takes a snapshot, and the
+report shows the traced and peak memory and the source lines that
+allocated the most since the previous checkpoint. Otherwise only the
+process's peak resident set size is recorded. memory_checkpoint() does
+nothing unless memory profiling was started.
+"""
+
+
+import cProfile
+import pstats
+import resource
+from StringIO import StringIO
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+# Number of functions in the --profile summary.
+PROFILE_TOP = 25
+# Number of allocation sites shown per checkpoint.
+MEMORY_TOP = 10
+# Stack frames kept per allocation by tracemalloc.
+TRACEMALLOC_FRAMES = 1
+
+
+def peak_rss():
+    """Return the peak resident set size of this process, in bytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X, but in kilobytes on Linux.
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def run_profiled(func, stats_path):
+    """Call func under cProfile, and save the stats to stats_path.
+
+    The stats are saved even if func raises (including SystemExit).
+
+    Args:
+        func: Function to call with no arguments.
+        stats_path: File to save the pstats data to.
+
+    Returns:
+        func's return value.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats(stats_path)
+
+
+def summarize_profile(stats_path, top=PROFILE_TOP):
+    """Return the top functions by cumulative time in a pstats file."""
+    stream = StringIO()
+    stats = pstats.Stats(stats_path, stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+    return stream.getvalue()
+
+
+class MemoryProfiler(object):
+    """Records memory use at named checkpoints."""
+
+    def __init__(self, top=MEMORY_TOP):
+        self.top = top
+        # List of (name, traced bytes, traced peak bytes, peak RSS,
+        # snapshot) tuples. The tracemalloc values are None without it.
+        self.checkpoints = []
+
+    @property
+    def tracing(self):
+        """True if allocations are traced, not just peak RSS."""
+        return tracemalloc is not None and tracemalloc.is_tracing()
+
+    def start(self):
+        """Start tracing allocations, if tracemalloc is available."""
+        if tracemalloc is not None:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.checkpoint("start")
+
+    def checkpoint(self, name):
+        """Record memory use now."""
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),))
+        else:
+            current = peak = snapshot = None
+        self.checkpoints.append((name, current, peak, peak_rss(), snapshot))
+
+    def stop(self):
+        """Stop tracing allocations."""
+        if self.tracing:
+            tracemalloc.stop()
+
+    def format_report(self):
+        """Return the checkpoints as lines of text."""
+        lines = ["%-12s %12s %12s %12s" % ("Checkpoint", "Traced",
+                                          "Traced peak", "Peak RSS")]
+        previous = None
+        sites = []
+        for name, current, peak, rss, snapshot in self.checkpoints:
+            lines.append("%-12s %12s %12s %12s" % (
+                name, _format_bytes(current), _format_bytes(peak),
+                _format_bytes(rss)))
+            if snapshot is not None and previous is not None:
+                sites.append((name, snapshot.compare_to(previous, "lineno")))
+            previous = snapshot
+        if not any(checkpoint[4] for checkpoint in self.checkpoints):
+            lines.append("(tracemalloc isn't available, so allocation sites "
+                         "aren't shown.)")
+        for name, stats in sites:
+            lines.append("Top allocation sites since the previous "
+                         "checkpoint, at %s:" % name)
+            for stat in stats[:self.top]:
+                lines.append("    %s" % stat)
+        return lines
+
+
+def _format_bytes(size):
+    """Format a byte count in MB, or "-" if it's unknown."""
+    if size is None:
+        return "-"
+    return "%.1fMB" % (size / 1048576.0)
+
+
+_memory_profiler = None
+
+
+def start_memory_profiling(top=MEMORY_TOP):
+    """Start recording memory use at checkpoints."""
+    global _memory_profiler  # pylint: disable=global-statement
+    _memory_profiler = MemoryProfiler(top)
+    _memory_profiler.start()
+    return _memory_profiler
+
+
+def get_memory_profiler():
+    """Return the running MemoryProfiler, or None."""
+    return _memory_profiler
+
+
+def memory_checkpoint(name):
+    """Record memory use now, if memory profiling was started."""
+    if _memory_profiler is not None:
+        _memory_profiler.checkpoint(name)
@@ -26,13 +26,10 @@ Recipes: Container class for Recipe objects.
 
 
 from recipe_robot_lib import processor
+from recipe_robot_lib.events import emit_event
 from recipe_robot_lib.roboabc import RoboDict, RoboList
-from recipe_robot_lib.tools import (robo_print, LogLevel, __version__)
-try:
-    from recipe_robot_lib import FoundationPlist
-except ImportError:
-    robo_print("Importing plistlib as FoundationPlist", LogLevel.WARNING)
-    import plistlib as FoundationPlist
+from recipe_robot_lib.roboplist import write_plist
+from recipe_robot_lib.tools import __version__
 
 
 # TODO(Elliot): Create a way to specify the display order of this list. (#67)
@@ -75,7 +72,8 @@ class Recipe(RoboDict):
 
     def write(self, path):
         """Write the recipe to disk."""
-        FoundationPlist.writePlist(self["keys"], path)
+        write_plist(self["keys"], path)
+        emit_event("recipe_written", type=self["type"], path=path)
 
     def set_description(self, description):
         """Save a description that explains what this recipe does."""
@@ -30,18 +30,57 @@ create autopkg recipes for the specified app.
 # "sanitized_developer" or "output_app_name"?
 # TODO: refactor code issuing warnings about missing processors/repos.
 
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
 import os
+import Queue
+import traceback
 
 from .exceptions import RoboError
+from . import metrics
 import processor
-from .tools import (create_dest_dirs, create_existing_recipe_list,
-                    create_SourceForgeURLProvider, extract_app_icon,
-                    robo_print, robo_join, get_user_defaults, save_user_defaults,
-                    LogLevel, __version__, get_exitcode_stdout_stderr, timed,
+from .recipe_index import create_existing_recipe_list
+from .repo_registry import has_repo
+from .robolog import get_logger
+from .tracing import span
+from .tools import (create_dest_dirs, create_SourceForgeURLProvider,
+                    extract_app_icon,
+                    robo_print, robo_join, get_user_defaults,
+                    LogLevel, OutputMode, __version__, timed,
                     SUPPORTED_IMAGE_FORMATS, SUPPORTED_ARCHIVE_FORMATS,
                     SUPPORTED_INSTALL_FORMATS, ALL_SUPPORTED_FORMATS)
 
 
+# Maximum number of recipe types generated at the same time.
+GENERATION_THREADS = 4
+
+# The outcome of one recipe type's generation function.
+GenerationResult = namedtuple("GenerationResult", "recipe output error")
+
+
+def needs_facts(*keys):
+    """Declare the facts a recipe generation function uses.
+
+    Facts that are registered with Facts.provide() are only looked up if
+    a preferred recipe type's generation function needs them.
+    """
+    def decorator(func):
+        func.needed_facts = keys
+        return func
+    return decorator
+
+
+def parent_type(recipe_type):
+    """Declare the recipe type a generation function's recipes build on.
+
+    If the parent type is also being generated, the child is only
+    generated once the parent is done, and is skipped if the parent
+    failed. Types without a parent in common are generated concurrently.
+    """
+    def decorator(func):
+        func.parent_type = recipe_type
+        return func
+    return decorator
 
 
 @timed
@@ -65,6 +104,14 @@ def generate_recipes(facts, prefs):
 
     raise_if_recipes_cannot_be_generated(facts, preferred)
 
+    # Look up the facts the preferred recipe types need. The developer
+    # is always needed, to name the destination directory.
+    needed_facts = set(["developer"])
+    for recipe in preferred:
+        generation_func = get_generation_func(facts, prefs, recipe)
+        needed_facts.update(getattr(generation_func, "needed_facts", ()))
+    facts.resolve(*needed_facts)
+
     # We have enough information to create a recipe set, but with assumptions.
     # TODO(Elliot): This code may not be necessary if inspections do their job.
     if "codesign_reqs" not in facts and "codesign_authorities" not in facts:
@@ -82,11 +129,6 @@ def generate_recipes(facts, prefs):
             "want to verify that and modify the recipes if necessary.")
         facts["version_key"] = "CFBundleShortVersionString"
 
-    # TODO(Elliot): Run `autopkg repo-list` once and store the resulting value
-    # for future use when detecting missing required repos, rather than running
-    # `autopkg repo-list` separately during each check. (For example, the
-    # FileWaveImporter repo must be present to run created filewave recipes.)
-
     # Prepare the destination directory.
     # TODO (Shea): This JSS Recipe format code is repeated all over.
     # Smells like a refactor.
@@ -102,11 +144,6 @@ def generate_recipes(facts, prefs):
 
     build_recipes(facts, preferred, prefs)
 
-    # TODO (Shea): As far as I can tell, the only pref that changes is the
-    # recipe created count. Move out from here!
-    # Save preferences to disk for next time.
-    save_user_defaults(prefs)
-
 
 def raise_if_recipes_cannot_be_generated(facts, preferred):
     """Raise a RoboError if recipes cannot be generated."""
@@ -133,8 +170,22 @@ def raise_if_recipes_cannot_be_generated(facts, preferred):
 
 
 def build_recipes(facts, preferred, prefs):
-    """Create a recipe for each preferred type we know about."""
+    """Create a recipe for each preferred type we know about.
+
+    Recipes are generated concurrently (see run_generation_jobs), but
+    their output is shown and the recipes are written in the order of
+    the preferred list.
+    """
     recipe_dest_dir = facts["recipe_dest_dir"]
+
+    # If the name of the app bundle differs from the name of the app
+    # itself, we need another input variable for that.
+    if "app_file" in facts:
+        facts["app_name_key"] = "%APP_FILENAME%"
+    else:
+        facts["app_name_key"] = "%NAME%"
+
+    jobs = []
     for recipe in preferred:
 
         keys = recipe["keys"]
@@ -149,31 +200,143 @@ def build_recipes(facts, preferred, prefs):
                                            recipe["type"],
                                            facts["app_name"].replace(" ", ""))
 
-        # If the name of the app bundle differs from the name of the app
-        # itself, we need another input variable for that.
         if "app_file" in facts:
             keys["Input"]["APP_FILENAME"] = facts["app_file"]
-            facts["app_name_key"] = "%APP_FILENAME%"
-        else:
-            facts["app_name_key"] = "%NAME%"
 
-        # Set keys specific to download recipes.
         generation_func = get_generation_func(facts, prefs, recipe)
         if not generation_func:
             facts["warnings"].append(
                 "Oops, I think my programmer messed up. I don't yet know how "
                 "to generate a %s recipe. Sorry about that." %
                 recipe["type"])
-        else:
-            recipe = generation_func(facts, prefs, recipe)
+        jobs.append((recipe, generation_func))
+
+    # Load the processor classes here, not on first use in a generation
+    # thread, so that a missing AutoPkg is reported and importing
+    # autopkglib doesn't race between threads.
+    processor.processor_classes  # pylint: disable=pointless-statement
+
+    with metrics.count_messages("generate", facts):
+        results = run_generation_jobs(facts, prefs, jobs)
+
+        for recipe, _ in jobs:
+            result = results[recipe["type"]]
+            if result.output is not None:
+                result.output.replay()
+            if result.error:
+                facts["warnings"].append(result.error)
+                continue
+            recipe = result.recipe
+            if recipe:
+                dest_path = robo_join(recipe_dest_dir, recipe["filename"])
+                if not os.path.exists(dest_path):
+                    prefs["RecipeCreateCount"] += 1
+                recipe.write(dest_path)
+                metrics.RECIPES_WRITTEN.inc(recipe_type=recipe["type"])
+                robo_print(dest_path, LogLevel.LOG, 4)
+                facts["recipes"].append(dest_path)
+
+
+def run_generation_jobs(facts, prefs, jobs):
+    """Run recipe generation functions on a thread pool.
+
+    Each job starts as soon as the job for its parent type (see
+    parent_type) has finished, or right away if its parent type isn't
+    being generated. A job that raises an exception doesn't stop the
+    others, but the jobs for its child types are skipped.
 
-        if recipe:
-            dest_path = robo_join(recipe_dest_dir, recipe["filename"])
-            if not os.path.exists(dest_path):
-                prefs["RecipeCreateCount"] += 1
-            recipe.write(dest_path)
-            robo_print(dest_path, LogLevel.LOG, 4)
-            facts["recipes"].append(dest_path)
+    Args:
+        facts: A continually-updated dictionary containing all the
+            information we know so far about the app associated with the
+            input path.
+        prefs: The dictionary containing a key/value pair for each
+            preference.
+        jobs: List of (recipe, generation function) tuples. The function
+            may be None, in which case the recipe is used as-is.
+
+    Returns:
+        Dictionary of recipe type -> GenerationResult. The output of
+        each job is captured in a JobSink rather than printed, and error
+        is a warning message if the job failed or was skipped.
+    """
+    if not jobs:
+        return {}
+    funcs = {}
+    recipes = {}
+    children = {}
+    ready = []
+    for recipe, generation_func in jobs:
+        recipes[recipe["type"]] = recipe
+        funcs[recipe["type"]] = generation_func
+    for recipe, generation_func in jobs:
+        parent = getattr(generation_func, "parent_type", None)
+        if parent in recipes and parent != recipe["type"]:
+            children.setdefault(parent, []).append(recipe["type"])
+        else:
+            ready.append(recipe["type"])
+
+    results = {}
+    finished = Queue.Queue()
+
+    def skip_children(recipe_type):
+        """Record that the children of a failed type were skipped."""
+        for child in children.get(recipe_type, ()):
+            results[child] = GenerationResult(
+                None, None,
+                "Skipping the %s recipe, because the %s recipe it depends "
+                "on could not be generated." % (child, recipe_type))
+            skip_children(child)
+
+    pool = ThreadPool(min(GENERATION_THREADS, len(jobs)))
+    try:
+        def submit(recipe_type):
+            pool.apply_async(
+                _run_generation_job,
+                (facts, prefs, recipes[recipe_type], funcs[recipe_type]),
+                callback=lambda result: finished.put((recipe_type, result)))
+
+        for recipe_type in ready:
+            submit(recipe_type)
+        running = len(ready)
+        while running:
+            try:
+                # Wait with a timeout so KeyboardInterrupt gets through.
+                recipe_type, result = finished.get(True, 1)
+            except Queue.Empty:
+                continue
+            running -= 1
+            results[recipe_type] = result
+            if result.error:
+                skip_children(recipe_type)
+                continue
+            for child in children.get(recipe_type, ()):
+                submit(child)
+                running += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
+
+
+def _run_generation_job(facts, prefs, recipe, generation_func):
+    """Run one generation function, capturing its output and errors."""
+    with get_logger().capture() as output:
+        if generation_func is None:
+            return GenerationResult(recipe, output, None)
+        try:
+            with span(generation_func.__name__, "generate",
+                      type=recipe["type"]), \
+                    metrics.GENERATION_SECONDS.time(
+                        recipe_type=recipe["type"]):
+                return GenerationResult(
+                    generation_func(facts, prefs, recipe), output, None)
+        except Exception as error:  # pylint: disable=broad-except
+            message = ("An error occurred while generating the %s recipe: "
+                       "%s" % (recipe["type"], error))
+            if OutputMode.debug_mode:
+                message += "\n" + traceback.format_exc()
+            return GenerationResult(None, output, message)
 
 
 def get_generation_func(facts, prefs, recipe):
@@ -192,6 +355,7 @@ def get_generation_func(facts, prefs, recipe):
     return generation_func
 
 
+@needs_facts("codesign_reqs", "codesign_authorities")
 def generate_download_recipe(facts, prefs, recipe):
     """Generate a download recipe on passed recipe dict.
 
@@ -234,15 +398,9 @@ def generate_download_recipe(facts, prefs, recipe):
 
     # TODO (Shea): Extract method(s) to get_source_processor()
     elif "sourceforge_id" in facts:
-        if "developer" in facts and not prefs.get(
-                "FollowOfficialJSSRecipesFormat"):
-            create_SourceForgeURLProvider(
-                robo_join(prefs["RecipeCreateLocation"],
-                          facts["developer"]).replace("/", "-"))
-        else:
-            create_SourceForgeURLProvider(robo_join(
-                prefs["RecipeCreateLocation"],
-                facts["app_name"]).replace("/", "-"))
+        create_SourceForgeURLProvider(
+            facts["recipe_dest_dir"],
+            refresh=facts["args"].refresh_shared_processors)
         SourceForgeURLProvider = processor.ProcessorFactory(
             "SourceForgeURLProvider", ("SOURCEFORGE_FILE_PATTERN",
                                        "SOURCEFORGE_PROJECT_ID"))
@@ -328,6 +486,20 @@ def warn_about_app_store_generation(facts, recipe_type):
         "App Store." % recipe_type)
 
 
+def remind_if_repo_missing(facts, repo_url, repo_name):
+    """Remind the user to add a repo the recipe depends on.
+
+    Args:
+        facts: Shared facts object.
+        repo_url: URL of the required recipe repo.
+        repo_name: Short name of the repo, for the reminder text.
+    """
+    if not has_repo(repo_url):
+        facts["reminders"].append(
+            "You'll need to add the %s repo in order to use this recipe:\n"
+            "        autopkg repo-add \"%s\"" % (repo_name, repo_url))
+
+
 def is_dynamic_url_source(facts):
     return any(url_type in facts for url_type in (
         "sparkle_feed", "github_repo", "sourceforge_id"))
@@ -361,6 +533,7 @@ def needs_versioner(facts):
     return format_needs_versioner and not sparkle_version
 
 
+@needs_facts("description", "developer")
 def generate_app_store_munki_recipe(facts, prefs, recipe):
     """Generate a munki recipe on passed recipe dict.
 
@@ -405,6 +578,9 @@ def generate_app_store_munki_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("download")
+@needs_facts("description", "icon_path", "developer",
+             "codesign_reqs", "codesign_authorities")
 def generate_munki_recipe(facts, prefs, recipe):
     """Generate a munki recipe on passed recipe dict.
 
@@ -572,6 +748,8 @@ def generate_app_store_pkg_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("download")
+@needs_facts("codesign_reqs", "codesign_authorities")
 def generate_pkg_recipe(facts, prefs, recipe):
     """Generate a munki recipe on passed recipe dict.
 
@@ -705,6 +883,8 @@ def generate_pkg_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("download")
+@needs_facts("codesign_reqs", "codesign_authorities")
 def generate_install_recipe(facts, prefs, recipe):
     """Generate an install recipe on passed recipe dict.
 
@@ -782,6 +962,8 @@ def generate_install_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("pkg")
+@needs_facts("description", "icon_path", "developer")
 def generate_jss_recipe(facts, prefs, recipe):
     """Generate a JSS recipe on passed recipe dict.
 
@@ -887,6 +1069,7 @@ def generate_jss_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("pkg")
 def generate_lanrev_recipe(facts, prefs, recipe):
     """Generate an LANrev recipe on passed recipe dict.
 
@@ -923,14 +1106,7 @@ def generate_lanrev_recipe(facts, prefs, recipe):
 
     # Print a reminder if the required repo isn't present on disk.
     lanrevimporter_url = "https://github.com/jbaker10/LANrevImporter"
-    cmd = "/usr/local/bin/autopkg repo-list"
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if not any(line.endswith("(%s)" % lanrevimporter_url) for line in
-               out.splitlines()):
-        facts["reminders"].append(
-            "You'll need to add the LANrevImporter repo in order to use "
-            "this recipe:\n        autopkg repo-add "
-            "\"%s\"" % lanrevimporter_url)
+    remind_if_repo_missing(facts, lanrevimporter_url, "LANrevImporter")
 
     recipe.append_processor({
         "Processor":
@@ -949,6 +1125,7 @@ def generate_lanrev_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("pkg")
 def generate_sccm_recipe(facts, prefs, recipe):
     """Generate an SCCM recipe on passed recipe dict.
 
@@ -983,14 +1160,7 @@ def generate_sccm_recipe(facts, prefs, recipe):
 
     # Print a reminder if the required repo isn't present on disk.
     cgerke_url = "https://github.com/autopkg/cgerke-recipes"
-    cmd = "/usr/local/bin/autopkg repo-list"
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if not any(line.endswith("(%s)" % cgerke_url) for line in
-               out.splitlines()):
-        facts["reminders"].append(
-            "You'll need to add the cgerke-recipes repo in order to use this "
-            "recipe:\n        autopkg repo-add "
-            "\"%s\"" % cgerke_url)
+    remind_if_repo_missing(facts, cgerke_url, "cgerke-recipes")
 
     recipe.append_processor({
         "Processor":
@@ -1005,6 +1175,8 @@ def generate_sccm_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("download")
+@needs_facts("codesign_reqs", "codesign_authorities")
 def generate_filewave_recipe(facts, prefs, recipe):
     """Generate a FileWave recipe on passed recipe dict.
 
@@ -1073,14 +1245,7 @@ def generate_filewave_recipe(facts, prefs, recipe):
 
     # Print a reminder if the required repo isn't present on disk.
     filewave_repo = "https://github.com/autopkg/filewave"
-    cmd = "/usr/local/bin/autopkg repo-list"
-    exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-    if not any(line.endswith("(%s)" % filewave_repo) for line in
-               out.splitlines()):
-        facts["reminders"].append(
-            "You'll need to add the FileWave repo in order to use "
-            "this recipe:\n        autopkg repo-add "
-            "\"%s\"" % filewave_repo)
+    remind_if_repo_missing(facts, filewave_repo, "FileWave")
 
     recipe.append_processor({
         "Processor": "com.github.johncclayton.filewave.FWTool/FileWaveImporter",
@@ -1097,6 +1262,7 @@ def generate_filewave_recipe(facts, prefs, recipe):
     return recipe
 
 
+@parent_type("pkg")
 def generate_ds_recipe(facts, prefs, recipe):
     """Generate a DeployStudio recipe on passed recipe dict.
 
@@ -1152,6 +1318,8 @@ def generate_ds_recipe(facts, prefs, recipe):
 
 
 # TODO: Not completed, does not function yet
+@parent_type("download")
+@needs_facts("developer")
 def generate_bigfix_recipe(facts, prefs, recipe):
     """Generate a BigFix recipe on passed recipe dict.
 
@@ -0,0 +1,372 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+recipe_index.py
+
+RecipeIndex: Local, incrementally updated index of existing AutoPkg
+    recipes, used to detect duplicates without searching GitHub.
+
+The index is built from the recipe repos on disk (and optionally from a
+saved "autopkg search" dump), keyed by normalized app name and by bundle
+identifier, and cached between runs. Only files whose mtime changed
+since the last run are parsed again.
+"""
+
+
+import json
+import os
+import re
+
+from .exceptions import RoboError
+from . import metrics
+from .repo_registry import get_repo_registry
+from .tools import (robo_print, LogLevel, create_dest_dirs,
+                    get_exitcode_stdout_stderr, get_autopkg_pref, CACHE_ROOT)
+from .roboplist import read_plist
+
+
+INDEX_PATH = os.path.join(CACHE_ROOT, "recipe_index.json")
+INDEX_FORMAT = 1
+DEFAULT_RECIPE_REPO_DIR = "~/Library/AutoPkg/RecipeRepos"
+
+_NON_WORD_RE = re.compile(r"[^\w]", re.UNICODE)
+
+
+def normalize_name(name):
+    """Reduce an app or recipe name to its lookup form.
+
+    Spaces and symbols are stripped and the result is lowercased, so
+    "Google Chrome", "GoogleChrome" and "google-chrome" are all the same
+    key.
+    """
+    return _NON_WORD_RE.sub("", name).lower()
+
+
+class RecipeIndex(object):
+    """Index of existing recipes, by normalized name and bundle id."""
+
+    def __init__(self, index_path=INDEX_PATH):
+        """Set up an empty index backed by index_path.
+
+        Args:
+            index_path: JSON file in which the index is cached between
+                runs. None keeps the index in memory only.
+        """
+        self.index_path = index_path
+        # Source file path -> {"mtime": float, "recipes": [entry, ...]}
+        self._sources = {}
+        self._by_name = {}
+        self._by_bundle_id = {}
+        self._dirty = False
+
+    def __len__(self):
+        return sum(len(source["recipes"]) for source in
+                   self._sources.itervalues())
+
+    def load(self):
+        """Load the cached index from disk, if there is one."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as index_file:
+                cached = json.load(index_file)
+        except (IOError, ValueError):
+            robo_print("Ignoring unreadable recipe index at %s",
+                       LogLevel.DEBUG, 0, self.index_path)
+            return
+        if cached.get("format") == INDEX_FORMAT:
+            self._sources = cached.get("sources", {})
+            self._rebuild_lookups()
+
+    def save(self):
+        """Write the index back to disk if anything changed."""
+        if not self.index_path or not self._dirty:
+            return
+        create_dest_dirs(os.path.dirname(self.index_path))
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            json.dump({"format": INDEX_FORMAT, "sources": self._sources},
+                      index_file)
+        os.rename(tmp_path, self.index_path)
+        self._dirty = False
+
+    def update(self, repo_dirs=(), search_dump=None):
+        """Bring the index up to date with the given sources.
+
+        Recipes are only parsed again when their mtime has changed.
+        Sources that no longer exist are dropped.
+
+        Args:
+            repo_dirs: Directories to scan for .recipe files.
+            search_dump: Optional path to saved "autopkg search" output.
+        """
+        seen = set()
+        for repo_dir in repo_dirs:
+            repo_dir = os.path.expanduser(repo_dir)
+            if isinstance(repo_dir, str):
+                # Walk with unicode so paths match the cached JSON keys.
+                repo_dir = repo_dir.decode("utf-8")
+            for dirpath, dirnames, filenames in os.walk(repo_dir):
+                dirnames[:] = [name for name in dirnames
+                               if not name.startswith(".")]
+                for filename in filenames:
+                    if filename.endswith(".recipe"):
+                        path = os.path.join(dirpath, filename)
+                        seen.add(path)
+                        self._update_source(path, _read_recipe)
+        if search_dump:
+            search_dump = os.path.expanduser(search_dump)
+            if isinstance(search_dump, str):
+                search_dump = search_dump.decode("utf-8")
+            if os.path.exists(search_dump):
+                seen.add(search_dump)
+                self._update_source(search_dump, _read_search_dump)
+            else:
+                robo_print("Search dump not found: %s" % search_dump,
+                           LogLevel.WARNING)
+
+        for path in set(self._sources) - seen:
+            del self._sources[path]
+            self._dirty = True
+
+        if self._dirty:
+            self._rebuild_lookups()
+
+    def find(self, app_name=None, bundle_id=None):
+        """Look up existing recipes for an app.
+
+        Args:
+            app_name: The app's name, in any spacing or capitalization.
+            bundle_id: The app's bundle identifier.
+
+        Returns:
+            A list of matching recipe entries (dicts with "filename" and
+            "type" keys), without duplicates.
+        """
+        matches = []
+        if app_name:
+            matches.extend(self._by_name.get(normalize_name(app_name), ()))
+        if bundle_id:
+            matches.extend(self._by_bundle_id.get(bundle_id.lower(), ()))
+        unique = {}
+        for entry in matches:
+            unique.setdefault(entry["filename"], entry)
+        return unique.values()
+
+    def _update_source(self, path, reader):
+        """Parse path with reader if it's new or its mtime changed."""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        cached = self._sources.get(path)
+        if cached is not None and cached["mtime"] == mtime:
+            metrics.CACHE_LOOKUPS.inc(cache="recipe_index", result="hit")
+            return
+        metrics.CACHE_LOOKUPS.inc(cache="recipe_index", result="miss")
+        self._sources[path] = {"mtime": mtime, "recipes": reader(path)}
+        self._dirty = True
+
+    def _rebuild_lookups(self):
+        """Rebuild the name and bundle id lookup tables."""
+        self._by_name = {}
+        self._by_bundle_id = {}
+        for source in self._sources.itervalues():
+            for entry in source["recipes"]:
+                for name in entry.get("names", ()):
+                    self._by_name.setdefault(
+                        normalize_name(name), []).append(entry)
+                if entry.get("bundle_id"):
+                    self._by_bundle_id.setdefault(
+                        entry["bundle_id"].lower(), []).append(entry)
+
+
+def _split_recipe_filename(filename):
+    """Split "Name.type.recipe" into ("Name", "type")."""
+    parts = filename.rsplit(".", 2)
+    if len(parts) == 3 and parts[2] == "recipe":
+        return parts[0], parts[1]
+    return None, None
+
+
+def _read_recipe(path):
+    """Build index entries for a single recipe file."""
+    filename = os.path.basename(path)
+    name, recipe_type = _split_recipe_filename(filename)
+    if name is None:
+        return []
+    entry = {"filename": filename, "type": recipe_type, "names": [name]}
+    try:
+        recipe = read_plist(path)
+        recipe_input = recipe.get("Input", {})
+    except Exception:  # pylint: disable=broad-except
+        # Unreadable recipes are still indexed by file name.
+        recipe_input = {}
+    if recipe_input.get("NAME") and recipe_input["NAME"] != name:
+        entry["names"].append(recipe_input["NAME"])
+    if recipe_input.get("BUNDLE_ID"):
+        entry["bundle_id"] = recipe_input["BUNDLE_ID"]
+    return [entry]
+
+
+def _read_search_dump(path):
+    """Build index entries from saved "autopkg search" output."""
+    entries = []
+    with open(path) as dump_file:
+        for line in dump_file:
+            for token in line.split():
+                name, recipe_type = _split_recipe_filename(
+                    os.path.basename(token))
+                if name is not None:
+                    entries.append({"filename": os.path.basename(token),
+                                    "type": recipe_type, "names": [name]})
+                    break
+    return entries
+
+
+def get_recipe_repo_dirs():
+    """Return the directories AutoPkg keeps recipe repos in.
+
+    These are the repos in AutoPkg's RECIPE_REPOS preference, or its
+    RECIPE_REPO_DIR if no repos are registered.
+    """
+    repo_paths = get_repo_registry().repo_paths
+    if repo_paths:
+        return repo_paths
+    return [get_autopkg_pref("RECIPE_REPO_DIR", DEFAULT_RECIPE_REPO_DIR)]
+
+
+def create_existing_recipe_list(facts):
+    """Mark recipe types that already exist for this app.
+
+    Existing recipes are found in the local recipe index. If the index is
+    empty (no recipe repos on disk and no search dump), "autopkg search"
+    is used instead.
+
+    Args:
+        facts: The Facts instance containing all of our information.
+            Required keys:
+                app_name: The app's name.
+                recipes: The recipes to build.
+                args: ArgParser args with github_token bool and
+                    search_dump path.
+            Optional keys:
+                bundle_id: The app's bundle identifier.
+    """
+    app_name = facts["app_name"]
+    recipes = facts["recipes"]
+
+    robo_print("Checking local recipe index for existing AutoPkg recipes "
+               "for \"%s\"...",
+               LogLevel.VERBOSE, 0, app_name)
+    index = RecipeIndex()
+    index.load()
+    index.update(get_recipe_repo_dirs(), facts["args"].search_dump)
+    index.save()
+
+    if len(index) > 0:
+        existing = index.find(app_name, facts.get("bundle_id"))
+    else:
+        robo_print("No local recipes to check, so asking autopkg "
+                   "search instead.", LogLevel.VERBOSE, 4)
+        existing = search_existing_recipes(facts)
+
+    existing_types = set(entry["type"] for entry in existing)
+    for entry in sorted(existing, key=lambda entry: entry["filename"]):
+        if entry["type"] in [recipe["type"] for recipe in recipes]:
+            robo_print("Found existing %s", LogLevel.LOG, 4,
+                       entry["filename"])
+    is_existing = False
+    for recipe in recipes:
+        if recipe["type"] in existing_types:
+            # Set to False by default. If found, set True.
+            recipe["existing"] = True
+            is_existing = True
+
+    if is_existing is True:
+        raise RoboError(
+            "Sorry, AutoPkg recipes already exist for this app, and "
+            "I can't blend new recipes with existing recipes.\n\nHere "
+            "are my suggestions:\n\t- See if one of the above recipes "
+            "meets your needs, either as-is or using an override."
+            "\n\t- Or write your own recipe using one of the above as "
+            "the ParentRecipe.")
+    robo_print("No results", LogLevel.VERBOSE, 4)
+
+
+def search_existing_recipes(facts):
+    """Use autopkg search results to find existing recipes.
+
+    Args:
+        facts: The Facts instance. See create_existing_recipe_list.
+
+    Returns:
+        A list of recipe entries, like RecipeIndex.find returns.
+    """
+    app_name = facts["app_name"]
+    use_github_token = facts["args"].github_token
+    # TODO(Elliot): Suggest users create GitHub API token to prevent limiting. (#29)
+    recipe_searches = []
+    recipe_searches.append(app_name)
+
+    app_name_no_space = "".join(app_name.split())
+    if app_name_no_space != app_name:
+        recipe_searches.append(app_name_no_space)
+
+    app_name_no_symbol = re.sub(r'[^\w]', '', app_name)
+    if app_name_no_symbol not in (app_name, app_name_no_space):
+        recipe_searches.append(app_name_no_symbol)
+
+    # Every spelling normalizes to the same name, so one lookup against
+    # the first column of each output line replaces nested matching.
+    wanted_name = normalize_name(app_name)
+    existing = []
+    for this_search in recipe_searches:
+        robo_print("Searching for existing AutoPkg recipes for \"%s\"...",
+                   LogLevel.VERBOSE, 0, this_search)
+        if use_github_token:
+            if not os.path.exists(os.path.expanduser("~/.autopkg_gh_token")):
+                facts["warnings"].append(
+                    "I couldn't find a GitHub token to use.")
+                cmd = ["/usr/local/bin/autopkg", "search", "--path-only",
+                       this_search]
+            else:
+                # TODO(Elliot): Learn how to use the GitHub token. (#18) https://github.com/autopkg/autopkg/blob/680c75855f00b588e6dd50fb431bed5d5fd41d9c/Code/autopkglib/github/__init__.py#L31
+                facts["warnings"].append(
+                    "I found a GitHub token, but I'm still learning how to "
+                    "use it.")
+                cmd = ["/usr/local/bin/autopkg", "search", "--path-only",
+                       "--use-token", this_search]
+        else:
+            cmd = ["/usr/local/bin/autopkg", "search", "--path-only",
+                   this_search]
+        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
+        if exitcode != 0:
+            raise RoboError(err)
+        for line in out.splitlines():
+            fields = line.split()
+            if not fields:
+                continue
+            name, recipe_type = _split_recipe_filename(fields[0])
+            if name is not None and normalize_name(name) == wanted_name:
+                existing.append({"filename": fields[0], "type": recipe_type})
+        if existing:
+            break
+    return existing
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+repo_registry.py
+
+Knows which AutoPkg recipe repos are installed.
+
+Rather than running "autopkg repo-list" for every check, the RECIPE_REPOS
+preference is read straight from AutoPkg's preferences file (wherever
+the platform backend keeps it). The result is kept for the life of the
+process and only read again when the preferences file's mtime changes.
+"""
+
+
+import os
+import threading
+
+from .backend import AUTOPKG_DOMAIN, get_backend
+from .roboplist import read_plist
+from .tools import robo_print, LogLevel
+
+
+def normalize_repo_url(url):
+    """Reduce a repo URL to the form used for comparisons.
+
+    Case, trailing slashes and a trailing ".git" are ignored, so
+    "https://github.com/autopkg/recipes.git/" and
+    "https://github.com/autopkg/Recipes" are the same repo.
+    """
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-len(".git")]
+    return url.lower()
+
+
+class RepoRegistry(object):
+    """The set of recipe repos AutoPkg has installed."""
+
+    def __init__(self, prefs_path=None):
+        """Set up a registry backed by prefs_path.
+
+        Args:
+            prefs_path: AutoPkg's preferences plist. Defaults to the
+                one the platform backend reads AutoPkg preferences from.
+        """
+        self._prefs_path = prefs_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._mtime = None
+        # Local repo path -> repo URL.
+        self._repos = {}
+        self._urls = frozenset()
+
+    @property
+    def prefs_path(self):
+        """The AutoPkg preferences plist RECIPE_REPOS is read from."""
+        return self._prefs_path or get_backend().prefs_path(AUTOPKG_DOMAIN)
+
+    def _refresh(self):
+        """Read RECIPE_REPOS again if the preferences file has changed."""
+        try:
+            mtime = os.path.getmtime(self.prefs_path)
+        except OSError:
+            mtime = None
+        with self._lock:
+            if self._loaded and mtime == self._mtime:
+                return
+            repos = {}
+            if mtime is not None:
+                try:
+                    prefs = read_plist(self.prefs_path)
+                except Exception:  # pylint: disable=broad-except
+                    robo_print("Unable to read AutoPkg preferences at %s",
+                               LogLevel.DEBUG, 0, self.prefs_path)
+                    prefs = {}
+                for path, info in (prefs.get("RECIPE_REPOS") or {}).items():
+                    repos[path] = (info or {}).get("URL", "")
+            self._repos = repos
+            self._urls = frozenset(normalize_repo_url(url) for url in
+                                   repos.itervalues() if url)
+            self._mtime = mtime
+            self._loaded = True
+
+    @property
+    def repo_urls(self):
+        """Normalized URLs of all installed repos."""
+        self._refresh()
+        return self._urls
+
+    @property
+    def repo_paths(self):
+        """Local paths of all installed repos."""
+        self._refresh()
+        return sorted(self._repos)
+
+    def has_repo(self, url):
+        """Return True if the repo at url is installed."""
+        return normalize_repo_url(url) in self.repo_urls
+
+
+_registry = RepoRegistry()
+
+
+def get_repo_registry():
+    """Return the process-wide RepoRegistry."""
+    return _registry
+
+
+def has_repo(url):
+    """Return True if AutoPkg has the repo at url installed."""
+    return _registry.has_repo(url)
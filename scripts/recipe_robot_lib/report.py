@@ -0,0 +1,181 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+report.py
+
+Per-run performance reports (--report FILE), and summaries of many
+reports so that runs of different Recipe Robot versions can be compared.
+
+A report records what was inspected and how long each inspector took,
+network and external command totals, cache hits, peak memory use and
+the recipes that were written. Inspector timings come from tracing
+spans, so tracing is turned on whenever a report is requested.
+"""
+
+
+from datetime import datetime
+import json
+import os
+
+from .commands import get_command_ledger
+from .har import get_har_log
+from . import metrics
+from .profiling import peak_rss
+from .roboplist import read_plist
+from .tools import __version__
+from .tracing import get_tracer
+
+
+REPORT_FORMAT = 1
+
+
+def _span_totals(category):
+    """Return {name: {"calls": n, "seconds": s}} for a span category.
+
+    Nested spans of the same category are included in their parent's
+    time, so inspectors that call other inspectors (e.g.
+    inspect_download_url calling inspect_disk_image) include their time.
+    """
+    totals = {}
+    for event in list(get_tracer().events):
+        if event["cat"] != category:
+            continue
+        total = totals.setdefault(event["name"], {"calls": 0, "seconds": 0.0})
+        total["calls"] += 1
+        total["seconds"] += event["dur"] / 1e6
+    return totals
+
+
+def _written_recipes(facts):
+    """Return the path, type and size of each recipe written."""
+    recipes = []
+    for item in facts["recipes"]:
+        # build_recipes appends the path of each recipe it writes to the
+        # list of Recipe objects.
+        if isinstance(item, basestring) and os.path.exists(item):
+            recipes.append({"path": item,
+                            "type": os.path.basename(item).rsplit(".", 2)[1],
+                            "bytes": os.path.getsize(item)})
+    return recipes
+
+
+def build_report(facts):
+    """Return a performance report for this run.
+
+    Args:
+        facts: The Facts for this run.
+
+    Returns:
+        A dict of only strings, numbers, bools, lists and dicts, so it
+        can be written as either JSON or a plist.
+    """
+    har_log = get_har_log()
+    hosts = har_log.host_summary()
+    cache = {}
+    for labels, count in metrics.CACHE_LOOKUPS.items():
+        cache.setdefault(labels["cache"], {})[labels["result"]] = count
+
+    report = {
+        "format": REPORT_FORMAT,
+        "recipe_robot_version": __version__,
+        "date": datetime.utcnow().isoformat() + "Z",
+        "succeeded": not facts["errors"],
+        "errors": len(facts["errors"]),
+        "warnings": len(facts["warnings"]),
+        "phases": _span_totals("phase"),
+        "inspectors": _span_totals("inspect"),
+        "network": {
+            "requests": len(har_log.entries),
+            "bytes_received": sum(host["bytes"] for host in hosts),
+            "hosts": hosts},
+        "commands": get_command_ledger().summary(),
+        "cache": cache,
+        "peak_rss": peak_rss(),
+        "recipes": _written_recipes(facts)}
+    for key in ("input_path", "input_type", "execution_time"):
+        if key in facts:
+            report[key] = facts[key]
+    return report
+
+
+def read_report(path):
+    """Read a report written by tools.write_report (JSON or plist)."""
+    if path.endswith(".json"):
+        with open(path) as json_file:
+            return json.load(json_file)
+    return read_plist(path)
+
+
+def _stats(values):
+    """Return the count, median, mean and max of a list of numbers."""
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        median = values[middle]
+    else:
+        median = (values[middle - 1] + values[middle]) / 2.0
+    return {"count": len(values), "median": median,
+            "mean": sum(values) / float(len(values)), "max": values[-1]}
+
+
+def aggregate_reports(reports):
+    """Summarize reports by the Recipe Robot version that wrote them.
+
+    Args:
+        reports: List of report dicts (see build_report).
+
+    Returns:
+        Dict of version -> summary dict with "runs" and "failures"
+        counts, and "median", "mean", "max" and "count" of the
+        "execution_time", "peak_rss", "bytes_received" and
+        "command_seconds" of every run that recorded them. Its
+        "inspectors" dict has the same for each inspector's seconds.
+    """
+    by_version = {}
+    for report in reports:
+        by_version.setdefault(report["recipe_robot_version"],
+                              []).append(report)
+
+    summaries = {}
+    for version, version_reports in by_version.iteritems():
+        samples = {"execution_time": [], "peak_rss": [],
+                   "bytes_received": [], "command_seconds": []}
+        inspectors = {}
+        for report in version_reports:
+            if "execution_time" in report:
+                samples["execution_time"].append(report["execution_time"])
+            samples["peak_rss"].append(report["peak_rss"])
+            samples["bytes_received"].append(
+                report["network"]["bytes_received"])
+            samples["command_seconds"].append(
+                sum(command["wall"] for command in report["commands"]))
+            for name, total in report["inspectors"].iteritems():
+                inspectors.setdefault(name, []).append(total["seconds"])
+
+        summary = {"runs": len(version_reports),
+                   "failures": len([report for report in version_reports
+                                    if not report["succeeded"]]),
+                   "inspectors": dict((name, _stats(values)) for
+                                      name, values in inspectors.iteritems())}
+        for key, values in samples.iteritems():
+            if values:
+                summary[key] = _stats(values)
+        summaries[version] = summary
+    return summaries
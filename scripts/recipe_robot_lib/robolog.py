@@ -0,0 +1,252 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+robolog.py
+
+The logging backend behind robo_print.
+
+Whether a level is enabled is a single set lookup, done before any
+formatting, and messages are only %-formatted with their arguments once
+we know they'll be shown. Lines are written to buffered sinks: output to
+a terminal is flushed line by line, and output to a pipe or file is
+flushed in batches (at least every MAX_DELAY seconds).
+
+Each thread can redirect its output to a JobSink with capture(), so jobs
+that run concurrently can keep their lines together and replay them
+afterwards.
+"""
+
+
+import atexit
+from contextlib import contextmanager
+import sys
+import threading
+import time
+
+
+ENDC = "\033[0m"
+
+# Maximum seconds a buffered line waits before it's written out.
+MAX_DELAY = 0.1
+# Buffered bytes that trigger an immediate flush.
+MAX_BUFFER = 8192
+
+
+class LogLevel(object):
+    """Specify colors that are used in Terminal output."""
+    DEBUG = ("\033[95m", "DEBUG")
+    ERROR = ("\033[1;38;5;196m", "ERROR")
+    LOG = ("", "")
+    REMINDER = ("\033[1;38;5;33m", "REMINDER")
+    VERBOSE = ("\033[0m", "")
+    WARNING = ("\033[1;38;5;208m", "WARNING")
+
+
+# Levels that are always shown, and levels written to stderr.
+_ALWAYS = frozenset((LogLevel.ERROR, LogLevel.REMINDER, LogLevel.WARNING,
+                     LogLevel.LOG))
+_STDERR_LEVELS = frozenset((LogLevel.ERROR, LogLevel.WARNING))
+
+
+class StreamSink(object):
+    """Buffers lines for a stream and writes them out in batches."""
+
+    def __init__(self, stream, max_delay=MAX_DELAY, max_buffer=MAX_BUFFER):
+        """Set up a sink for stream.
+
+        Args:
+            stream: A writable file object.
+            max_delay: Maximum seconds a line waits in the buffer.
+            max_buffer: Buffered bytes that trigger a flush.
+        """
+        self.stream = stream
+        self.max_delay = max_delay
+        self.max_buffer = max_buffer
+        try:
+            self.line_buffered = stream.isatty()
+        except (AttributeError, ValueError):
+            self.line_buffered = False
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.time()
+        self._timer = None
+        self._old_timer = None
+
+    def write(self, line):
+        """Queue a line (which should end with a newline) for output."""
+        with self._lock:
+            self._buffer.append(line)
+            self._size += len(line)
+            if (self.line_buffered or self._size >= self.max_buffer or
+                    time.time() - self._last_flush >= self.max_delay):
+                self.flush()
+            elif self._timer is None:
+                # Make sure the line goes out even if nothing follows it.
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write out everything buffered so far."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._old_timer, self._timer = self._timer, None
+            if self._buffer:
+                data = "".join(self._buffer)
+                self._buffer = []
+                self._size = 0
+                self.stream.write(data)
+            self.stream.flush()
+            self._last_flush = time.time()
+
+    def close(self):
+        """Flush, and wait for the flush timer thread to finish."""
+        self.flush()
+        timer = self._old_timer
+        if timer is not None and timer is not threading.current_thread():
+            timer.join()
+
+
+class JobSink(object):
+    """Collects a job's output so it can be replayed in one piece."""
+
+    def __init__(self):
+        # List of (to_stderr, line) tuples.
+        self.lines = []
+
+    def write(self, line, to_stderr=False):
+        self.lines.append((to_stderr, line))
+
+    def replay(self, logger=None):
+        """Write the collected lines to logger's console sinks."""
+        logger = logger or _logger
+        for to_stderr, line in self.lines:
+            logger.write_console(line, to_stderr)
+        self.lines = []
+
+
+class Logger(object):
+    """Level-gated, lazily formatted logger."""
+
+    def __init__(self, stdout=None, stderr=None):
+        """Set up a logger writing to stdout and stderr sinks."""
+        self.stdout = stdout or StreamSink(sys.stdout)
+        self.stderr = stderr or StreamSink(sys.stderr)
+        self.color = False
+        self._local = threading.local()
+        self.set_verbosity(False, False)
+
+    def set_verbosity(self, verbose, debug):
+        """Choose which optional levels are shown.
+
+        Args:
+            verbose: Show VERBOSE messages.
+            debug: Show DEBUG and VERBOSE messages.
+        """
+        enabled = set(_ALWAYS)
+        if verbose or debug:
+            enabled.add(LogLevel.VERBOSE)
+        if debug:
+            enabled.add(LogLevel.DEBUG)
+        self.enabled_levels = frozenset(enabled)
+
+    def is_enabled(self, log_level):
+        """Return True if messages at log_level are shown."""
+        return log_level in self.enabled_levels
+
+    def log(self, message, log_level=LogLevel.LOG, indent=0, args=()):
+        """Format and write a message, if its level is enabled.
+
+        Args:
+            message: The message, or a %-format string if args are given.
+            log_level: LogLevel property for desired loglevel.
+            indent: Number of spaces to indent the message by.
+            args: Values to %-format into message.
+        """
+        if log_level not in self.enabled_levels:
+            return
+        if args:
+            message = message % args
+        if self.color:
+            line = "%s%s%s%s%s\n" % (
+                log_level[0], " " * indent,
+                "[%s] " % log_level[1] if log_level[1] else "",
+                message, ENDC)
+        else:
+            line = "%s%s%s\n" % (
+                " " * indent,
+                "[%s] " % log_level[1] if log_level[1] else "", message)
+        self.write(line, log_level in _STDERR_LEVELS)
+
+    def write(self, line, to_stderr=False):
+        """Write a formatted line to this thread's sink."""
+        job_sink = getattr(self._local, "sink", None)
+        if job_sink is not None:
+            job_sink.write(line, to_stderr)
+        else:
+            self.write_console(line, to_stderr)
+
+    def write_console(self, line, to_stderr=False):
+        """Write a formatted line to stdout or stderr."""
+        if to_stderr:
+            # Keep stdout and stderr in order on a shared terminal.
+            self.stdout.flush()
+            self.stderr.write(line)
+        else:
+            self.stdout.write(line)
+
+    def flush(self):
+        """Write out anything still buffered."""
+        self.stdout.flush()
+        self.stderr.flush()
+
+    def close(self):
+        """Write out anything still buffered, and stop flush timers."""
+        self.stdout.close()
+        self.stderr.close()
+
+    @contextmanager
+    def capture(self, sink=None):
+        """Send this thread's output to a JobSink while in the block.
+
+        Args:
+            sink: JobSink to use. A new one is created if not given.
+
+        Yields:
+            The JobSink collecting the output.
+        """
+        sink = sink or JobSink()
+        previous = getattr(self._local, "sink", None)
+        self._local.sink = sink
+        try:
+            yield sink
+        finally:
+            self._local.sink = previous
+
+
+_logger = Logger()
+atexit.register(_logger.close)
+
+
+def get_logger():
+    """Return the process-wide Logger."""
+    return _logger
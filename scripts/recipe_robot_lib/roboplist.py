@@ -0,0 +1,520 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+roboplist.py
+
+Pure-Python XML property list reading and writing.
+
+Plists are written as a stream straight to the file, with dictionary keys
+in sorted order so the same recipe always produces the same bytes. Files
+are written to a temporary file and renamed into place, so a reader
+never sees a half-written plist.
+
+XML plists are read with expat, and binary plists are decoded directly,
+so neither needs PyObjC. read_plist_keys() memory-maps a file and only
+decodes the top-level keys it's asked for: in a binary plist it looks
+them up through the offset table, and in an XML plist it stops parsing
+once they've all been seen.
+"""
+
+
+from base64 import encodestring
+from binascii import hexlify
+from collections import Mapping
+from datetime import datetime, timedelta
+import mmap
+import os
+from plistlib import Data
+import re
+import struct
+import tempfile
+from xml.parsers import expat
+
+
+PLIST_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" '
+    '"http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n'
+    '<plist version="1.0">\n')
+PLIST_FOOTER = "</plist>\n"
+
+BINARY_MAGIC = "bplist"
+BUFFER_SIZE = 65536
+# Bytes of XML fed to the parser at a time by read_plist_keys().
+SCAN_CHUNK_SIZE = 16384
+
+_ESCAPE_RE = re.compile(r"[&<>]")
+_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;"}
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_EMPTY = object()
+
+# Read once, since os.umask() can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class PlistError(ValueError):
+    """A plist couldn't be read or written."""
+    pass
+
+
+def _escape(text):
+    """Return text as UTF-8 with XML special characters escaped."""
+    if isinstance(text, unicode):
+        text = text.encode("utf-8")
+    return _ESCAPE_RE.sub(lambda match: _ESCAPES[match.group()], text)
+
+
+def _iter_xml(value, depth=0):
+    """Yield the XML for value, one element at a time.
+
+    Args:
+        value: A plist-compatible object.
+        depth: The indentation level of value's element.
+    """
+    indent = "\t" * depth
+    if isinstance(value, basestring):
+        yield "%s<string>%s</string>\n" % (indent, _escape(value))
+    elif isinstance(value, bool):
+        yield "%s<%s/>\n" % (indent, "true" if value else "false")
+    elif isinstance(value, (int, long)):
+        yield "%s<integer>%d</integer>\n" % (indent, value)
+    elif isinstance(value, float):
+        yield "%s<real>%r</real>\n" % (indent, value)
+    elif isinstance(value, (Mapping, dict)) or hasattr(value, "keys"):
+        if not value:
+            yield "%s<dict/>\n" % indent
+            return
+        yield "%s<dict>\n" % indent
+        for key in sorted(value.keys()):
+            if not isinstance(key, basestring):
+                raise PlistError("Plist keys must be strings, not %r" % key)
+            yield "%s\t<key>%s</key>\n" % (indent, _escape(key))
+            for line in _iter_xml(value[key], depth + 1):
+                yield line
+        yield "%s</dict>\n" % indent
+    elif isinstance(value, Data):
+        yield "%s<data>%s</data>\n" % (
+            indent, encodestring(value.data).replace("\n", ""))
+    elif isinstance(value, datetime):
+        yield "%s<date>%s</date>\n" % (indent, value.strftime(_DATE_FORMAT))
+    elif value is None:
+        raise PlistError("None can't be written to a plist.")
+    else:
+        try:
+            items = iter(value)
+        except TypeError:
+            raise PlistError("Unsupported plist type: %s" %
+                             type(value).__name__)
+        first = next(items, _EMPTY)
+        if first is _EMPTY:
+            yield "%s<array/>\n" % indent
+            return
+        yield "%s<array>\n" % indent
+        for line in _iter_xml(first, depth + 1):
+            yield line
+        for item in items:
+            for line in _iter_xml(item, depth + 1):
+                yield line
+        yield "%s</array>\n" % indent
+
+
+def dump(value, stream):
+    """Write value as an XML plist to a file object."""
+    stream.write(PLIST_HEADER)
+    for line in _iter_xml(value):
+        stream.write(line)
+    stream.write(PLIST_FOOTER)
+
+
+def write_plist_to_string(value):
+    """Return value as an XML plist string."""
+    lines = [PLIST_HEADER]
+    lines.extend(_iter_xml(value))
+    lines.append(PLIST_FOOTER)
+    return "".join(lines)
+
+
+def write_plist(value, path):
+    """Atomically write value as an XML plist to path.
+
+    Args:
+        value: A plist-compatible object (usually a dict).
+        path: Destination path. An existing file is replaced.
+
+    Raises:
+        PlistError: value contains something a plist can't hold, or the
+            file couldn't be written.
+    """
+    dest_dir = os.path.dirname(os.path.abspath(path))
+    try:
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".%s." % os.path.basename(path), dir=dest_dir)
+    except (IOError, OSError) as error:
+        raise PlistError("Unable to write %s: %s" % (path, error))
+    try:
+        with os.fdopen(fd, "w", BUFFER_SIZE) as stream:
+            dump(value, stream)
+        # mkstemp creates files only we can read.
+        os.chmod(temp_path, 0666 & ~_UMASK)
+        os.rename(temp_path, path)
+    except (IOError, OSError) as error:
+        os.remove(temp_path)
+        raise PlistError("Unable to write %s: %s" % (path, error))
+    except:
+        os.remove(temp_path)
+        raise
+
+
+class _PlistBuilder(object):
+    """Builds plist objects from expat parser callbacks."""
+
+    def __init__(self):
+        self.stack = []
+        self.keys = []
+        self.root = None
+        self.text = []
+
+    def parse(self, data):
+        """Parse an XML plist string and return its root object."""
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.characters
+        parser.buffer_text = True
+        try:
+            parser.Parse(data, True)
+        except expat.ExpatError as error:
+            raise PlistError("Invalid plist: %s" % error)
+        return self.root
+
+    def add(self, value):
+        """Add a finished value to its container."""
+        if not self.stack:
+            self.root = value
+        elif isinstance(self.stack[-1], dict):
+            if not self.keys:
+                raise PlistError("Invalid plist: value without a key")
+            self.stack[-1][self.keys.pop()] = value
+        else:
+            self.stack[-1].append(value)
+
+    def characters(self, text):
+        self.text.append(text)
+
+    def start(self, element, _):
+        self.text = []
+        if element in ("dict", "array"):
+            container = {} if element == "dict" else []
+            self.add(container)
+            self.stack.append(container)
+
+    def end(self, element):
+        text = "".join(self.text)
+        self.text = []
+        if element in ("dict", "array"):
+            self.stack.pop()
+        elif element == "key":
+            self.keys.append(_to_str(text))
+        elif element == "string":
+            self.add(_to_str(text))
+        elif element == "integer":
+            self.add(int(text))
+        elif element == "real":
+            self.add(float(text))
+        elif element == "true":
+            self.add(True)
+        elif element == "false":
+            self.add(False)
+        elif element == "date":
+            self.add(datetime.strptime(text, _DATE_FORMAT))
+        elif element == "data":
+            self.add(Data.fromBase64(text.encode("ascii")))
+        elif element != "plist":
+            raise PlistError("Invalid plist: unknown element <%s>" % element)
+
+
+def _to_str(text):
+    """Return ASCII text as str, and anything else as unicode."""
+    try:
+        return text.encode("ascii")
+    except UnicodeError:
+        return text
+
+
+class _BinaryPlist(object):
+    """Decodes objects from a binary (bplist00) plist on demand."""
+
+    # Binary plist dates count seconds from here.
+    EPOCH = datetime(2001, 1, 1)
+
+    def __init__(self, data):
+        """Read the trailer of a binary plist.
+
+        Args:
+            data: The plist's contents, as a str or mmap.
+        """
+        if len(data) < 40 or data[:8] != "bplist00":
+            raise PlistError("Invalid plist: not a binary plist")
+        self.data = data
+        (self.offset_size, self.ref_size, self.num_objects, self.top,
+         self.table_offset) = struct.unpack(">6xBBQQQ", data[-32:])
+        if (not self.offset_size or not self.ref_size or
+                self.table_offset + self.num_objects * self.offset_size >
+                len(data) - 32):
+            raise PlistError("Invalid plist: bad binary plist trailer")
+
+    def _uint(self, pos, size):
+        """Return the big-endian unsigned integer at data[pos:pos+size]."""
+        return int(hexlify(self.data[pos:pos + size]), 16)
+
+    def _length(self, pos, info):
+        """Return (length, start of contents) for the object at pos."""
+        if info != 0xF:
+            return info, pos + 1
+        size = 1 << (ord(self.data[pos + 1]) & 0xF)
+        return self._uint(pos + 2, size), pos + 2 + size
+
+    def _refs(self, pos, count):
+        """Return count object references starting at pos."""
+        size = self.ref_size
+        return [self._uint(pos + index * size, size)
+                for index in range(count)]
+
+    def offset(self, ref):
+        """Return the position of object number ref."""
+        if ref >= self.num_objects:
+            raise PlistError("Invalid plist: bad object reference")
+        return self._uint(self.table_offset + ref * self.offset_size,
+                          self.offset_size)
+
+    def dict_refs(self, ref):
+        """Return the (key refs, value refs) of the dict ref."""
+        pos = self.offset(ref)
+        marker = ord(self.data[pos])
+        if marker >> 4 != 0xD:
+            raise PlistError("Invalid plist: expected a dictionary")
+        count, pos = self._length(pos, marker & 0xF)
+        return (self._refs(pos, count),
+                self._refs(pos + count * self.ref_size, count))
+
+    def decode(self, ref, depth=0):
+        """Return the object ref, decoding any objects it contains."""
+        if depth > 512:
+            raise PlistError("Invalid plist: objects nested too deeply")
+        data = self.data
+        pos = self.offset(ref)
+        marker = ord(data[pos])
+        kind, info = marker >> 4, marker & 0xF
+        if marker == 0x08:
+            return False
+        elif marker == 0x09:
+            return True
+        elif kind == 0x1:
+            size = 1 << info
+            value = self._uint(pos + 1, size)
+            # 8 and 16 byte integers are signed.
+            if size >= 8 and value >= 1 << (size * 8 - 1):
+                value -= 1 << (size * 8)
+            return value
+        elif kind == 0x2:
+            fmt = ">f" if info == 2 else ">d"
+            return struct.unpack(fmt, data[pos + 1:pos + 1 + (1 << info)])[0]
+        elif marker == 0x33:
+            seconds = struct.unpack(">d", data[pos + 1:pos + 9])[0]
+            return self.EPOCH + timedelta(seconds=seconds)
+        elif kind == 0x4:
+            length, start = self._length(pos, info)
+            return Data(data[start:start + length])
+        elif kind == 0x5:
+            length, start = self._length(pos, info)
+            return data[start:start + length]
+        elif kind == 0x6:
+            length, start = self._length(pos, info)
+            return _to_str(data[start:start + length * 2].decode("utf-16be"))
+        elif kind == 0x8:
+            return self._uint(pos + 1, info + 1)
+        elif kind == 0xA:
+            length, start = self._length(pos, info)
+            return [self.decode(item, depth + 1)
+                    for item in self._refs(start, length)]
+        elif kind == 0xD:
+            key_refs, value_refs = self.dict_refs(ref)
+            return dict((self.decode(key, depth + 1),
+                         self.decode(value, depth + 1))
+                        for key, value in zip(key_refs, value_refs))
+        raise PlistError("Invalid plist: unknown object type 0x%02x" % marker)
+
+    def root(self):
+        """Return the plist's root object."""
+        return self.decode(self.top)
+
+    def top_level_keys(self, keys):
+        """Return a dict of just the given keys of the root dictionary."""
+        wanted = set(keys)
+        result = {}
+        key_refs, value_refs = self.dict_refs(self.top)
+        for key_ref, value_ref in zip(key_refs, value_refs):
+            key = self.decode(key_ref)
+            if key in wanted:
+                result[key] = self.decode(value_ref)
+                if len(result) == len(wanted):
+                    break
+        return result
+
+
+class _StopScan(Exception):
+    """Raised by _KeyScanner once every wanted key has been found."""
+    pass
+
+
+class _KeyScanner(object):
+    """Picks top-level keys out of an XML plist as it's parsed."""
+
+    def __init__(self, keys):
+        self.wanted = set(keys)
+        self.found = {}
+        self.depth = 0
+        self.text = []
+        self.key = None
+        # Builds the value of a wanted key while it's being parsed.
+        self.value = None
+
+    def characters(self, text):
+        if self.value is not None:
+            self.value.characters(text)
+        else:
+            self.text.append(text)
+
+    def start(self, element, attrs):
+        if self.value is None and (self.depth == 1 and element != "key" and
+                                   self.key in self.wanted):
+            self.value = _PlistBuilder()
+        if self.value is not None:
+            self.value.start(element, attrs)
+            return
+        self.text = []
+        if element in ("dict", "array"):
+            self.depth += 1
+
+    def end(self, element):
+        if self.value is not None:
+            self.value.end(element)
+            if not self.value.stack:
+                self.found[self.key] = self.value.root
+                self.key = self.value = None
+                if len(self.found) == len(self.wanted):
+                    raise _StopScan
+        elif element in ("dict", "array"):
+            self.depth -= 1
+        elif element == "key" and self.depth == 1:
+            self.key = _to_str("".join(self.text))
+
+    def scan(self, data):
+        """Parse data (a str or mmap) until every wanted key is found.
+
+        Returns:
+            A dict of the wanted keys that are in the plist.
+        """
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.characters
+        parser.buffer_text = True
+        try:
+            for pos in range(0, len(data), SCAN_CHUNK_SIZE):
+                parser.Parse(data[pos:pos + SCAN_CHUNK_SIZE], False)
+            parser.Parse("", True)
+        except _StopScan:
+            pass
+        except expat.ExpatError as error:
+            raise PlistError("Invalid plist: %s" % error)
+        return self.found
+
+
+def read_plist_from_string(data):
+    """Return the root object of the plist in data.
+
+    Raises:
+        PlistError: data isn't a valid plist.
+    """
+    if data.startswith(BINARY_MAGIC):
+        try:
+            return _BinaryPlist(data).root()
+        except (IndexError, struct.error, UnicodeError) as error:
+            raise PlistError("Invalid plist: %s" % error)
+    return _PlistBuilder().parse(data)
+
+
+def read_plist(path):
+    """Return the root object of the plist file at path.
+
+    Raises:
+        PlistError: The file couldn't be read or isn't a valid plist.
+    """
+    try:
+        with open(path, "rb") as plist_file:
+            data = plist_file.read()
+    except (IOError, OSError) as error:
+        raise PlistError("Unable to read %s: %s" % (path, error))
+    try:
+        return read_plist_from_string(data)
+    except PlistError as error:
+        raise PlistError("%s in %s" % (error, path))
+
+
+def read_plist_keys(path, keys):
+    """Return some of the top-level keys of the plist file at path.
+
+    Only the requested keys are decoded, which is much cheaper than
+    read_plist() for a large plist (e.g. an app's Info.plist) when only
+    a few of its keys are needed.
+
+    Args:
+        path: Path to a binary or XML plist whose root is a dictionary.
+        keys: Iterable of the keys to read.
+
+    Returns:
+        A dict of the requested keys that are present in the plist.
+
+    Raises:
+        PlistError: The file couldn't be read or isn't a valid plist.
+    """
+    try:
+        with open(path, "rb") as plist_file:
+            if os.fstat(plist_file.fileno()).st_size:
+                data = mmap.mmap(plist_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            else:
+                data = None
+    except (IOError, OSError) as error:
+        raise PlistError("Unable to read %s: %s" % (path, error))
+    if data is None:
+        raise PlistError("Invalid plist: empty file in %s" % path)
+    try:
+        if data[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+            return _BinaryPlist(data).top_level_keys(keys)
+        return _KeyScanner(keys).scan(data)
+    except PlistError as error:
+        raise PlistError("%s in %s" % (error, path))
+    except (IndexError, struct.error, UnicodeError, ValueError) as error:
+        raise PlistError("Invalid plist: %s in %s" % (error, path))
+    finally:
+        data.close()
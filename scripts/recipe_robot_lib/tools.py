@@ -27,28 +27,24 @@ support the main `recipe-robot` script and the `recipe_generator.py` module.
 
 from datetime import datetime
 from functools import wraps
+import hashlib
+import json
 import os
 from random import choice as random_choice
-import re
 import shlex
-from subprocess import Popen, PIPE
 import sys
+import threading
 import timeit
-from urllib2 import urlopen
-from Foundation import NSUserDefaults
 
-from .exceptions import RoboError
-# TODO(Elliot): Can we use the one at /Library/AutoPkg/FoundationPlist instead?
-# Or not use it at all (i.e. use the preferences system correctly). (#16)
-try:
-    from recipe_robot_lib import FoundationPlist
-except ImportError:
-    robo_print("Importing plistlib as FoundationPlist", LogLevel.WARNING)
-    import plistlib as FoundationPlist
+from .backend import AUTOPKG_DOMAIN, RECIPE_ROBOT_DOMAIN, get_backend
+from .commands import run_command, DEFAULT_TIMEOUT
+from .exceptions import BackendError, RoboError
+from .http_client import fetch
+from .robolog import ENDC, LogLevel, get_logger
+from .roboplist import write_plist
 
 
 __version__ = '1.0.2'
-ENDC = "\033[0m"
 PREFS_FILE = os.path.expanduser(
     "~/Library/Preferences/com.elliotjordan.recipe-robot.plist")
 
@@ -59,24 +55,27 @@ SUPPORTED_INSTALL_FORMATS = ("pkg",)
 ALL_SUPPORTED_FORMATS = (SUPPORTED_IMAGE_FORMATS + SUPPORTED_ARCHIVE_FORMATS +
                          SUPPORTED_INSTALL_FORMATS)
 
+# Shared processors that generated recipes may depend on.
+SOURCEFORGEURLPROVIDER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "SourceForgeURLProvider",
+    "SourceForgeURLProvider.py")
+SOURCEFORGEURLPROVIDER_URL = (
+    "https://raw.githubusercontent.com/autopkg/jessepeterson-recipes/master/"
+    "GrandPerspective/SourceForgeURLProvider.py")
+
 # Global variables.
-CACHE_DIR = os.path.join(os.path.expanduser("~/Library/Caches/Recipe Robot"),
+CACHE_ROOT = os.path.expanduser("~/Library/Caches/Recipe Robot")
+CACHE_DIR = os.path.join(CACHE_ROOT,
                          datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f"))
 color_setting = False
-
-
-class LogLevel(object):
-    """Specify colors that are used in Terminal output."""
-    DEBUG = ("\033[95m", "DEBUG")
-    ERROR = ("\033[1;38;5;196m", "ERROR")
-    LOG = ("", "")
-    REMINDER = ("\033[1;38;5;33m", "REMINDER")
-    VERBOSE = ("\033[0m", "")
-    WARNING = ("\033[1;38;5;208m", "WARNING")
+_logger = get_logger()
 
 
 class OutputMode(object):
-    """Manage global output mode state with a singleton."""
+    """Manage global output mode state with a singleton.
+
+    The modes are passed along to the logging backend (see robolog.py).
+    """
     verbose_mode = False  # Use --verbose command-line argument, or hard-code
                           # to "True" here for additional user-facing output.
     debug_mode = False  # Use --debug command-line argument, or hard-code
@@ -87,6 +86,7 @@ class OutputMode(object):
         """Set the class variable for verbose_mode."""
         if isinstance(value, bool):
             cls.verbose_mode = value
+            _logger.set_verbosity(cls.verbose_mode, cls.debug_mode)
         else:
             raise ValueError
 
@@ -95,6 +95,7 @@ class OutputMode(object):
         """Set the class variable for debug_mode."""
         if isinstance(value, bool):
             cls.debug_mode = value
+            _logger.set_verbosity(cls.verbose_mode, cls.debug_mode)
         else:
             raise ValueError
 
@@ -115,35 +116,30 @@ def timed(func):
     return run_func
 
 
-def robo_print(message, log_level=LogLevel.LOG, indent=0):
+def robo_print(message, log_level=LogLevel.LOG, indent=0, *args):
     """Print the specified message in an appropriate color, and only print
     debug output if debug_mode is True.
 
+    The level is checked before anything is formatted, so pass values as
+    args rather than %-formatting the message yourself, e.g.:
+        robo_print("Downloaded to %s", LogLevel.VERBOSE, 4, path)
+
     Args:
+        message: String to be printed to output, or a %-format string if
+            args are given.
         log_level: LogLevel property for desired loglevel.
-        message: String to be printed to output.
+        indent: Number of spaces to indent the message by.
+        args: Values to %-format into message.
     """
-    color = log_level[0] if color_setting else ""
-    indents = indent * " "
-    if log_level[1]:
-        prefix = "[%s] " % log_level[1]
-    else:
-        prefix = ""
-    suffix = ENDC if color_setting else ""
+    if log_level in _logger.enabled_levels:
+        _logger.color = color_setting
+        _logger.log(message, log_level, indent, args)
 
-    line = color + indents + prefix + message + suffix
 
-    if log_level in (LogLevel.ERROR, LogLevel.WARNING):
-        print_func = _print_stderr
-    else:
-        print_func = _print_stdout
-
-    if ((log_level in (LogLevel.ERROR, LogLevel.REMINDER, LogLevel.WARNING,
-                       LogLevel.LOG)) or
-        (log_level is LogLevel.DEBUG and OutputMode.debug_mode) or
-        (log_level is LogLevel.VERBOSE and (OutputMode.verbose_mode or
-                                            OutputMode.debug_mode))):
-        print_func(line)
+def robo_input(prompt=""):
+    """Prompt for a line of input, after any buffered output."""
+    _logger.flush()
+    return raw_input(prompt)
 
 
 def create_dest_dirs(path):
@@ -163,27 +159,66 @@ def create_dest_dirs(path):
                             error)
 
 
-def create_SourceForgeURLProvider(dest_dir):
-    """Copies the latest version of Jesse Peterson's SourceForgeURLProvider to
-    the recipe output directory, because it's referenced by one of the recipes
-    being created.
+def create_SourceForgeURLProvider(dest_dir, refresh=False):
+    """Copies Jesse Peterson's SourceForgeURLProvider to the recipe output
+    directory, because it's referenced by one of the recipes being created.
+
+    The copy bundled with Recipe Robot is used unless refresh is True, in
+    which case the latest version is downloaded from GitHub. The file is
+    only written if its contents differ from what's already there.
+
+    Args:
+        dest_dir: The recipe output directory.
+        refresh: Download the processor from GitHub instead of using the
+            bundled copy.
     """
-    base_url = ("https://raw.githubusercontent.com/autopkg/"
-                "jessepeterson-recipes/master/GrandPerspective/"
-                "SourceForgeURLProvider.py")
-    dest_dir_absolute = os.path.expanduser(dest_dir)
+    source = None
+    if refresh:
+        try:
+            source = fetch(SOURCEFORGEURLPROVIDER_URL)
+        except Exception:  # pylint: disable=broad-except
+            robo_print("Unable to download SourceForgeURLProvider from GitHub. "
+                       "Using the bundled copy instead.", LogLevel.WARNING)
+    if source is None:
+        with open(SOURCEFORGEURLPROVIDER_PATH, "rb") as bundled_file:
+            source = bundled_file.read()
+
+    dest_path = os.path.join(os.path.expanduser(dest_dir),
+                             "SourceForgeURLProvider.py")
+    if deploy_shared_processor(source, dest_path):
+        robo_print(os.path.join(dest_dir, "SourceForgeURLProvider.py"),
+                   LogLevel.VERBOSE, 4)
+    else:
+        robo_print("%s (unchanged)",
+                   LogLevel.VERBOSE, 4,
+                   os.path.join(dest_dir, "SourceForgeURLProvider.py"))
+
+
+def deploy_shared_processor(source, dest_path):
+    """Write a shared processor to dest_path unless it's already there.
+
+    Args:
+        source: The processor's source code.
+        dest_path: Where the processor should live.
+
+    Returns:
+        True if the file was written, False if an identical copy was
+        already in place.
+    """
+    if os.path.exists(dest_path):
+        with open(dest_path, "rb") as existing_file:
+            existing_digest = hashlib.sha256(existing_file.read()).digest()
+        if existing_digest == hashlib.sha256(source).digest():
+            return False
     try:
-        raw_download = urlopen(base_url)
-        with open(os.path.join(dest_dir_absolute, "SourceForgeURLProvider.py"),
-                  "wb") as download_file:
-            download_file.write(raw_download.read())
-            robo_print(os.path.join(dest_dir, "SourceForgeURLProvider.py"),
-                       LogLevel.VERBOSE, 4)
-    except:
-        # TODO(Elliot):  Copy SourceForgeURLProvider from local file. (#46)
-        # TODO: This doesn't notify or update the facts object.
-        robo_print("Unable to download SourceForgeURLProvider from GitHub.",
-                   LogLevel.WARNING)
+        with open(dest_path, "wb") as dest_file:
+            dest_file.write(source)
+    except IOError as error:
+        raise RoboError("Unable to write %s." % dest_path, error)
+    return True
+
+
+_icon_lock = threading.Lock()
 
 
 def extract_app_icon(facts, png_path):
@@ -204,58 +239,39 @@ def extract_app_icon(facts, png_path):
     if not icon_path.endswith(".icns"):
         icon_path = icon_path + ".icns"
 
-    if not os.path.exists(png_path_absolute):
-        cmd = ("sips -s format png \"%s\" --out \"%s\" "
-               "--resampleHeightWidthMax 300" % (icon_path, png_path_absolute))
-        exitcode, _, err = get_exitcode_stdout_stderr(cmd)
-        if exitcode == 0:
-            robo_print("%s" % png_path, LogLevel.VERBOSE, 4)
-            facts["icons"].append(png_path)
-        else:
-            facts["warnings"].append(
-                "An error occurred during icon extraction: %s" % err)
+    # Recipes are generated concurrently, and more than one may want
+    # the same icon.
+    with _icon_lock:
+        if not os.path.exists(png_path_absolute):
+            try:
+                get_backend().convert_icon(icon_path, png_path_absolute, 300)
+            except BackendError as error:
+                facts["warnings"].append(
+                    "An error occurred during icon extraction: %s" % error)
+            else:
+                robo_print(png_path, LogLevel.VERBOSE, 4)
+                facts["icons"].append(png_path)
 
 
-def get_exitcode_stdout_stderr(cmd, stdin=""):
+def get_exitcode_stdout_stderr(cmd, stdin="", timeout=DEFAULT_TIMEOUT):
     """Execute the external command and get its exitcode, stdout and stderr.
 
     Args:
-        cmd: The shell command to be executed.
+        cmd: The command's argument list, or a list of argument lists
+            for a pipeline (see commands.run_command). A command string
+            is still accepted, and is split on "|" and with shlex.
+        stdin: String to pass to the command's standard input.
+        timeout: Seconds to wait before killing the command.
 
     Returns:
         exitcode: Zero upon success. Non-zero upon error.
         out: String from standard output.
         err: String from standard error.
     """
-    if "|" in cmd:
-        cmd_parts = cmd.split("|")
-    else:
-        cmd_parts = [cmd]
-
-    i = 0
-    p = {}
-    for cmd_part in cmd_parts:
-        cmd_part = cmd_part.strip()
-        if i == 0:
-            p[i]=Popen(shlex.split(cmd_part), stdin=PIPE, stdout=PIPE,
-                       stderr=PIPE)
-        else:
-            p[i]=Popen(shlex.split(cmd_part), stdin=p[i-1].stdout, stdout=PIPE,
-                       stderr=PIPE)
-        i = i + 1
-
-    out, err = p[i-1].communicate(stdin)
-    exitcode = p[i-1].returncode
-
-    return exitcode, out, err
-
-
-def _print_stderr(p):
-    print >> sys.stderr, p
-
-
-def _print_stdout(p):
-    print p
+    if isinstance(cmd, basestring):
+        cmd = [shlex.split(cmd_part) for cmd_part in cmd.split("|")]
+    result = run_command(cmd, stdin, timeout)
+    return result.exitcode, result.out, result.err
 
 
 def print_welcome_text():
@@ -288,102 +304,40 @@ def print_death_text():
 
 def reset_term_colors():
     """Ensure terminal colors are normal."""
+    _logger.flush()
     sys.stdout.write(ENDC)
 
 
 def write_report(report, report_file):
-    FoundationPlist.writePlist(report, report_file)
+    """Write a report dict to report_file.
+
+    The report is written as JSON if report_file ends in ".json", and
+    as a plist otherwise.
+    """
+    if report_file.endswith(".json"):
+        with open(report_file, "w") as json_file:
+            json.dump(report, json_file, indent=2, sort_keys=True)
+    else:
+        write_plist(report, report_file)
 
 def get_user_defaults():
-    defaults = NSUserDefaults.alloc().initWithSuiteName_('com.elliotjordan.recipe-robot')
-    default_dict = defaults.dictionaryRepresentation()
+    default_dict = get_backend().read_prefs(RECIPE_ROBOT_DOMAIN)
     return default_dict if len(default_dict) else None
 
 def save_user_defaults(prefs):
-    defaults = NSUserDefaults.alloc().initWithSuiteName_('com.elliotjordan.recipe-robot')
-    for key, value in prefs.iteritems():
-		defaults.setValue_forKey_(value, key)
+    get_backend().write_prefs(RECIPE_ROBOT_DOMAIN, prefs)
+
+def get_autopkg_pref(key, default=None):
+    """Return the value of an AutoPkg preference, or default if unset."""
+    value = get_backend().read_pref(AUTOPKG_DOMAIN, key)
+    return default if value is None else value
+
 
 def any_item_in_string(items, test_string):
     """Return true if any item in items is in test_string"""
     return any([True for item in items if item in test_string])
 
 
-def create_existing_recipe_list(facts):
-    """Use autopkg search results to build existing recipe list.
-
-    Args:
-        facts: The Facts instance containing all of our information.
-            Required keys:
-                app_name: The app's name.
-                recipes: The recipes to build.
-                args: ArgParser args with github_token bool.
-    """
-    app_name = facts["app_name"]
-    recipes = facts["recipes"]
-    use_github_token = facts["args"].github_token
-    # TODO(Elliot): Suggest users create GitHub API token to prevent limiting. (#29)
-    recipe_searches = []
-    recipe_searches.append(app_name)
-
-    app_name_no_space = "".join(app_name.split())
-    if app_name_no_space != app_name:
-        recipe_searches.append(app_name_no_space)
-
-    app_name_no_symbol = re.sub(r'[^\w]', '', app_name)
-    if app_name_no_symbol not in (app_name, app_name_no_space):
-        recipe_searches.append(app_name_no_symbol)
-
-    for this_search in recipe_searches:
-        robo_print("Searching for existing AutoPkg recipes for \"%s\"..." %
-                   this_search, LogLevel.VERBOSE)
-        if use_github_token:
-            if not os.path.exists(os.path.expanduser("~/.autopkg_gh_token")):
-                facts["warnings"].append(
-                    "I couldn't find a GitHub token to use.")
-                cmd = ("/usr/local/bin/autopkg search --path-only \"%s\"" %
-                       this_search)
-            else:
-                # TODO(Elliot): Learn how to use the GitHub token. (#18) https://github.com/autopkg/autopkg/blob/680c75855f00b588e6dd50fb431bed5d5fd41d9c/Code/autopkglib/github/__init__.py#L31
-                facts["warnings"].append(
-                    "I found a GitHub token, but I'm still learning how to "
-                    "use it.")
-                cmd = ("/usr/local/bin/autopkg search --path-only --use-token "
-                       "\"%s\"" % this_search)
-        else:
-            cmd = ("/usr/local/bin/autopkg search --path-only \"%s\"" %
-                   this_search)
-        exitcode, out, err = get_exitcode_stdout_stderr(cmd)
-        out = out.split("\n")
-        if exitcode == 0:
-            # TODO(Elliot): There's probably a more efficient way to do this.
-            # For each recipe type, see if it exists in the search
-            # results.
-            is_existing = False
-            for recipe in recipes:
-                recipe_name = "%s.%s.recipe" % (this_search, recipe["type"])
-                for line in out:
-                    if line.lower().startswith(recipe_name.lower()):
-                        # Set to False by default. If found, set True.
-                        recipe["existing"] = True
-                        robo_print("Found existing %s" % recipe_name,
-                                   LogLevel.LOG, 4)
-                        is_existing = True
-                        break
-            if is_existing is True:
-                raise RoboError(
-                    "Sorry, AutoPkg recipes already exist for this app, and "
-                    "I can't blend new recipes with existing recipes.\n\nHere "
-                    "are my suggestions:\n\t- See if one of the above recipes "
-                    "meets your needs, either as-is or using an override."
-                    "\n\t- Or write your own recipe using one of the above as "
-                    "the ParentRecipe.")
-            if not is_existing:
-                robo_print("No results", LogLevel.VERBOSE, 4)
-        else:
-            raise RoboError(err.message)
-
-
 def congratulate(prefs):
     """Display a friendly congratulatory message upon creating recipes.
 
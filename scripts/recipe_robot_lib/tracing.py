@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+tracing.py
+
+Nested timing spans, written out in Chrome's trace-event format
+(--trace FILE) so a run can be examined in a flame chart viewer such as
+chrome://tracing or Perfetto.
+
+Code opens a span around work worth timing:
+
+    with span("download", "http", url=url) as this_span:
+        ...
+        this_span.set(bytes=size)
+
+or decorates a function with @traced(). Spans opened while another span
+is open on the same thread are nested inside it. Until start_tracing()
+is called, spans cost one attribute check.
+"""
+
+
+from contextlib import contextmanager
+from functools import wraps
+import json
+import os
+import threading
+import time
+
+
+class Span(object):
+    """A span that's currently open."""
+
+    __slots__ = ("name", "category", "start", "attrs")
+
+    def __init__(self, name, category, attrs):
+        self.name = name
+        self.category = category
+        self.start = time.time()
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Add attributes (e.g. bytes=1024) to the span."""
+        self.attrs.update(attrs)
+
+
+class _NullSpan(object):
+    """Stands in for a Span when tracing is off."""
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """Collects finished spans as Chrome trace events."""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.time()
+        # Thread ident -> thread name.
+        self._threads = {}
+
+    def start(self):
+        """Start recording spans."""
+        self._origin = time.time()
+        self.enabled = True
+
+    def current_span(self):
+        """Return the innermost open span on this thread, or NULL_SPAN."""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else NULL_SPAN
+
+    @contextmanager
+    def span(self, name, category="recipe-robot", **attrs):
+        """Time the block as a span.
+
+        Args:
+            name: The span's name, e.g. "inspect_app".
+            category: The span's category, e.g. "http" or "command".
+            attrs: Attributes to show with the span, e.g. url=...
+
+        Yields:
+            The Span, so more attributes can be added with set().
+        """
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        this_span = Span(name, category, attrs)
+        stack.append(this_span)
+        try:
+            yield this_span
+        except BaseException as error:
+            this_span.attrs["error"] = "%s: %s" % (type(error).__name__,
+                                                   error)
+            raise
+        finally:
+            stack.pop()
+            self._finish(this_span)
+
+    def _finish(self, this_span):
+        """Record a closed span."""
+        thread = threading.current_thread()
+        event = {
+            "name": this_span.name,
+            "cat": this_span.category,
+            "ph": "X",
+            "ts": (this_span.start - self._origin) * 1e6,
+            "dur": (time.time() - this_span.start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": this_span.attrs}
+        with self._lock:
+            self.events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    def chrome_trace(self):
+        """Return the recorded spans as a Chrome trace dict."""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(),
+                     "tid": ident, "args": {"name": name}}
+                    for ident, name in threads.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """Write the recorded spans to path as Chrome trace JSON."""
+        with open(os.path.expanduser(path), "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file, default=str)
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """Return the process-wide Tracer."""
+    return _tracer
+
+
+def start_tracing():
+    """Start recording spans."""
+    _tracer.start()
+
+
+def span(name, category="recipe-robot", **attrs):
+    """Time a block as a span on the process-wide Tracer."""
+    return _tracer.span(name, category, **attrs)
+
+
+def current_span():
+    """Return the innermost open span on this thread, or NULL_SPAN."""
+    return _tracer.current_span()
+
+
+def traced(category="recipe-robot", attrs=()):
+    """Decorator that times each call to a function as a span.
+
+    Args:
+        category: The span's category.
+        attrs: Names of the function's arguments to show with the span,
+            e.g. ("input_path",).
+    """
+    def decorator(func):
+        code = func.func_code
+        arg_names = code.co_varnames[:code.co_argcount]
+        positions = dict((attr, arg_names.index(attr)) for attr in attrs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            span_attrs = {}
+            for attr, position in positions.items():
+                if attr in kwargs:
+                    span_attrs[attr] = kwargs[attr]
+                elif position < len(args):
+                    span_attrs[attr] = args[position]
+            with _tracer.span(func.__name__, category, **span_attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,184 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+version.py
+
+Shared version comparison for Recipe Robot.
+
+Versions are parsed once into tuples that sort the same way Sparkle's
+SUStandardVersionComparator orders them, so they can be used directly
+as sort or max() keys:
+    - Numeric chunks compare numerically ("1.10" > "1.9").
+    - Text chunks compare case-insensitively ("1.0b2" > "1.0a9").
+    - A number beats text in the same position ("1.0.1" > "1.0b1").
+    - A trailing text chunk marks a prerelease ("1.0" > "1.0b1"), but a
+      trailing number marks a newer release ("1.0.1" > "1.0").
+"""
+
+
+import re
+
+
+# Version chunks are runs of digits or runs of letters. Everything else
+# (dots, dashes, spaces, underscores) only separates chunks.
+_CHUNK_RE = re.compile(r"\d+|[^\W\d_]+", re.UNICODE)
+
+# Same pattern distutils.version.StrictVersion uses to validate input.
+_STRICT_RE = re.compile(r"^(\d+)\.(\d+)(\.(\d+))?([ab](\d+))?$")
+
+# Candidate version strings embedded in file names and URLs, e.g.
+# "AutoPkgr-1.3.2.dmg" or "cdto_2_6.zip".
+_EMBEDDED_VERSION_RE = re.compile(
+    r"\d+(?:[._]\d+)*(?:[-_]?(?:alpha|beta|rc|a|b)\d*(?![A-Za-z]))?")
+
+# Text before an embedded version that means it's the minimum OS version
+# rather than the app's, e.g. "App_2.0_macOS_10.12.dmg".
+_OS_TAG_RE = re.compile(r"(?:mac[ _-]?os(?:[ _-]?x)?|os[ _-]?x|darwin)[ _.-]*$",
+                        re.IGNORECASE)
+
+# Chunk ranks. The end-of-version marker sits between text and numbers,
+# which gives Sparkle's prerelease/patch-release behavior for free.
+_TEXT = 0
+_END = 1
+_NUMBER = 2
+
+# Parsed keys, memoized by version string. Feeds and release listings
+# tend to repeat the same handful of versions, and inspection compares
+# each of them many times.
+_KEY_CACHE = {}
+_KEY_CACHE_LIMIT = 4096
+
+
+def version_key(version):
+    """Return a sortable key for a version string.
+
+    Args:
+        version: A version string, e.g. "2.4.1b3". None and empty strings
+            sort before every real version.
+
+    Returns:
+        A tuple of (rank, value) pairs suitable for comparison with
+        other keys returned by this function.
+    """
+    try:
+        return _KEY_CACHE[version]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable input; don't bother caching.
+        return _parse_version(version)
+
+    key = _parse_version(version)
+    if len(_KEY_CACHE) >= _KEY_CACHE_LIMIT:
+        _KEY_CACHE.clear()
+    _KEY_CACHE[version] = key
+    return key
+
+
+def _parse_version(version):
+    """Split a version string into ranked chunks (uncached)."""
+    if not version:
+        return ()
+    key = []
+    if not isinstance(version, basestring):
+        version = str(version)
+    for chunk in _CHUNK_RE.findall(version):
+        if chunk.isdigit():
+            key.append((_NUMBER, int(chunk)))
+        else:
+            key.append((_TEXT, chunk.lower()))
+    key.append((_END, u""))
+    return tuple(key)
+
+
+def compare_versions(version_a, version_b):
+    """Compare two version strings.
+
+    Returns:
+        A negative number, zero, or a positive number if version_a is
+        older than, the same as, or newer than version_b.
+    """
+    return cmp(version_key(version_a), version_key(version_b))
+
+
+def max_by_version(items, key=None):
+    """Return the item with the highest version.
+
+    Ties keep the first item encountered, so callers that iterate a
+    feed or listing in document order get the same result they would
+    get from a strict "greater than" loop.
+
+    Args:
+        items: An iterable of version strings, or of arbitrary items if
+            key is given.
+        key: Optional function that returns the version string of an
+            item.
+
+    Returns:
+        The newest item, or None if items is empty.
+    """
+    best_item = None
+    best_key = None
+    for item in items:
+        this_key = version_key(key(item) if key else item)
+        if best_key is None or this_key > best_key:
+            best_item = item
+            best_key = this_key
+    return best_item
+
+
+def is_strict_version(version):
+    """Return True if version is a distutils-style strict version."""
+    return bool(version) and _STRICT_RE.match(version) is not None
+
+
+def version_from_filename(filename):
+    """Pull the most likely version string out of a file name or URL.
+
+    Args:
+        filename: A file name or URL path, e.g. "AutoPkgr-1.3.2.dmg".
+
+    Numbers that are part of a word (e.g. "x86_64", "osx10.9", "64bit")
+    or that follow an OS name (e.g. "macOS_10.12") are skipped. Of the
+    rest, the first dotted version wins, since it usually directly
+    follows the product name.
+
+    Returns:
+        The version found in the last path component, or an empty
+        string if there isn't one.
+    """
+    basename = filename.rstrip("/").split("/")[-1]
+    candidates = []
+    for match in _EMBEDDED_VERSION_RE.finditer(basename):
+        before = basename[:match.start()]
+        after = basename[match.end():]
+        # Allow a "v" prefix, as in "App-v1.2.dmg".
+        if before[-1:] in ("v", "V") and not before[-2:-1].isalnum():
+            before = before[:-1]
+        if before[-1:].isalnum() or after[:1].isalnum():
+            continue
+        if _OS_TAG_RE.search(before):
+            continue
+        candidates.append(match.group())
+    if not candidates:
+        return ""
+    dotted = [candidate for candidate in candidates
+              if not candidate.isdigit()]
+    return (dotted or candidates)[0].replace("_", ".")
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+"""
+test_SourceForgeURLProvider.py
+
+Unit tests for the bundled SourceForgeURLProvider processor.
+"""
+
+
+import imp
+import json
+import mimetools
+import os
+import re
+import shutil
+import tempfile
+import urllib
+import urllib2
+from StringIO import StringIO
+
+from nose.plugins.skip import SkipTest
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+try:
+    import autopkglib  # pylint: disable=unused-import
+except ImportError:
+    autopkglib = None
+
+
+PROCESSOR_PATH = os.path.join(
+    os.path.dirname(__file__), os.pardir, "recipe_robot_lib",
+    "SourceForgeURLProvider", "SourceForgeURLProvider.py")
+
+RSS_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0"><channel>%s</channel></rss>"""
+ITEM_TEMPLATE = "<item><link>%s</link><pubDate>%s</pubDate></item>"
+
+
+def make_rss(*items):
+    """Build a file index RSS feed from (link, pubDate) tuples."""
+    return RSS_TEMPLATE % "".join(ITEM_TEMPLATE % item for item in items)
+
+
+class StubHandler(urllib2.BaseHandler):
+    """Answers every HTTP request with a canned response."""
+
+    # Run before urllib2's own HTTPHandler.
+    handler_order = 100
+
+    def __init__(self, body="", code=200, etag=None):
+        self.body = body
+        self.code = code
+        self.etag = etag
+        self.requests = []
+
+    def http_open(self, req):
+        self.requests.append(req)
+        headers = mimetools.Message(StringIO(
+            "ETag: %s\r\n\r\n" % self.etag if self.etag else "\r\n"))
+        if self.code != 200:
+            raise urllib2.HTTPError(req.get_full_url(), self.code, "Stubbed",
+                                    headers, None)
+        response = urllib.addinfourl(StringIO(self.body), headers,
+                                     req.get_full_url(), self.code)
+        response.msg = "OK"
+        return response
+
+
+class TestSourceForgeURLProvider(object):
+    """Tests for SourceForgeURLProvider."""
+
+    def setup(self):
+        if autopkglib is None:
+            raise SkipTest("AutoPkg isn't installed.")
+        module = imp.load_source("SourceForgeURLProvider", PROCESSOR_PATH)
+        self.cache_dir = tempfile.mkdtemp()
+        self.processor = module.SourceForgeURLProvider(
+            {"RECIPE_CACHE_DIR": self.cache_dir, "verbose": 0})
+        self.url = module.FILE_INDEX_URL % "1234"
+        self.rss_path, self.meta_path = self.processor.get_cache_paths("1234")
+
+    def teardown(self):
+        urllib2.install_opener(None)
+        if autopkglib is not None:
+            shutil.rmtree(self.cache_dir)
+
+    def stub(self, handler):
+        """Route urllib2.urlopen through handler."""
+        urllib2.install_opener(urllib2.build_opener(handler))
+        return handler
+
+    def write_cache(self, rss, etag):
+        """Save rss to the cache as if fetched with the given ETag."""
+        os.makedirs(os.path.dirname(self.rss_path))
+        with open(self.rss_path, "w") as rss_file:
+            rss_file.write(rss)
+        with open(self.meta_path, "w") as meta_file:
+            json.dump({"url": self.url, "etag": etag, "last_modified": None},
+                      meta_file)
+
+    def test_newest_matching_file(self):
+        """Ensure the newest file matching the pattern is chosen."""
+        self.stub(StubHandler(make_rss(
+            ("http://sf.net/App-1.0.dmg", "Mon, 02 Feb 2015 10:00:00 UT"),
+            ("http://sf.net/App-2.0.dmg", "Tue, 03 Mar 2015 10:00:00 UT"),
+            ("http://sf.net/App-3.0.zip", "Wed, 04 Mar 2015 10:00:00 UT"),
+            ("http://sf.net/App-1.5.dmg", "Sun, 01 Mar 2015 10:00:00 UT"))))
+        url = self.processor.get_sf_file_url("1234", re.compile(r"\.dmg$"))
+        assert_equal(url, "http://sf.net/App-2.0.dmg")
+
+    def test_not_modified_reuses_cache(self):
+        """Ensure a 304 response reuses the cached feed."""
+        self.write_cache(make_rss(
+            ("http://sf.net/App-1.0.dmg", "Mon, 02 Feb 2015 10:00:00 UT")),
+            '"old"')
+        handler = self.stub(StubHandler(code=304))
+        url = self.processor.get_sf_file_url("1234", re.compile(r"\.dmg$"))
+        assert_equal(url, "http://sf.net/App-1.0.dmg")
+        assert_equal(handler.requests[0].get_header("If-none-match"),
+                     '"old"')
+
+    def test_changed_feed_rewrites_cache(self):
+        """Ensure a 200 response replaces the cached feed and metadata."""
+        self.write_cache(make_rss(
+            ("http://sf.net/App-1.0.dmg", "Mon, 02 Feb 2015 10:00:00 UT")),
+            '"old"')
+        new_rss = make_rss(
+            ("http://sf.net/App-2.0.dmg", "Tue, 03 Mar 2015 10:00:00 UT"))
+        self.stub(StubHandler(new_rss, etag='"new"'))
+        url = self.processor.get_sf_file_url("1234", re.compile(r"\.dmg$"))
+        assert_equal(url, "http://sf.net/App-2.0.dmg")
+        with open(self.rss_path) as rss_file:
+            assert_equal(rss_file.read(), new_rss)
+        with open(self.meta_path) as meta_file:
+            assert_equal(json.load(meta_file)["etag"], '"new"')
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+"""
+test_backend.py
+
+Unit tests for the pure-Python platform backend.
+"""
+
+
+import os
+import shutil
+from StringIO import StringIO
+import struct
+import tarfile
+import tempfile
+import zipfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import backend
+from recipe_robot_lib.exceptions import BackendError
+from test_flatpkg import APP_PAYLOAD, make_certificate, make_payload, make_xar
+
+
+PNG = backend.PNG_MAGIC + "image data"
+
+
+def icns_element(element_type, data):
+    """Return an icns element."""
+    return struct.pack(">4sI", element_type, len(data) + 8) + data
+
+
+class TestPurePythonBackend(object):
+    """Tests for PurePythonBackend."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = backend.PurePythonBackend(
+            os.path.join(self.tmp_dir, "prefs"))
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_prefs_round_trip(self):
+        """Ensure written preferences are read back, merged."""
+        assert_equal(self.backend.read_prefs("com.example"), {})
+        self.backend.write_prefs("com.example", {"A": 1, "B": "two"})
+        self.backend.write_prefs("com.example", {"B": "three"})
+        assert_equal(self.backend.read_prefs("com.example"),
+                     {"A": 1, "B": "three"})
+        assert_equal(self.backend.read_pref("com.example", "A"), 1)
+        assert_is_none(self.backend.read_pref("com.example", "C"))
+
+    def test_default_prefs_dir(self):
+        """Ensure preferences default to $XDG_CONFIG_HOME/recipe-robot."""
+        old_config_home = os.environ.get("XDG_CONFIG_HOME")
+        os.environ["XDG_CONFIG_HOME"] = self.tmp_dir
+        try:
+            assert_equal(backend.PurePythonBackend().prefs_dir,
+                         os.path.join(self.tmp_dir, "recipe-robot"))
+        finally:
+            if old_config_home is None:
+                del os.environ["XDG_CONFIG_HOME"]
+            else:
+                os.environ["XDG_CONFIG_HOME"] = old_config_home
+
+    def test_unpack_zip(self):
+        """Ensure zip archives are unpacked."""
+        path = os.path.join(self.tmp_dir, "App.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("App.app/Contents/Info.plist", "<plist/>")
+        dest = os.path.join(self.tmp_dir, "unpacked")
+        assert_equal(self.backend.unpack_archive(path, dest), "zip")
+        assert_true(os.path.isfile(
+            os.path.join(dest, "App.app", "Contents", "Info.plist")))
+
+    def test_unpack_tgz(self):
+        """Ensure gzipped tar archives are unpacked."""
+        source = os.path.join(self.tmp_dir, "App.app")
+        os.makedirs(source)
+        path = os.path.join(self.tmp_dir, "App.tgz")
+        with tarfile.open(path, "w:gz") as archive:
+            archive.add(source, "App.app")
+        dest = os.path.join(self.tmp_dir, "unpacked")
+        assert_equal(self.backend.unpack_archive(path, dest), "tgz")
+        assert_true(os.path.isdir(os.path.join(dest, "App.app")))
+
+    def test_unpack_tgz_symlink_escape_refused(self):
+        """Ensure tgz members can't be written through a symlink."""
+        outside = os.path.join(self.tmp_dir, "outside")
+        os.mkdir(outside)
+        path = os.path.join(self.tmp_dir, "App.tgz")
+        with tarfile.open(path, "w:gz") as archive:
+            link = tarfile.TarInfo("App.app")
+            link.type = tarfile.SYMTYPE
+            link.linkname = outside
+            archive.addfile(link)
+            escaped = tarfile.TarInfo("App.app/escaped.txt")
+            escaped.size = 4
+            archive.addfile(escaped, StringIO("nope"))
+        assert_raises(BackendError, self.backend.unpack_archive, path,
+                      os.path.join(self.tmp_dir, "unpacked"))
+        assert_equal(os.listdir(outside), [])
+
+    def test_unpack_tgz_absolute_name_refused(self):
+        """Ensure absolute tgz member names land inside dest."""
+        path = os.path.join(self.tmp_dir, "App.tgz")
+        outside = os.path.join(self.tmp_dir, "absolute.txt")
+        with tarfile.open(path, "w:gz") as archive:
+            member = tarfile.TarInfo(outside)
+            member.size = 4
+            archive.addfile(member, StringIO("data"))
+        dest = os.path.join(self.tmp_dir, "unpacked")
+        self.backend.unpack_archive(path, dest)
+        assert_false(os.path.exists(outside))
+        assert_true(os.path.isfile(os.path.join(dest, outside.lstrip("/"))))
+
+    def test_unpack_not_an_archive(self):
+        """Ensure a file that isn't an archive raises BackendError."""
+        path = os.path.join(self.tmp_dir, "App.dmg")
+        with open(path, "wb") as dmg:
+            dmg.write("koly")
+        assert_raises(BackendError, self.backend.unpack_archive, path,
+                      self.tmp_dir)
+
+    def test_disk_images_unsupported(self):
+        """Ensure mounting a disk image raises BackendError."""
+        assert_raises(BackendError, self.backend.mount_disk_image,
+                      os.path.join(self.tmp_dir, "App.dmg"))
+
+    def test_package(self):
+        """Ensure a package's signature and payload apps are read."""
+        payload_path = os.path.join(self.tmp_dir, "Payload")
+        make_payload(payload_path, APP_PAYLOAD)
+        with open(payload_path, "rb") as payload:
+            pkg_path = os.path.join(self.tmp_dir, "App.pkg")
+            make_xar(pkg_path, {"Payload": payload.read()}, (
+                make_certificate("Developer ID Certification Authority",
+                                 "Developer ID Installer: Example (ABC123)"),))
+        assert_equal(self.backend.package_signature(pkg_path),
+                     ["Developer ID Installer: Example (ABC123)"])
+        expanded = os.path.join(self.tmp_dir, "expanded")
+        self.backend.expand_package(pkg_path, expanded)
+        assert_equal(self.backend.list_payload_apps(
+            os.path.join(expanded, "Sub.pkg", "Payload")), ["./App.app"])
+
+    def test_convert_icon(self):
+        """Ensure the preferred PNG image is taken from an icns file."""
+        elements = (icns_element("ic07", backend.PNG_MAGIC + "128") +
+                    icns_element("ic09", PNG) +
+                    icns_element("it32", "not a png"))
+        icns_path = os.path.join(self.tmp_dir, "App.icns")
+        with open(icns_path, "wb") as icns:
+            icns.write("icns" + struct.pack(">I", len(elements) + 8) +
+                       elements)
+        png_path = os.path.join(self.tmp_dir, "App.png")
+        self.backend.convert_icon(icns_path, png_path)
+        with open(png_path, "rb") as png:
+            assert_equal(png.read(), PNG)
+
+    def test_convert_icon_without_png(self):
+        """Ensure icns files with only old image formats raise."""
+        icns_path = os.path.join(self.tmp_dir, "App.icns")
+        with open(icns_path, "wb") as icns:
+            icns.write("icns" + struct.pack(">I", 16) +
+                       icns_element("it32", ""))
+        assert_raises(BackendError, self.backend.convert_icon, icns_path,
+                      os.path.join(self.tmp_dir, "App.png"))
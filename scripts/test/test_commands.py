@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_commands.py
+
+Unit tests for the command runner.
+"""
+
+
+import time
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import commands
+
+
+class TestCommands(object):
+    """Tests for run_command."""
+
+    def test_arguments_are_not_split(self):
+        """Ensure arguments with spaces and quotes are passed as-is."""
+        result = commands.run_command(["printf", "%s|", "a b", "\"c\""])
+        assert_equal(result.exitcode, 0)
+        assert_equal(result.out, "a b|\"c\"|")
+
+    def test_pipeline(self):
+        """Ensure stages are chained and each exit code is kept."""
+        result = commands.run_command(
+            [["printf", "one\ntwo\n"], ["grep", "two"], ["cat"]],
+            stdin="ignored")
+        assert_equal(result.out, "two\n")
+        assert_equal(result.exitcodes, [0, 0, 0])
+        result = commands.run_command([["sh", "-c", "exit 3"], ["cat"]])
+        assert_equal(result.exitcode, 0)
+        assert_equal(result.failed_stages, [0])
+
+    def test_on_line(self):
+        """Ensure stdout is streamed to the callback line by line."""
+        lines = []
+        result = commands.run_command(["printf", "a\nb\n"],
+                                      on_line=lines.append)
+        assert_equal(lines, ["a", "b"])
+        assert_equal(result.out, "")
+
+    def test_timeout(self):
+        """Ensure a hung command is killed."""
+        start = time.time()
+        result = commands.run_command([["sleep", "10"], ["cat"]],
+                                      timeout=0.2)
+        assert_less(time.time() - start, 5)
+        assert_true(result.timed_out)
+        assert_equal(result.exitcode, commands.TIMEOUT_EXITCODE)
+
+    def test_missing_command(self):
+        """Ensure a command that can't be started is reported, not raised."""
+        result = commands.run_command(["/nonexistent/command"])
+        assert_equal(result.exitcode, 127)
+        assert_in("/nonexistent/command", result.err)
+
+    def test_ledger(self):
+        """Ensure each command is recorded and summarized by name."""
+        ledger = commands.get_command_ledger()
+        ledger.clear()
+        commands.run_command(["printf", "12345"])
+        commands.run_command([["printf", "x\n"], ["cat"]],
+                             on_line=lambda line: None)
+        commands.run_command(["sh", "-c", "exit 2"])
+        assert_equal([entry["command"] for entry in ledger.entries],
+                     ["printf", "printf | cat", "sh"])
+        assert_equal(ledger.entries[0]["output_bytes"], 5)
+        assert_equal(ledger.entries[1]["output_bytes"], 2)
+        summary = dict((total["command"], total)
+                       for total in ledger.summary())
+        assert_equal(summary["sh"]["failures"], 1)
+        assert_equal(len(ledger.format_table()), 4)
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_events.py
+
+Unit tests for the JSON-lines event stream.
+"""
+
+
+import json
+from StringIO import StringIO
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import events
+
+
+class TestEventWriter(object):
+    """Tests for EventWriter."""
+
+    def setup(self):
+        self.stream = StringIO()
+        self.writer = events.EventWriter(self.stream)
+
+    def read_events(self):
+        return [json.loads(line) for line in
+                self.stream.getvalue().splitlines()]
+
+    def test_emit(self):
+        """Ensure events are typed, timestamped JSON lines."""
+        self.writer.emit("fact_set", key="app_name", value=u"Caf\xe9")
+        event, = self.read_events()
+        assert_equal(event["event"], "fact_set")
+        assert_equal(event["value"], u"Caf\xe9")
+        assert_in("time", event)
+
+    def test_progress_is_throttled(self):
+        """Ensure only the first and final progress samples get through."""
+        for done in range(0, 1001, 100):
+            self.writer.progress("https://example.com/app.dmg", done, 1000)
+        assert_equal([event["bytes"] for event in self.read_events()],
+                     [0, 1000])
+
+    def test_phase(self):
+        """Ensure phases report their outcome."""
+        events._writer = self.writer
+        try:
+            with events.phase("inspect"):
+                pass
+            with assert_raises(ValueError):
+                with events.phase("generate"):
+                    raise ValueError
+        finally:
+            events._writer = None
+        assert_equal([(event["event"], event.get("status")) for event in
+                      self.read_events()],
+                     [("phase_start", None), ("phase_end", "ok"),
+                      ("phase_start", None), ("phase_end", "error")])
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_facts.py
+
+Unit tests for Facts snapshots.
+"""
+
+
+import os
+import shutil
+import struct
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import backend, tools
+from recipe_robot_lib.exceptions import RoboError
+from recipe_robot_lib.facts import Facts, NotifyingList
+from recipe_robot_lib.robolog import get_logger
+
+
+class TestFactsSnapshot(object):
+    """Tests for Facts.save() and Facts.load()."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "facts.json")
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        """Ensure saved facts load back with the same values and types."""
+        facts = Facts()
+        facts["args"] = object()
+        facts["app_name"] = u"Caf\xe9"
+        facts["codesign_authorities"] = ["Developer ID Application: Cafe"]
+        facts["sparkle_provides_version"] = True
+        facts["reminders"].append("Check the version key.")
+        facts.save(self.path)
+
+        loaded = Facts()
+        loaded.load(self.path)
+        assert_not_in("args", loaded)
+        assert_equal(loaded["app_name"], "Caf\xc3\xa9")
+        assert_is_instance(loaded["codesign_authorities"], NotifyingList)
+        assert_equal(list(loaded["codesign_authorities"]),
+                     ["Developer ID Application: Cafe"])
+        assert_true(loaded["sparkle_provides_version"])
+        assert_equal(list(loaded["reminders"]), ["Check the version key."])
+
+    def test_icon_survives_cache_removal(self):
+        """Ensure icons can be extracted after the run's cache is gone."""
+        png = backend.PNG_MAGIC + "image data"
+        element = struct.pack(">4sI", "ic07", 8 + len(png)) + png
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        os.mkdir(cache_dir)
+        with open(os.path.join(cache_dir, "AppIcon.icns"), "wb") as icns:
+            icns.write(struct.pack(">4sI", "icns", 8 + len(element)) +
+                       element)
+        facts = Facts()
+        facts["app_name"] = "Example"
+        facts["icon_path"] = os.path.join(cache_dir, "AppIcon")
+        facts.save(self.path)
+        shutil.rmtree(cache_dir)
+
+        loaded = Facts()
+        loaded.load(self.path)
+        assert_equal(loaded["icon_path"],
+                     os.path.join(self.tmp_dir, "facts.icns"))
+        old_backend = backend.get_backend()
+        backend.set_backend(backend.PurePythonBackend(self.tmp_dir))
+        png_path = os.path.join(self.tmp_dir, "recipes", "Example.png")
+        try:
+            with get_logger().capture():
+                tools.extract_app_icon(loaded, png_path)
+        finally:
+            backend.set_backend(old_backend)
+        assert_equal(list(loaded["warnings"]), [])
+        with open(png_path, "rb") as png_file:
+            assert_equal(png_file.read(), png)
+
+    def test_load_rejects_other_files(self):
+        """Ensure files that aren't snapshots raise RoboError."""
+        with open(self.path, "w") as snapshot_file:
+            snapshot_file.write("{}")
+        assert_raises(RoboError, Facts().load, self.path)
+
+
+class TestFactTypes(object):
+    """Tests for storing facts by their FACT_TYPES type."""
+
+    def setup(self):
+        self.facts = Facts()
+
+    def test_declared_types(self):
+        """Ensure declared facts are coerced to their types."""
+        self.facts["app_name"] = u"Caf\xe9"
+        self.facts["blocking_applications"] = ["Example.app"]
+        self.facts["is_from_app_store"] = False
+        assert_is_instance(self.facts["app_name"], str)
+        assert_equal(self.facts["app_name"], "Caf\xc3\xa9")
+        assert_is_instance(self.facts["blocking_applications"], NotifyingList)
+        assert_equal(list(self.facts["blocking_applications"]),
+                     ["Example.app"])
+        assert_is(self.facts["is_from_app_store"], False)
+
+    def test_wrong_types_pass_through(self):
+        """Ensure values of another type are stored untouched."""
+        self.facts["bundle_id"] = 42
+        self.facts["codesign_authorities"] = ("Developer ID",)
+        self.facts["specify_filename"] = "yes"
+        assert_equal(self.facts["bundle_id"], 42)
+        assert_equal(self.facts["codesign_authorities"], ("Developer ID",))
+        assert_equal(self.facts["specify_filename"], "yes")
+
+    def test_object_facts_untouched(self):
+        """Ensure "object" facts aren't coerced even if they could be."""
+        self.facts["sourceforge_id"] = [u"1234"]
+        assert_is(type(self.facts["sourceforge_id"]), list)
+        assert_is_instance(self.facts["sourceforge_id"][0], unicode)
+
+    def test_undeclared_keys(self):
+        """Ensure undeclared keys are coerced based on their value."""
+        self.facts["new_string"] = u"Caf\xe9"
+        self.facts["new_list"] = ["one"]
+        self.facts["new_bool"] = True
+        self.facts["new_number"] = 1.5
+        assert_equal(self.facts["new_string"], "Caf\xc3\xa9")
+        assert_is_instance(self.facts["new_string"], str)
+        assert_is_instance(self.facts["new_list"], NotifyingList)
+        assert_is(self.facts["new_bool"], True)
+        assert_equal(self.facts["new_number"], 1.5)
+
+
+class TestFactProviders(object):
+    """Tests for Facts.provide() and Facts.resolve()."""
+
+    def test_providers_run_once_on_demand(self):
+        """Ensure providers only run when one of their keys is resolved."""
+        facts = Facts()
+        calls = []
+
+        def provide_codesign():
+            calls.append("codesign")
+            facts["codesign_reqs"] = "anchor apple generic"
+            facts["developer"] = "Example Developer"
+
+        facts.provide(("codesign_reqs", "developer"), provide_codesign)
+        facts.provide(("description",), lambda: calls.append("description"))
+        assert_not_in("developer", facts)
+
+        facts.resolve("developer", "codesign_reqs")
+        facts.resolve("codesign_reqs")
+        assert_equal(calls, ["codesign"])
+        assert_equal(facts["developer"], "Example Developer")
+
+        facts.resolve_all()
+        assert_equal(calls, ["codesign", "description"])
@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+"""
+test_flatpkg.py
+
+Unit tests for the pure-Python flat package and payload reader.
+"""
+
+
+import gzip
+import os
+import shutil
+import stat
+import tempfile
+import zlib
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import flatpkg
+
+
+PACKAGE_INFO = ('<pkg-info identifier="com.example.pkg.App" '
+                'install-location="/Applications/App.app"/>')
+
+
+def make_certificate(issuer, subject):
+    """Return just enough of a DER certificate to hold two common names."""
+    der = ""
+    for name in (issuer, subject):
+        der += flatpkg.COMMON_NAME_OID + "\x0c" + chr(len(name)) + name
+    return der
+
+
+def make_xar(path, files, certificates=()):
+    """Write a xar archive of {name: data} files, inside a dir "Sub.pkg"."""
+    heap = ""
+    entries = []
+    for file_id, (name, data) in enumerate(sorted(files.items()), 2):
+        compressed = zlib.compress(data)
+        entries.append(
+            '<file id="%d"><name>%s</name><type>file</type><data>'
+            '<offset>%d</offset><length>%d</length><size>%d</size>'
+            '<encoding style="application/x-gzip"/></data></file>' % (
+                file_id, name, len(heap), len(compressed), len(data)))
+        heap += compressed
+    signature = ""
+    if certificates:
+        signature = (
+            '<signature style="RSA"><KeyInfo xmlns='
+            '"http://www.w3.org/2000/09/xmldsig#"><X509Data>%s</X509Data>'
+            '</KeyInfo></signature>' % "".join(
+                "<X509Certificate>%s</X509Certificate>" %
+                certificate.encode("base64") for certificate in certificates))
+    toc = ('<?xml version="1.0" encoding="UTF-8"?><xar><toc>%s'
+           '<file id="1"><name>Sub.pkg</name><type>directory</type>%s</file>'
+           '</toc></xar>' % (signature, "".join(entries)))
+    compressed_toc = zlib.compress(toc)
+    with open(path, "wb") as xar_file:
+        xar_file.write(flatpkg.XAR_HEADER.pack(
+            flatpkg.XAR_MAGIC, flatpkg.XAR_HEADER.size, 1,
+            len(compressed_toc), len(toc), 0))
+        xar_file.write(compressed_toc)
+        xar_file.write(heap)
+
+
+def cpio_entry(name, mode, data=""):
+    """Return an odc cpio member."""
+    name += "\0"
+    return ("%s%06o%06o%06o%06o%06o%06o%06o%011o%06o%011o" % (
+        flatpkg.CPIO_MAGIC, 0, 0, mode, 0, 0, 1, 0, 0, len(name),
+        len(data)) + name + data)
+
+
+def make_payload(path, entries):
+    """Write a gzipped cpio payload of (name, mode, data) entries."""
+    payload = gzip.open(path, "wb")
+    for entry in entries:
+        payload.write(cpio_entry(*entry))
+    payload.write(cpio_entry(flatpkg.CPIO_TRAILER, 0))
+    payload.close()
+
+
+APP_PAYLOAD = (
+    (".", stat.S_IFDIR | 0755),
+    ("./App.app", stat.S_IFDIR | 0755),
+    ("./App.app/Contents", stat.S_IFDIR | 0755),
+    ("./App.app/Contents/Info.plist", stat.S_IFREG | 0644, "<plist/>"),
+    ("./App.app/Contents/MacOS", stat.S_IFDIR | 0755),
+    ("./App.app/Contents/MacOS/App", stat.S_IFREG | 0755, "#!/bin/sh\n"),
+    ("./App.app/Contents/Current", stat.S_IFLNK | 0755, "MacOS"),
+    ("./Other.txt", stat.S_IFREG | 0644, "other"),
+)
+
+
+class TestXarArchive(object):
+    """Tests for reading flat packages."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pkg_path = os.path.join(self.tmp_dir, "App.pkg")
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_extract_all(self):
+        """Ensure files and directories are expanded like pkgutil."""
+        make_xar(self.pkg_path, {"PackageInfo": PACKAGE_INFO,
+                                 "Payload": "payload data"})
+        dest = os.path.join(self.tmp_dir, "expanded")
+        flatpkg.XarArchive(self.pkg_path).extract_all(dest)
+        with open(os.path.join(dest, "Sub.pkg", "PackageInfo")) as info:
+            assert_equal(info.read(), PACKAGE_INFO)
+        with open(os.path.join(dest, "Sub.pkg", "Payload")) as payload:
+            assert_equal(payload.read(), "payload data")
+
+    def test_certificate_names(self):
+        """Ensure signing certificates' subject names are read in order."""
+        make_xar(self.pkg_path, {"Payload": ""}, (
+            make_certificate("Developer ID Certification Authority",
+                             "Developer ID Installer: Example (ABC123)"),
+            make_certificate("Apple Root CA",
+                             "Developer ID Certification Authority")))
+        assert_equal(flatpkg.XarArchive(self.pkg_path).certificate_names(),
+                     ["Developer ID Installer: Example (ABC123)",
+                      "Developer ID Certification Authority"])
+
+    def test_unsigned(self):
+        """Ensure an unsigned package has no certificate names."""
+        make_xar(self.pkg_path, {"Payload": ""})
+        assert_equal(flatpkg.XarArchive(self.pkg_path).certificate_names(),
+                     [])
+
+    def test_not_a_package(self):
+        """Ensure a file that isn't a xar archive is refused."""
+        with open(self.pkg_path, "wb") as not_a_pkg:
+            not_a_pkg.write("PK\x03\x04 not a package")
+        assert_raises(flatpkg.FlatPackageError, flatpkg.XarArchive,
+                      self.pkg_path)
+
+
+class TestPayload(object):
+    """Tests for reading cpio payloads."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.payload_path = os.path.join(self.tmp_dir, "Payload")
+        make_payload(self.payload_path, APP_PAYLOAD)
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_list_payload(self):
+        """Ensure every member is listed, in order."""
+        assert_equal(flatpkg.list_payload(self.payload_path),
+                     [entry[0] for entry in APP_PAYLOAD])
+
+    def test_extract_member(self):
+        """Ensure one member is extracted, with its modes and symlinks."""
+        dest = os.path.join(self.tmp_dir, "extracted", "App.app")
+        flatpkg.extract_payload(self.payload_path, dest, "./App.app")
+        executable = os.path.join(dest, "Contents", "MacOS", "App")
+        with open(executable) as app:
+            assert_equal(app.read(), "#!/bin/sh\n")
+        assert_equal(stat.S_IMODE(os.stat(executable).st_mode), 0755)
+        assert_equal(os.readlink(os.path.join(dest, "Contents", "Current")),
+                     "MacOS")
+        assert_false(os.path.exists(
+            os.path.join(self.tmp_dir, "extracted", "Other.txt")))
+
+    def test_extract_all(self):
+        """Ensure the whole payload is extracted by default."""
+        dest = os.path.join(self.tmp_dir, "extracted")
+        flatpkg.extract_payload(self.payload_path, dest)
+        assert_true(os.path.isfile(os.path.join(dest, "Other.txt")))
+        assert_true(os.path.isfile(
+            os.path.join(dest, "App.app", "Contents", "Info.plist")))
+
+    def test_missing_member(self):
+        """Ensure extracting a member that isn't there raises."""
+        assert_raises(flatpkg.FlatPackageError, flatpkg.extract_payload,
+                      self.payload_path, self.tmp_dir, "./Missing.app")
+
+    def test_path_escape_refused(self):
+        """Ensure members can't be written outside the destination."""
+        make_payload(self.payload_path, (
+            ("../escaped", stat.S_IFREG | 0644, "nope"),))
+        dest = os.path.join(self.tmp_dir, "extracted")
+        assert_raises(flatpkg.FlatPackageError, flatpkg.extract_payload,
+                      self.payload_path, dest)
+        assert_false(os.path.exists(os.path.join(self.tmp_dir, "escaped")))
+
+    def test_symlink_escape_refused(self):
+        """Ensure members can't be written through a symlink out of dest."""
+        outside = os.path.join(self.tmp_dir, "outside")
+        os.mkdir(outside)
+        make_payload(self.payload_path, (
+            ("./App.app", stat.S_IFLNK | 0755, outside),
+            ("./App.app/escaped", stat.S_IFREG | 0644, "nope")))
+        dest = os.path.join(self.tmp_dir, "extracted")
+        assert_raises(flatpkg.FlatPackageError, flatpkg.extract_payload,
+                      self.payload_path, dest)
+        assert_equal(os.listdir(outside), [])
+
+    def test_relative_symlink_escape_refused(self):
+        """Ensure relative symlinks can't point out of dest either."""
+        make_payload(self.payload_path, (
+            ("./App.app", stat.S_IFDIR | 0755),
+            ("./App.app/Up", stat.S_IFLNK | 0755, "../.."),))
+        dest = os.path.join(self.tmp_dir, "extracted")
+        assert_raises(flatpkg.FlatPackageError, flatpkg.extract_payload,
+                      self.payload_path, dest)
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_har.py
+
+Unit tests for the HTTP request log.
+"""
+
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import har
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves a small body, a redirect to it, and a 404."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/app.zip")
+            self.end_headers()
+        elif self.path == "/app.zip":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Length", "2048")
+            self.send_header("X-Cache", "HIT from cdn")
+            self.end_headers()
+            self.wfile.write("x" * 2048)
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHarLog(object):
+    """Tests for the timed urllib2 handlers and HarLog."""
+
+    def setup(self):
+        self.original = har._log
+        self.log = har._log = har.HarLog()
+        self.server = HTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_port
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        har._log = self.original
+        shutil.rmtree(self.tmp_dir)
+
+    def test_redirect_and_timings(self):
+        """Ensure each hop is logged with its status, size and timings."""
+        response = har.build_timed_opener().open(self.base_url + "/redirect")
+        assert_equal(len(response.read()), 2048)
+        response.close()
+
+        redirect, download = self.log.entries
+        assert_equal(redirect["response"]["status"], 302)
+        assert_equal(redirect["response"]["redirectURL"], "/app.zip")
+        assert_equal(download["request"]["url"], self.base_url + "/app.zip")
+        assert_equal(download["response"]["status"], 200)
+        assert_equal(download["response"]["bodySize"], 2048)
+        assert_equal(download["_cache"], "hit")
+        assert_equal(download["serverIPAddress"], "127.0.0.1")
+        timings = download["timings"]
+        for phase in ("dns", "connect", "send", "wait", "receive"):
+            assert_true(timings[phase] >= 0)
+        assert_equal(timings["ssl"], -1)
+
+    def test_errors_and_summary(self):
+        """Ensure failed requests count as errors in the host summary."""
+        opener = har.build_timed_opener()
+        assert_raises(Exception, opener.open, self.base_url + "/missing")
+        opener.open(self.base_url + "/app.zip").read()
+
+        summary = self.log.host_summary()
+        assert_equal(len(summary), 1)
+        assert_equal(summary[0]["requests"], 2)
+        assert_equal(summary[0]["errors"], 1)
+        assert_true(summary[0]["bytes"] >= 2048)
+
+    def test_write(self):
+        """Ensure the log is written as a HAR 1.2 file."""
+        har.build_timed_opener().open(self.base_url + "/app.zip").read()
+        path = os.path.join(self.tmp_dir, "run.har")
+        self.log.write(path, "1.0.2")
+        with open(path) as har_file:
+            log = json.load(har_file)["log"]
+        assert_equal(log["version"], "1.2")
+        assert_equal(log["creator"]["version"], "1.0.2")
+        assert_equal(len(log["entries"]), 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_metrics.py
+
+Unit tests for metrics and their exporters.
+"""
+
+
+import os
+import shutil
+import tempfile
+import urllib2
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import metrics
+
+
+class TestMetrics(object):
+    """Tests for Counter, Histogram and MetricsRegistry."""
+
+    def setup(self):
+        self.registry = metrics.MetricsRegistry()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_counter(self):
+        """Ensure counters add up per label and render with labels."""
+        counter = self.registry.counter(
+            "test_total", "Test counter.", ("input_type",))
+        counter.inc(input_type="app")
+        counter.inc(2, input_type="app")
+        counter.inc(input_type='say "hi"')
+        assert_equal(counter.value(input_type="app"), 3)
+        assert_raises(ValueError, counter.inc, recipe_type="app")
+        text = self.registry.render()
+        assert_in("# TYPE test_total counter", text)
+        assert_in('test_total{input_type="app"} 3\n', text)
+        assert_in('test_total{input_type="say \\"hi\\""} 1\n', text)
+
+    def test_histogram(self):
+        """Ensure histogram buckets are cumulative."""
+        histogram = self.registry.histogram(
+            "test_seconds", "Test histogram.", buckets=(1, 10))
+        for value in (0.5, 5, 50):
+            histogram.observe(value)
+        with histogram.time():
+            pass
+        assert_equal(histogram.count(), 4)
+        text = self.registry.render()
+        assert_in('test_seconds_bucket{le="1"} 2\n', text)
+        assert_in('test_seconds_bucket{le="10"} 3\n', text)
+        assert_in('test_seconds_bucket{le="+Inf"} 4\n', text)
+        assert_in("test_seconds_count 4\n", text)
+
+    def test_count_messages(self):
+        """Ensure new messages and escaping exceptions are counted."""
+        facts = {"warnings": ["old"], "errors": [], "reminders": []}
+        metrics.MESSAGES.clear()
+        with metrics.count_messages("inspect", facts):
+            facts["warnings"].extend(["new", "newer"])
+        try:
+            with metrics.count_messages("generate", facts):
+                raise ValueError
+        except ValueError:
+            pass
+        assert_equal(metrics.MESSAGES.value(level="warning",
+                                            phase="inspect"), 2)
+        assert_equal(metrics.MESSAGES.value(level="error",
+                                            phase="generate"), 1)
+
+    def test_exporters(self):
+        """Ensure the file writer and HTTP server export the registry."""
+        self.registry.counter("test_total", "Test counter.").inc()
+        path = os.path.join(self.tmp_dir, "recipe_robot.prom")
+        writer = metrics.MetricsFileWriter(self.registry, path, 60)
+        writer.start()
+        writer.stop()
+        with open(path) as metrics_file:
+            assert_equal(metrics_file.read(), self.registry.render())
+
+        server = metrics.MetricsServer(self.registry, 0)
+        server.start()
+        try:
+            url = "http://127.0.0.1:%d/metrics" % server.port
+            assert_equal(urllib2.urlopen(url).read(),
+                         self.registry.render())
+        finally:
+            server.stop()
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_notifications.py
+
+Unit tests for the notification bus.
+"""
+
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import facts, notifications
+from recipe_robot_lib.robolog import get_logger
+
+
+class TestNotificationBus(object):
+    """Tests for NotificationBus."""
+
+    def setup(self):
+        self.bus = notifications.NotificationBus(window=0.01)
+        self.transport = notifications.MemoryTransport()
+
+    def test_no_transport_is_noop(self):
+        """Ensure nothing is queued when nobody is subscribed."""
+        self.bus.post("warnings", "Careful!")
+        assert_equal(self.bus._pending, [])
+        assert_is_none(self.bus._thread)
+
+    def test_delivers_in_order(self):
+        """Ensure notifications arrive in the order they were posted."""
+        self.bus.subscribe(self.transport)
+        for message in ("one", "two", u"thr\xe9e"):
+            self.bus.post("information", message)
+        self.bus.flush()
+        assert_equal(self.transport.events,
+                     [("information", "one"), ("information", "two"),
+                      ("information", "thr\xc3\xa9e")])
+
+    def test_coalesces_duplicates(self):
+        """Ensure identical notifications in one batch are sent once."""
+        self.bus.window = 10
+        self.bus.subscribe(self.transport)
+        for _ in range(3):
+            self.bus.post("reminders", "Add the repo.")
+        self.bus.post("warnings", "Add the repo.")
+        self.bus.flush()
+        assert_equal(self.transport.events,
+                     [("reminders", "Add the repo."),
+                      ("warnings", "Add the repo.")])
+
+    def test_close_stops_thread(self):
+        """Ensure close() delivers what's queued and ends the thread."""
+        self.bus.subscribe(self.transport)
+        self.bus.post("information", "one")
+        thread = self.bus._thread
+        self.bus.close()
+        assert_false(thread.is_alive())
+        assert_equal(self.transport.events, [("information", "one")])
+        assert_false(self.bus.active)
+
+
+class TestFactsNotifications(object):
+    """Tests for notifications posted by Facts."""
+
+    def setup(self):
+        self.transport = notifications.MemoryTransport()
+        notifications.get_notification_bus().subscribe(self.transport)
+        # Facts also print what they notify about; keep that quiet.
+        self.capture = get_logger().capture()
+        self.capture.__enter__()
+
+    def teardown(self):
+        self.capture.__exit__(None, None, None)
+        notifications.get_notification_bus().unsubscribe(self.transport)
+
+    def test_facts_post_notifications(self):
+        """Ensure setting facts posts notifications of the right type."""
+        test_facts = facts.Facts()
+        test_facts["app_name"] = "Recipe Robot"
+        test_facts["warnings"].append("Careful!")
+        notifications.get_notification_bus().flush()
+        assert_in(("information", "Recipe Robot"), self.transport.events)
+        assert_in(("warnings", "Careful!"), self.transport.events)
+
+    def test_facts_update_posts_notifications(self):
+        """Ensure update() and setdefault() go through the same hooks."""
+        test_facts = facts.Facts()
+        test_facts.update({"developer": u"Caf\xe9", "inspections": []})
+        test_facts.setdefault("bundle_id", "com.example.app")
+        test_facts["inspections"].append("app")
+        notifications.get_notification_bus().flush()
+        assert_is_instance(test_facts["developer"], str)
+        assert_is_instance(test_facts["inspections"], facts.NotifyingList)
+        assert_in(("information", "Caf\xc3\xa9"), self.transport.events)
+        assert_in(("information", "com.example.app"), self.transport.events)
+        assert_in(("information", "app"), self.transport.events)
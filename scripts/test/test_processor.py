@@ -75,3 +75,11 @@ class TestProcessor(object):
 
         assert_dict_equal(output_dict, test_dict)
 
+    def test_unknown_processor(self):
+        """Ensure an unknown processor name raises AttributeError."""
+        assert_raises(AttributeError, getattr, processor, "NotAProcessor")
+
+    def test_processor_classes_built_once(self):
+        """Ensure processor classes are built on first use, then reused."""
+        assert_is(processor.AppDmgVersioner, processor.AppDmgVersioner)
+        assert_in(processor.AppDmgVersioner, processor.processor_classes)
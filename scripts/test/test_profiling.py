@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_profiling.py
+
+Unit tests for the CPU and memory profilers.
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import profiling
+
+
+def busy_function():
+    """Do something worth profiling, then exit like main() does."""
+    sum(range(10000))
+    sys.exit(1)
+
+
+class TestProfiling(object):
+    """Tests for run_profiled and MemoryProfiler."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run_profiled(self):
+        """Ensure stats are saved even when the function exits."""
+        path = os.path.join(self.tmp_dir, "run.pstats")
+        assert_raises(SystemExit, profiling.run_profiled, busy_function,
+                      path)
+        assert_in("busy_function", profiling.summarize_profile(path))
+
+    def test_memory_checkpoints(self):
+        """Ensure each checkpoint is recorded and reported."""
+        memory_profiler = profiling.MemoryProfiler()
+        memory_profiler.start()
+        data = ["x" * 1024 for _ in range(1024)]
+        memory_profiler.checkpoint("download")
+        memory_profiler.stop()
+        assert_equal([checkpoint[0] for checkpoint in
+                      memory_profiler.checkpoints], ["start", "download"])
+        assert_true(memory_profiler.checkpoints[-1][3] > 0)
+        report = "\n".join(memory_profiler.format_report())
+        assert_in("download", report)
+        del data
@@ -75,3 +75,37 @@ class TestRecipeGenerator(object):
         for source in ("download_url", "Unexpected"):
             false_facts = {source: None}
             assert_false(recipe_generator.is_dynamic_url_source(false_facts))
+
+    def test_run_generation_jobs_order(self):
+        """Ensure children run after parents, and failures skip children."""
+        order = []
+
+        @recipe_generator.parent_type("download")
+        def generate_child(test_facts, prefs, recipe):
+            order.append(recipe["type"])
+            return recipe
+
+        def generate_parent(test_facts, prefs, recipe):
+            order.append(recipe["type"])
+            return recipe
+
+        def generate_broken(test_facts, prefs, recipe):
+            raise ValueError("Broken")
+
+        @recipe_generator.parent_type("broken")
+        def generate_orphan(test_facts, prefs, recipe):
+            order.append(recipe["type"])
+            return recipe
+
+        jobs = [({"type": "pkg"}, generate_child),
+                ({"type": "download"}, generate_parent),
+                ({"type": "broken"}, generate_broken),
+                ({"type": "orphan"}, generate_orphan)]
+        results = recipe_generator.run_generation_jobs(
+            facts.Facts(), {}, jobs)
+        assert_equal(order, ["download", "pkg"])
+        assert_equal(results["pkg"].recipe, {"type": "pkg"})
+        assert_is_none(results["pkg"].error)
+        assert_in("Broken", results["broken"].error)
+        assert_is_none(results["orphan"].recipe)
+        assert_in("broken recipe", results["orphan"].error)
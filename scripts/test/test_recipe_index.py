@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_recipe_index.py
+
+Unit tests for the local recipe index.
+"""
+
+
+import os
+import plistlib
+import shutil
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import recipe_index
+
+
+class TestRecipeIndex(object):
+    """Tests for RecipeIndex."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repo_dir = os.path.join(self.tmp_dir, "repos")
+        self.index_path = os.path.join(self.tmp_dir, "index.json")
+        write_recipe(self.repo_dir, "Google Chrome.download.recipe",
+                     {"NAME": "Google Chrome"})
+        write_recipe(self.repo_dir, "Chrome.pkg.recipe",
+                     {"NAME": "Chrome", "BUNDLE_ID": "com.google.Chrome"})
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_normalize_name(self):
+        """Ensure spacing, symbols and case don't matter."""
+        for name in ("Google Chrome", "GoogleChrome", "google-chrome"):
+            assert_equal(recipe_index.normalize_name(name), "googlechrome")
+
+    def test_find_by_name(self):
+        """Ensure recipes are found by normalized app name."""
+        index = recipe_index.RecipeIndex(self.index_path)
+        index.update([self.repo_dir])
+        found = index.find(app_name="google-chrome")
+        assert_equal([entry["type"] for entry in found], ["download"])
+
+    def test_find_by_bundle_id(self):
+        """Ensure recipes are found by bundle identifier."""
+        index = recipe_index.RecipeIndex(self.index_path)
+        index.update([self.repo_dir])
+        found = index.find(app_name="Unrelated",
+                           bundle_id="COM.GOOGLE.CHROME")
+        assert_equal([entry["filename"] for entry in found],
+                     ["Chrome.pkg.recipe"])
+
+    def test_search_dump(self):
+        """Ensure saved autopkg search output is indexed."""
+        dump_path = os.path.join(self.tmp_dir, "search.txt")
+        with open(dump_path, "w") as dump_file:
+            dump_file.write("Name                 Repo     Path\n"
+                            "----                 ----     ----\n"
+                            "Firefox.munki.recipe recipes  "
+                            "Mozilla/Firefox.munki.recipe\n")
+        index = recipe_index.RecipeIndex(self.index_path)
+        index.update(search_dump=dump_path)
+        found = index.find(app_name="Firefox")
+        assert_equal([entry["type"] for entry in found], ["munki"])
+
+    def test_incremental_update(self):
+        """Ensure only changed recipes are reparsed after a reload."""
+        index = recipe_index.RecipeIndex(self.index_path)
+        index.update([self.repo_dir])
+        index.save()
+
+        reloaded = recipe_index.RecipeIndex(self.index_path)
+        reloaded.load()
+        reloaded.update([self.repo_dir])
+        assert_false(reloaded._dirty)
+        assert_equal(len(reloaded), 2)
+
+        os.remove(os.path.join(self.repo_dir, "Chrome.pkg.recipe"))
+        reloaded.update([self.repo_dir])
+        assert_true(reloaded._dirty)
+        assert_equal(reloaded.find(bundle_id="com.google.Chrome"), [])
+
+
+def write_recipe(repo_dir, filename, recipe_input):
+    """Write a minimal recipe into repo_dir."""
+    if not os.path.exists(repo_dir):
+        os.makedirs(repo_dir)
+    plistlib.writePlist({"Input": recipe_input, "Process": []},
+                        os.path.join(repo_dir, filename))
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_repo_registry.py
+
+Unit tests for the AutoPkg repo registry.
+"""
+
+
+import os
+import plistlib
+import shutil
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import backend, repo_registry
+
+
+class TestRepoRegistry(object):
+    """Tests for RepoRegistry."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.prefs_path = os.path.join(self.tmp_dir, "com.github.autopkg.plist")
+        write_repos(self.prefs_path, {
+            "/tmp/com.github.autopkg.recipes":
+                {"URL": "https://github.com/autopkg/recipes.git"}})
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_normalize_repo_url(self):
+        """Ensure case, trailing slashes and .git are ignored."""
+        for url in ("https://github.com/autopkg/Recipes",
+                    "https://github.com/autopkg/recipes.git/"):
+            assert_equal(repo_registry.normalize_repo_url(url),
+                         "https://github.com/autopkg/recipes")
+
+    def test_has_repo(self):
+        """Ensure installed repos are found by URL."""
+        registry = repo_registry.RepoRegistry(self.prefs_path)
+        assert_true(registry.has_repo("https://github.com/autopkg/recipes"))
+        assert_false(registry.has_repo("https://github.com/autopkg/filewave"))
+        assert_equal(registry.repo_paths, ["/tmp/com.github.autopkg.recipes"])
+
+    def test_missing_prefs(self):
+        """Ensure a missing preferences file means no repos."""
+        registry = repo_registry.RepoRegistry(
+            os.path.join(self.tmp_dir, "missing.plist"))
+        assert_equal(registry.repo_urls, frozenset())
+
+    def test_default_prefs_path(self):
+        """Ensure the backend's AutoPkg preferences are used by default."""
+        old_backend = backend.get_backend()
+        backend.set_backend(backend.PurePythonBackend(self.tmp_dir))
+        try:
+            registry = repo_registry.RepoRegistry()
+            assert_equal(registry.prefs_path, self.prefs_path)
+            assert_true(
+                registry.has_repo("https://github.com/autopkg/recipes"))
+        finally:
+            backend.set_backend(old_backend)
+
+    def test_reload_on_mtime_change(self):
+        """Ensure the registry notices repos added after the first read."""
+        registry = repo_registry.RepoRegistry(self.prefs_path)
+        assert_false(registry.has_repo("https://github.com/autopkg/filewave"))
+        write_repos(self.prefs_path, {
+            "/tmp/com.github.autopkg.filewave":
+                {"URL": "https://github.com/autopkg/filewave"}})
+        mtime = os.path.getmtime(self.prefs_path) + 10
+        os.utime(self.prefs_path, (mtime, mtime))
+        assert_true(registry.has_repo("https://github.com/autopkg/filewave"))
+
+
+def write_repos(prefs_path, repos):
+    """Write an AutoPkg preferences file with the given RECIPE_REPOS."""
+    plistlib.writePlist({"RECIPE_REPOS": repos}, prefs_path)
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_report.py
+
+Unit tests for per-run performance reports.
+"""
+
+
+import os
+import shutil
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import report
+from recipe_robot_lib import tracing
+from recipe_robot_lib.tools import write_report
+
+
+class TestReport(object):
+    """Tests for build_report, read_report and aggregate_reports."""
+
+    def setup(self):
+        self.original_tracer = tracing._tracer
+        tracing._tracer = tracing.Tracer()
+        tracing.start_tracing()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        tracing._tracer = self.original_tracer
+        shutil.rmtree(self.tmp_dir)
+
+    def make_facts(self):
+        """Return facts for a run that wrote one recipe."""
+        recipe_path = os.path.join(self.tmp_dir, "Foo.download.recipe")
+        with open(recipe_path, "w") as recipe_file:
+            recipe_file.write("x" * 100)
+        with tracing.span("inspect", "phase"):
+            with tracing.span("inspect_app", "inspect"):
+                pass
+        return {"errors": [], "warnings": ["Careful."],
+                "recipes": [{"type": "download"}, recipe_path],
+                "input_path": "/Applications/Foo.app", "input_type": "app",
+                "execution_time": 1.5}
+
+    def test_build_report(self):
+        """Ensure a report records inspectors and written recipes."""
+        run_report = report.build_report(self.make_facts())
+        assert_true(run_report["succeeded"])
+        assert_equal(run_report["input_type"], "app")
+        assert_equal(run_report["warnings"], 1)
+        assert_equal(run_report["inspectors"]["inspect_app"]["calls"], 1)
+        assert_in("inspect", run_report["phases"])
+        assert_equal(run_report["recipes"][0]["type"], "download")
+        assert_equal(run_report["recipes"][0]["bytes"], 100)
+        assert_true(run_report["peak_rss"] > 0)
+
+    def test_write_and_read(self):
+        """Ensure reports round-trip as both JSON and plist."""
+        run_report = report.build_report(self.make_facts())
+        for name in ("report.json", "report.plist"):
+            path = os.path.join(self.tmp_dir, name)
+            write_report(run_report, path)
+            read = report.read_report(path)
+            assert_equal(read["input_path"], run_report["input_path"])
+            assert_equal(read["recipes"], run_report["recipes"])
+
+    def test_aggregate_reports(self):
+        """Ensure reports are summarized per version."""
+        run_report = report.build_report(self.make_facts())
+        slower = dict(run_report, execution_time=3.5, succeeded=False)
+        other = dict(run_report, recipe_robot_version="0.9")
+        summaries = report.aggregate_reports([run_report, slower, other])
+        summary = summaries[run_report["recipe_robot_version"]]
+        assert_equal(summary["runs"], 2)
+        assert_equal(summary["failures"], 1)
+        assert_equal(summary["execution_time"]["median"], 2.5)
+        assert_equal(summary["inspectors"]["inspect_app"]["count"], 2)
+        assert_equal(summaries["0.9"]["runs"], 1)
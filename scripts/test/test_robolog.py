@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_robolog.py
+
+Unit tests for the logging backend.
+"""
+
+
+from StringIO import StringIO
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib.robolog import Logger, LogLevel, StreamSink
+
+
+class Unformattable(object):
+    """Fails the test if it is ever formatted."""
+
+    def __str__(self):
+        raise AssertionError("Disabled messages must not be formatted.")
+
+
+class TestLogger(object):
+    """Tests for Logger."""
+
+    def setup(self):
+        self.out = StringIO()
+        self.err = StringIO()
+        self.logger = Logger(StreamSink(self.out, max_delay=60),
+                             StreamSink(self.err, max_delay=60))
+
+    def test_disabled_levels_are_not_formatted(self):
+        """Ensure disabled messages are dropped before formatting."""
+        self.logger.log("%s", LogLevel.DEBUG, 0, (Unformattable(),))
+        self.logger.log("%s", LogLevel.VERBOSE, 0, (Unformattable(),))
+        self.logger.flush()
+        assert_equal(self.out.getvalue(), "")
+
+    def test_format_and_buffer(self):
+        """Ensure lines are formatted lazily and held until flushed."""
+        self.logger.set_verbosity(True, False)
+        self.logger.log("Found %s apps", LogLevel.VERBOSE, 4, (2,))
+        assert_equal(self.out.getvalue(), "")
+        self.logger.flush()
+        assert_equal(self.out.getvalue(), "    Found 2 apps\n")
+
+    def test_warnings_go_to_stderr_after_stdout(self):
+        """Ensure buffered stdout is written before stderr output."""
+        self.logger.log("Working...")
+        self.logger.log("Careful!", LogLevel.WARNING)
+        assert_equal(self.out.getvalue(), "Working...\n")
+        self.logger.flush()
+        assert_equal(self.err.getvalue(), "[WARNING] Careful!\n")
+
+    def test_capture(self):
+        """Ensure captured output is held until it's replayed."""
+        with self.logger.capture() as job_sink:
+            self.logger.log("From a job")
+        self.logger.log("From main")
+        job_sink.replay(self.logger)
+        self.logger.flush()
+        assert_equal(self.out.getvalue(), "From main\nFrom a job\n")
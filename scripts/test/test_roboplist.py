@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_roboplist.py
+
+Unit tests for the pure-Python plist reader and writer.
+"""
+
+
+from datetime import datetime
+import os
+import plistlib
+import shutil
+import struct
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import roboplist
+
+
+SAMPLE = {
+    "Identifier": "com.example.download.App",
+    "Input": {"NAME": "App & <Friends>", "APP_FILENAME": u"Caf\xe9"},
+    "MinimumVersion": "0.6.1",
+    "Process": [{"Processor": "Versioner", "Arguments": {"Count": 3}},
+                {"Processor": "EndOfCheckPhase"}],
+    "Enabled": True,
+    "Ratio": 0.5,
+    "Created": datetime(2015, 8, 1, 12, 0, 0),
+    "Icon": plistlib.Data("\x89PNG"),
+    "Empty": [],
+}
+
+
+class TestRoboPlist(object):
+    """Tests for roboplist."""
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        """Ensure what's written reads back the same, also via plistlib."""
+        path = os.path.join(self.tmp_dir, "App.download.recipe")
+        roboplist.write_plist(SAMPLE, path)
+        result = roboplist.read_plist(path)
+        assert_equal(result["Input"], SAMPLE["Input"])
+        assert_equal(result["Process"], SAMPLE["Process"])
+        assert_equal(result["Created"], SAMPLE["Created"])
+        assert_equal(result["Icon"].data, "\x89PNG")
+        assert_equal(result["Empty"], [])
+        assert_equal(plistlib.readPlist(path)["Input"], SAMPLE["Input"])
+        assert_equal(os.listdir(self.tmp_dir), ["App.download.recipe"])
+
+    def test_deterministic(self):
+        """Ensure keys are sorted, so output doesn't depend on dict order."""
+        data = roboplist.write_plist_to_string(SAMPLE)
+        assert_equal(data, roboplist.write_plist_to_string(dict(SAMPLE)))
+        assert_less(data.index("<key>Created</key>"),
+                    data.index("<key>Identifier</key>"))
+        assert_in("App &amp; &lt;Friends&gt;", data)
+
+    def test_invalid(self):
+        """Ensure unsupported values and bad input raise PlistError."""
+        path = os.path.join(self.tmp_dir, "bad.plist")
+        assert_raises(roboplist.PlistError, roboplist.write_plist,
+                      {"Key": None}, path)
+        assert_false(os.listdir(self.tmp_dir))
+        assert_raises(roboplist.PlistError,
+                      roboplist.read_plist_from_string, "<plist><dict>")
+        assert_raises(roboplist.PlistError, roboplist.read_plist, path)
+
+    def test_read_binary(self):
+        """Ensure binary plists are read without Foundation."""
+        data = make_binary_plist([("CFBundleName", "App"),
+                                  ("LSMinimumSystemVersion", "10.9"),
+                                  ("Count", 300)])
+        assert_equal(roboplist.read_plist_from_string(data),
+                     {"CFBundleName": "App", "LSMinimumSystemVersion": "10.9",
+                      "Count": 300})
+
+    def test_read_plist_keys(self):
+        """Ensure only the requested keys are read, from either format."""
+        items = [("CFBundleName", "App"), ("Other", "Skipped"),
+                 ("CFBundleVersion", "1.0")]
+        xml_path = os.path.join(self.tmp_dir, "xml.plist")
+        roboplist.write_plist(dict(items, Nested={"CFBundleName": "No"}),
+                              xml_path)
+        binary_path = os.path.join(self.tmp_dir, "binary.plist")
+        with open(binary_path, "wb") as binary_file:
+            binary_file.write(make_binary_plist(items))
+        for path in (xml_path, binary_path):
+            assert_equal(
+                roboplist.read_plist_keys(
+                    path, ("CFBundleName", "CFBundleVersion", "Missing")),
+                {"CFBundleName": "App", "CFBundleVersion": "1.0"})
+
+
+def make_binary_plist(items):
+    """Encode a flat dict of ASCII strings and small ints as a bplist."""
+    objects = []
+    for value in [key for key, _ in items] + [value for _, value in items]:
+        if isinstance(value, int):
+            objects.append(struct.pack(">BH", 0x11, value))
+        elif len(value) < 15:
+            objects.append(chr(0x50 | len(value)) + value)
+        else:
+            objects.append("\x5f\x10" + chr(len(value)) + value)
+    count = len(items)
+    objects.insert(0, chr(0xD0 | count) +
+                   "".join(chr(ref) for ref in range(1, 2 * count + 1)))
+    data = "bplist00"
+    offsets = []
+    for obj in objects:
+        offsets.append(len(data))
+        data += obj
+    table_offset = len(data)
+    data += "".join(chr(offset) for offset in offsets)
+    return data + struct.pack(">6xBBQQQ", 1, 1, len(objects), 0, table_offset)
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+"""
+test_tools.py
+
+Unit tests for tools.
+"""
+
+
+import os
+import shutil
+import tempfile
+import urllib2
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import tools
+from recipe_robot_lib.robolog import get_logger
+
+
+class TestSharedProcessors(object):
+    """Tests for deploying shared processors."""
+
+    def setup(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.dest_path = os.path.join(self.temp_dir,
+                                      "SourceForgeURLProvider.py")
+        self.fetched = []
+        self.real_fetch = tools.fetch
+        tools.fetch = self.fake_fetch
+        self.fetch_error = None
+        with open(tools.SOURCEFORGEURLPROVIDER_PATH, "rb") as bundled_file:
+            self.bundled = bundled_file.read()
+
+    def teardown(self):
+        tools.fetch = self.real_fetch
+        shutil.rmtree(self.temp_dir)
+
+    def fake_fetch(self, url, user_agent=None, timeout=None):
+        """Stand in for http_client.fetch without touching the network."""
+        self.fetched.append(url)
+        if self.fetch_error:
+            raise self.fetch_error
+        return "# Downloaded copy\n"
+
+    def test_identical_file_not_rewritten(self):
+        """Ensure an identical processor is left alone."""
+        with open(self.dest_path, "wb") as dest_file:
+            dest_file.write("print 'hello'\n")
+        os.utime(self.dest_path, (1000000000, 1000000000))
+        assert_false(tools.deploy_shared_processor("print 'hello'\n",
+                                                   self.dest_path))
+        assert_equal(os.path.getmtime(self.dest_path), 1000000000)
+
+    def test_changed_file_rewritten(self):
+        """Ensure a processor with different contents is replaced."""
+        with open(self.dest_path, "wb") as dest_file:
+            dest_file.write("print 'old'\n")
+        assert_true(tools.deploy_shared_processor("print 'new'\n",
+                                                  self.dest_path))
+        with open(self.dest_path, "rb") as dest_file:
+            assert_equal(dest_file.read(), "print 'new'\n")
+
+    def test_bundled_copy_by_default(self):
+        """Ensure the bundled processor is used without refresh."""
+        with get_logger().capture():
+            tools.create_SourceForgeURLProvider(self.temp_dir)
+        assert_equal(self.fetched, [])
+        with open(self.dest_path, "rb") as dest_file:
+            assert_equal(dest_file.read(), self.bundled)
+
+    def test_refresh_downloads(self):
+        """Ensure refresh uses the processor downloaded from GitHub."""
+        with get_logger().capture():
+            tools.create_SourceForgeURLProvider(self.temp_dir, refresh=True)
+        assert_equal(self.fetched, [tools.SOURCEFORGEURLPROVIDER_URL])
+        with open(self.dest_path, "rb") as dest_file:
+            assert_equal(dest_file.read(), "# Downloaded copy\n")
+
+    def test_failed_refresh_falls_back(self):
+        """Ensure a failed download falls back to the bundled copy."""
+        self.fetch_error = urllib2.URLError("No network")
+        with get_logger().capture() as job_sink:
+            tools.create_SourceForgeURLProvider(self.temp_dir, refresh=True)
+        with open(self.dest_path, "rb") as dest_file:
+            assert_equal(dest_file.read(), self.bundled)
+        warnings = [line for _, line in job_sink.lines if "[WARNING]" in line]
+        assert_equal(len(warnings), 1)
+        assert_in("Using the bundled copy instead.", warnings[0])
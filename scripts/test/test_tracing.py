@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_tracing.py
+
+Unit tests for tracing spans.
+"""
+
+
+import json
+import os
+import shutil
+import tempfile
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import tracing
+
+
+@tracing.traced("inspect", attrs=("input_path",))
+def inspect_something(input_path, facts=None):
+    """A traced function that opens a nested span."""
+    with tracing.span("child", "http", url="https://example.com") as child:
+        child.set(bytes=10)
+    tracing.current_span().set(format="dmg")
+    return input_path
+
+
+class TestTracing(object):
+    """Tests for Tracer and the module-level helpers."""
+
+    def setup(self):
+        self.original = tracing._tracer
+        self.tracer = tracing._tracer = tracing.Tracer()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        tracing._tracer = self.original
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disabled(self):
+        """Ensure nothing is recorded until tracing is started."""
+        assert_equal(inspect_something("/Applications/App.app"),
+                     "/Applications/App.app")
+        assert_equal(self.tracer.events, [])
+
+    def test_nested_spans(self):
+        """Ensure nested spans and their attributes are recorded."""
+        tracing.start_tracing()
+        inspect_something("/Applications/App.app")
+        child, parent = self.tracer.events
+        assert_equal(child["name"], "child")
+        assert_equal(child["args"], {"url": "https://example.com",
+                                     "bytes": 10})
+        assert_equal(parent["name"], "inspect_something")
+        assert_equal(parent["cat"], "inspect")
+        assert_equal(parent["args"], {"input_path": "/Applications/App.app",
+                                      "format": "dmg"})
+        assert_true(parent["ts"] <= child["ts"])
+        assert_true(child["ts"] + child["dur"] <= parent["ts"] + parent["dur"])
+
+    def test_error_and_write(self):
+        """Ensure failed spans are marked and the trace is valid JSON."""
+        tracing.start_tracing()
+        with assert_raises(ValueError):
+            with tracing.span("broken"):
+                raise ValueError("Oops")
+        path = os.path.join(self.tmp_dir, "trace.json")
+        self.tracer.write(path)
+        with open(path) as trace_file:
+            trace = json.load(trace_file)
+        phases = [event["ph"] for event in trace["traceEvents"]]
+        assert_equal(sorted(phases), ["M", "X"])
+        assert_in("ValueError", self.tracer.events[0]["args"]["error"])
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# This Python file uses the following encoding: utf-8
+
+# Recipe Robot
+# Copyright 2015 Elliot Jordan, Shea G. Craig, and Eldon Ahrold
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+test_version.py
+
+Unit tests for version comparison.
+"""
+
+
+from nose.tools import *  # pylint: disable=unused-wildcard-import, wildcard-import
+
+from recipe_robot_lib import version
+
+
+class TestVersion(object):
+    """Tests for the version module."""
+
+    def test_numeric_chunks_compare_numerically(self):
+        """Ensure 1.10 is newer than 1.9."""
+        assert_greater(version.compare_versions("1.10", "1.9"), 0)
+
+    def test_prerelease_is_older_than_release(self):
+        """Ensure trailing text marks a prerelease, like Sparkle."""
+        assert_less(version.compare_versions("1.0b1", "1.0"), 0)
+        assert_less(version.compare_versions("2.0rc1", "2.0"), 0)
+
+    def test_patch_release_is_newer(self):
+        """Ensure a trailing number marks a newer release."""
+        assert_greater(version.compare_versions("1.0.1", "1.0"), 0)
+        assert_greater(version.compare_versions("1.0.1", "1.0b1"), 0)
+
+    def test_text_chunks_compare_case_insensitively(self):
+        """Ensure beta ordering ignores case."""
+        assert_greater(version.compare_versions("1.0B2", "1.0b1"), 0)
+        assert_equal(version.compare_versions("1.0B2", "1.0b2"), 0)
+
+    def test_key_is_memoized(self):
+        """Ensure repeated parses return the cached key."""
+        key = version.version_key("3.2.1")
+        assert_is(version.version_key("3.2.1"), key)
+
+    def test_max_by_version(self):
+        """Ensure the newest version is chosen."""
+        versions = ["1.2", "1.10", "1.10b3", "1.9.9"]
+        assert_equal(version.max_by_version(versions), "1.10")
+
+    def test_max_by_version_with_key(self):
+        """Ensure items are ranked by the version the key returns."""
+        items = [("1.0", "a"), ("2.0", "b"), ("2.0", "c")]
+        newest = version.max_by_version(items, key=lambda item: item[0])
+        # Ties keep the first item.
+        assert_equal(newest, ("2.0", "b"))
+
+    def test_max_by_version_empty(self):
+        """Ensure an empty iterable yields None."""
+        assert_is_none(version.max_by_version([]))
+
+    def test_is_strict_version(self):
+        """Ensure strict versions match distutils' StrictVersion."""
+        for strict in ("1.0", "1.0.4", "1.0b1", "10.11.3a2"):
+            assert_true(version.is_strict_version(strict))
+        for loose in ("1", "1.0.0.1", "1.0-beta", "", None):
+            assert_false(version.is_strict_version(loose))
+
+    def test_version_from_filename(self):
+        """Ensure versions are found in common download file names."""
+        expected = {
+            "AutoPkgr-1.3.2.dmg": "1.3.2",
+            "https://example.com/dl/cdto_2_6.zip": "2.6",
+            "Thing-x64-2.1b3.tar.gz": "2.1b3",
+            "foo-1.2-x86_64.dmg": "1.2",
+            "App_2.0_macOS_10.12.dmg": "2.0",
+            "App-3.1-osx10.9.zip": "3.1",
+            "App-v1.4.dmg": "1.4",
+            "App-64bit-5.tgz": "5",
+            "NoVersion.dmg": ""}
+        for filename, expected_version in expected.items():
+            assert_equal(version.version_from_filename(filename),
+                         expected_version)